@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+"""
+Analysis Result Cache
+Memoizes analysis results on disk, keyed by the email corpus and every
+config that affects the result, so re-running a report on the same mbox with
+unchanged keywords.json and issue configs returns instantly.
+
+Keys combine:
+    - the mbox content hash (taken from the per-message digests in its
+      MboxWriter index when present, which avoids re-reading the mbox)
+    - the SHA-256 of each config file involved
+    - the kind of analysis and ANALYSIS_VERSION (bumped when result shapes change)
+
+Layout:
+    data/cache/analysis/index.json     key -> size, source, created, last_used
+    data/cache/analysis/<key>.json     cached result
+
+The cache is size-bounded: least recently used entries are evicted.
+
+Usage:
+    python analysis_cache.py list
+    python analysis_cache.py clear
+"""
+
+import os
+import sys
+import json
+import hashlib
+from datetime import datetime
+from mbox_writer import mbox_content_digest
+
+DEFAULT_CACHE_DIR = "data/cache/analysis"
+DEFAULT_MAX_BYTES = 200 * 1024 * 1024
+DEFAULT_MAX_ENTRIES = 500
+
+# Bump when the shape or meaning of cached results changes
+ANALYSIS_VERSION = 2
+
+
+def file_hash(filepath):
+    """SHA-256 of a file's contents (None if it does not exist)"""
+    if not filepath or not os.path.exists(filepath):
+        return None
+    digest = hashlib.sha256()
+    with open(filepath, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def corpus_hash(mbox_file):
+    """
+    Hash identifying an mbox's contents
+
+    Uses the per-message SHA-256 digests MboxWriter records in the offset
+    index when the index matches the file; otherwise hashes the mbox itself.
+    """
+    digest = mbox_content_digest(mbox_file)
+    if digest:
+        return 'entries:' + digest
+    return 'mbox:' + file_hash(mbox_file)
+
+
+class AnalysisCache:
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES, max_entries=DEFAULT_MAX_ENTRIES):
+        """
+        Open (or create) the analysis cache
+
+        Args:
+            cache_dir: Cache directory (default: data/cache/analysis)
+            max_bytes: Total size kept before evicting least recently used entries
+            max_entries: Max number of cached results
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.index_file = os.path.join(cache_dir, 'index.json')
+        self.index = {}
+        self._corpus_hashes = {}
+
+        os.makedirs(cache_dir, exist_ok=True)
+        if os.path.exists(self.index_file):
+            try:
+                with open(self.index_file, 'r') as f:
+                    self.index = json.load(f)
+            except (OSError, ValueError):
+                self.index = {}
+
+    def _entry_path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def _save_index(self):
+        tmp_path = self.index_file + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(self.index, f, indent=2)
+        os.replace(tmp_path, self.index_file)
+
+    def make_key(self, kind, mbox_file, config_files=()):
+        """
+        Cache key for one analysis of an mbox
+
+        Args:
+            kind: Analysis name (e.g. 'general', 'issue')
+            mbox_file: The mbox analyzed
+            config_files: Config files the result depends on (missing files
+                          hash as None, i.e. "defaults")
+
+        Returns:
+            Hex key, or None if mbox_file is not a file (e.g. a store selection)
+        """
+        if not mbox_file or not os.path.isfile(mbox_file):
+            return None
+
+        # Hash each mbox once per run, even when several analyses use it
+        stat = os.stat(mbox_file)
+        cache_id = (os.path.abspath(mbox_file), stat.st_size, stat.st_mtime_ns)
+        if cache_id not in self._corpus_hashes:
+            self._corpus_hashes[cache_id] = corpus_hash(mbox_file)
+
+        parts = [kind, str(ANALYSIS_VERSION), self._corpus_hashes[cache_id]]
+        parts.extend(str(file_hash(path)) for path in config_files)
+        return hashlib.sha256("\n".join(parts).encode('utf-8')).hexdigest()[:32]
+
+    def get(self, key):
+        """Cached result for a key, or None"""
+        if not key or key not in self.index:
+            return None
+
+        try:
+            with open(self._entry_path(key), 'r') as f:
+                result = json.load(f)
+        except (OSError, ValueError):
+            self.index.pop(key, None)
+            self._save_index()
+            return None
+
+        self.index[key]['last_used'] = datetime.now().strftime('%Y-%m-%dT%H:%M:%S.%f')
+        self.index[key]['hits'] = self.index[key].get('hits', 0) + 1
+        self._save_index()
+        return result
+
+    def put(self, key, result, source=None, kind=None):
+        """Store a result and evict old entries if the cache is over its limits"""
+        if not key:
+            return
+
+        path = self._entry_path(key)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(result, f)
+        os.replace(tmp_path, path)
+
+        now = datetime.now().strftime('%Y-%m-%dT%H:%M:%S.%f')
+        self.index[key] = {
+            'kind': kind,
+            'source': source,
+            'size': os.path.getsize(path),
+            'created': now,
+            'last_used': now,
+            'hits': 0
+        }
+        self._evict()
+        self._save_index()
+
+    def _evict(self):
+        """Drop least recently used entries until the cache fits its limits"""
+        total = sum(entry['size'] for entry in self.index.values())
+        by_age = sorted(self.index.items(), key=lambda item: item[1]['last_used'])
+
+        while by_age and (total > self.max_bytes or len(self.index) > self.max_entries):
+            key, entry = by_age.pop(0)
+            try:
+                os.remove(self._entry_path(key))
+            except OSError:
+                pass
+            total -= entry['size']
+            del self.index[key]
+
+    def clear(self):
+        """Delete every cached result"""
+        count = len(self.index)
+        for key in list(self.index):
+            try:
+                os.remove(self._entry_path(key))
+            except OSError:
+                pass
+        self.index = {}
+        self._save_index()
+        return count
+
+    def stats(self):
+        """Summary of the cache contents"""
+        return {
+            'entries': len(self.index),
+            'size_mb': sum(entry['size'] for entry in self.index.values()) / (1024 * 1024),
+            'max_mb': self.max_bytes / (1024 * 1024),
+            'hits': sum(entry.get('hits', 0) for entry in self.index.values())
+        }
+
+
+def main():
+    """Inspect or clear the analysis cache"""
+    if len(sys.argv) != 2 or sys.argv[1] not in ('list', 'clear'):
+        print(__doc__)
+        return
+
+    cache = AnalysisCache()
+
+    if sys.argv[1] == 'clear':
+        count = cache.clear()
+        print(f"✓ Cleared {count} cached results")
+        return
+
+    print("="*70)
+    print("ANALYSIS CACHE")
+    print("="*70)
+    for key, entry in sorted(cache.index.items(), key=lambda item: item[1]['last_used'], reverse=True):
+        print(f"  {key[:12]}  {entry.get('kind') or '-':8} {entry['size'] / 1024:7.1f} KB  "
+              f"{entry.get('hits', 0):3} hits  last used {entry['last_used'][:16]}  {entry.get('source') or ''}")
+    info = cache.stats()
+    print(f"\n  {info['entries']} entries, {info['size_mb']:.2f} MB of {info['max_mb']:.0f} MB, {info['hits']} hits")
+    print("="*70)
+
+
+if __name__ == "__main__":
+    main()
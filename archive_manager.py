@@ -0,0 +1,617 @@
+#!/usr/bin/env python3
+"""
+Email Archive Manager
+Compacts old mbox downloads and old message store emails into deduplicated,
+gzip-compressed segments, one per month, with a per-message index, and
+enforces retention tiers so history stays queryable while disk usage stays
+bounded:
+
+    raw         full RFC822 messages, for months ending less than 90 days ago
+    text        normalized text (subject, sender, thread, plain-text body)
+                after that, until TEXT_RETENTION_DAYS
+    aggregate   per-month email and category counts, kept forever
+
+Layout:
+    data/archive/manifest.json           tier, counts, sizes and aggregates per month
+    data/archive/index.jsonl             one line per archived message
+    data/archive/raw/2026-09.mbox.gz     raw tier segment (mboxrd, gzip)
+    data/archive/text/2026-05.jsonl.gz   text tier segment (one JSON record per message)
+
+Emails older than STORE_RETENTION_DAYS leave data/store (objects and index
+lines) for the archive, so the store only holds what weekly and monthly
+reports read; daily rollups of those days are kept. Tools that read the
+store (folder_scanner.py, query_server.py issue analysis) no longer see
+archived emails, which is why the Monday run only archives with USE_ARCHIVE.
+
+Any archived period can be exported back to an mbox for the existing tools
+(raw and text tiers), and monthly aggregates cover the rest.
+
+Usage:
+    python archive_manager.py compact [DAYS]            # archive data/raw/*.mbox untouched for DAYS days (default 7)
+                                                        # and store emails older than STORE_RETENTION_DAYS
+    python archive_manager.py retention                 # demote months that aged out of their tier
+    python archive_manager.py export 2026-01-01 2026-01-31 january.mbox
+    python archive_manager.py stats
+"""
+
+import os
+import re
+import sys
+import gzip
+import json
+import email
+import hashlib
+import mailbox
+from datetime import datetime, date, timedelta, timezone
+from email.message import EmailMessage
+from email.parser import BytesHeaderParser
+from email.utils import parsedate_to_datetime
+from mbox_writer import THREAD_HEADER, format_mbox_entry, open_mbox, IndexedMbox, add_thread_header
+from message_store import MessageStore, DEFAULT_STORE_DIR
+from email_analyzer_mbox import EmailAnalyzer
+
+DEFAULT_ARCHIVE_DIR = "data/archive"
+
+# Retention tiers (days after the end of a month)
+RAW_RETENTION_DAYS = 90
+TEXT_RETENTION_DAYS = 730
+
+# Days of email kept in the message store (longer than the 30-day monthly report window)
+STORE_RETENTION_DAYS = 45
+
+TIERS = ('raw', 'text', 'aggregate')
+
+# Quoted "From " body lines written by format_mbox_entry
+_QUOTED_FROM_LINE = re.compile(rb'^>(>*From )', re.MULTILINE)
+
+
+def _month_end(month):
+    """First day after a 'YYYY-MM' month"""
+    year, number = map(int, month.split('-'))
+    return date(year + number // 12, number % 12 + 1, 1)
+
+
+def tier_for_month(month, today=None, raw_days=RAW_RETENTION_DAYS, text_days=TEXT_RETENTION_DAYS):
+    """Retention tier a month belongs in on a given day"""
+    today = today or date.today()
+    age = (today - _month_end(month)).days
+    if age < raw_days:
+        return 'raw'
+    if text_days is None or age < text_days:
+        return 'text'
+    return 'aggregate'
+
+
+def message_key(raw, message_id=None):
+    """Dedup key: the Message-ID header, or a content hash for messages without one"""
+    if message_id:
+        return message_id
+    return 'sha256:' + hashlib.sha256(raw.replace(b'\r\n', b'\n')).hexdigest()
+
+
+def iter_segment_messages(path):
+    """Yield raw message bytes from a gzip mboxrd segment"""
+    lines = None
+    with gzip.open(path, 'rb') as f:
+        for line in f:
+            if line.startswith(b'From '):
+                if lines is not None:
+                    yield _finish_entry(lines)
+                lines = []
+            elif lines is not None:
+                lines.append(line)
+    if lines is not None:
+        yield _finish_entry(lines)
+
+
+def _finish_entry(lines):
+    """Undo format_mbox_entry's From-quoting and trailing blank line"""
+    body = b''.join(lines)
+    if body.endswith(b'\n\n'):
+        body = body[:-1]
+    return _QUOTED_FROM_LINE.sub(rb'\1', body)
+
+
+class ArchiveManager:
+    def __init__(self, root=DEFAULT_ARCHIVE_DIR, keywords_file='keywords.json',
+                 raw_days=RAW_RETENTION_DAYS, text_days=TEXT_RETENTION_DAYS):
+        """
+        Open (or create) the archive
+
+        Args:
+            root: Archive directory (default: data/archive)
+            keywords_file: Keyword categories used for the monthly aggregates
+            raw_days: Days after a month ends that its raw messages are kept
+            text_days: Days after a month ends that its normalized text is kept
+                       (None keeps text forever)
+        """
+        self.root = root
+        self.raw_days = raw_days
+        self.text_days = text_days
+        self.manifest_file = os.path.join(root, 'manifest.json')
+        self.index_file = os.path.join(root, 'index.jsonl')
+        self.analyzer = EmailAnalyzer(keywords_file if keywords_file and os.path.exists(keywords_file) else None)
+
+        self.segments = {}    # month -> manifest entry
+        self.entries = []     # index entries, in archive order
+        self.dates = {}       # message key -> archived date
+
+        for tier in ('raw', 'text'):
+            os.makedirs(os.path.join(root, tier), exist_ok=True)
+        self._load()
+
+    def _load(self):
+        """Load the manifest and message index"""
+        if os.path.exists(self.manifest_file):
+            with open(self.manifest_file, 'r') as f:
+                self.segments = json.load(f).get('segments', {})
+
+        if os.path.exists(self.index_file):
+            with open(self.index_file, 'r', encoding='utf-8') as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # A torn final line from an interrupted run - skip it
+                        continue
+                    self.entries.append(entry)
+                    self.dates[entry['key']] = entry['date']
+
+    def _save_manifest(self):
+        tmp_path = self.manifest_file + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump({'segments': self.segments}, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.manifest_file)
+
+    def _segment_path(self, month, tier):
+        if tier == 'raw':
+            return os.path.join(self.root, 'raw', f"{month}.mbox.gz")
+        return os.path.join(self.root, 'text', f"{month}.jsonl.gz")
+
+    def _segment(self, month, today=None):
+        """Manifest entry for a month, created in the tier its age calls for"""
+        if month not in self.segments:
+            self.segments[month] = {
+                'tier': tier_for_month(month, today, self.raw_days, self.text_days),
+                'count': 0,
+                'raw_bytes': 0,
+                'aggregates': None
+            }
+        return self.segments[month]
+
+    def _normalize(self, message, key, entry_date):
+        """Text tier record for a parsed message"""
+        subject = message.get('Subject', '') or ''
+        content = self.analyzer._extract_email_content(message)
+        # _extract_email_content returns "<subject> <body>"
+        body = content[len(subject) + 1:] if subject and content.startswith(subject + " ") else content
+        return {
+            'key': key,
+            'date': entry_date,
+            'sender': message.get('From', '') or '',
+            'subject': subject,
+            'thread_id': message.get(THREAD_HEADER, '') or '',
+            'text': body
+        }
+
+    def _tally(self, segment, texts):
+        """Add email texts to a month's aggregates"""
+        aggregates = segment['aggregates'] or {'total_emails': 0, 'categories': {}}
+        results = self.analyzer.start_analysis()
+        for text in texts:
+            self.analyzer.add_email(text)
+
+        aggregates['total_emails'] += results['total_emails']
+        for category, info in results['categories'].items():
+            merged = aggregates['categories'].setdefault(category, {'total_mentions': 0, 'emails_with_category': 0})
+            merged['total_mentions'] += info['total_mentions']
+            merged['emails_with_category'] += info['emails_with_category']
+        segment['aggregates'] = aggregates
+
+    def _read_mbox(self, filepath):
+        """Yield raw message bytes from an mbox download"""
+        mbox = open_mbox(filepath)
+        try:
+            if isinstance(mbox, IndexedMbox):
+                for i in range(len(mbox)):
+                    yield mbox.get_bytes(i)
+            else:
+                for key in mbox.keys():
+                    yield mbox.get_bytes(key)
+        finally:
+            mbox.close()
+
+    def compact_mbox(self, filepath, today=None):
+        """
+        Archive one mbox, skipping messages already archived
+
+        Returns:
+            (added, duplicates)
+        """
+        fallback = datetime.fromtimestamp(os.path.getmtime(filepath), tz=timezone.utc)
+        return self._archive(((raw, None) for raw in self._read_mbox(filepath)), fallback, today)
+
+    def _archive(self, messages, fallback=None, today=None):
+        """
+        Add messages to their monthly segments, skipping messages already archived
+
+        Args:
+            messages: Iterable of (raw bytes, UTC date 'YYYY-MM-DDTHH:MM:SS' or None
+                      to use the Date header)
+            fallback: datetime for messages without a usable date (default: now)
+            today: Day the retention tiers are computed for
+
+        Returns:
+            (added, duplicates)
+        """
+        raw_batches = {}     # month -> [mbox entry bytes]
+        text_batches = {}    # month -> [text records]
+        new_entries = []
+        duplicates = 0
+
+        for raw, entry_date in messages:
+            headers = BytesHeaderParser().parsebytes(raw)
+            message_id = (headers.get('Message-ID') or '').strip()
+            key = message_key(raw, message_id)
+            if key in self.dates:
+                duplicates += 1
+                continue
+
+            if entry_date is None:
+                try:
+                    sent = parsedate_to_datetime(headers.get('Date', ''))
+                except (TypeError, ValueError):
+                    sent = None
+                if sent is None:
+                    sent = fallback or datetime.now(timezone.utc)
+                if sent.tzinfo is not None:
+                    sent = sent.astimezone(timezone.utc).replace(tzinfo=None)
+                entry_date = sent.strftime('%Y-%m-%dT%H:%M:%S')
+            month = entry_date[:7]
+            self.dates[key] = entry_date
+
+            segment = self._segment(month, today)
+            segment['count'] += 1
+            segment['raw_bytes'] += len(raw)
+
+            if segment['tier'] == 'raw':
+                raw_batches.setdefault(month, []).append(format_mbox_entry(raw))
+            else:
+                record = self._normalize(email.message_from_bytes(raw), key, entry_date)
+                if segment['tier'] == 'text':
+                    text_batches.setdefault(month, []).append(record)
+                self._tally(segment, [(record['subject'] + " " if record['subject'] else "") + record['text']])
+
+            new_entries.append({
+                'key': key,
+                'date': entry_date,
+                'month': month,
+                'subject': (headers.get('Subject') or '')[:200],
+                'sender': headers.get('From') or '',
+                'thread_id': headers.get(THREAD_HEADER) or ''
+            })
+
+        # Each run appends one gzip member per segment - concatenated members are valid gzip
+        for month, batch in raw_batches.items():
+            with gzip.open(self._segment_path(month, 'raw'), 'ab', compresslevel=6) as f:
+                f.write(b''.join(batch))
+        for month, records in text_batches.items():
+            with gzip.open(self._segment_path(month, 'text'), 'ab', compresslevel=6) as f:
+                f.write(''.join(json.dumps(r) + "\n" for r in records).encode('utf-8'))
+
+        with open(self.index_file, 'a', encoding='utf-8') as f:
+            for entry in new_entries:
+                f.write(json.dumps(entry) + "\n")
+        self.entries.extend(new_entries)
+        self._save_manifest()
+
+        return len(new_entries), duplicates
+
+    def compact_store(self, store, older_than_days=STORE_RETENTION_DAYS, today=None):
+        """
+        Move message store emails older than `older_than_days` (whole days)
+        into the archive and drop them from the store
+
+        Args:
+            store: MessageStore to compact
+            older_than_days: Days of email the store keeps
+            today: Day the retention tiers are computed for
+
+        Returns:
+            (moved, duplicates) - duplicates were already archived (e.g. from an mbox)
+        """
+        cutoff = datetime.combine((datetime.now() - timedelta(days=older_than_days)).date(), datetime.min.time())
+        entries = store.select(None, cutoff)
+
+        unreadable = 0
+
+        def messages():
+            nonlocal unreadable
+            for entry in entries:
+                try:
+                    raw = store.get_raw(entry)
+                except (OSError, EOFError) as e:
+                    print(f"  ⚠ Could not read stored message {entry['sha'][:12]}: {e}")
+                    unreadable += 1
+                    continue
+                yield add_thread_header(raw, entry.get('thread_id')), entry['date']
+
+        added, duplicates = self._archive(messages(), today=today)
+        # Only dropped once the archive segments and index are written
+        store.remove(entries, before=cutoff.date())
+        if unreadable:
+            print(f"  ⚠ Dropped {unreadable} unreadable store entries")
+        return added, duplicates
+
+    def compact(self, folder='data/raw', older_than_days=7, keep=False, today=None,
+                store=None, store_days=STORE_RETENTION_DAYS):
+        """
+        Archive every mbox in a folder not modified for `older_than_days`,
+        delete the originals (unless keep=True), move store emails older than
+        `store_days` into the archive, and apply retention
+
+        Args:
+            store: MessageStore to compact too (None = mbox files only)
+
+        Returns:
+            Number of mbox files compacted
+        """
+        if store is not None:
+            added, duplicates = self.compact_store(store, store_days, today)
+            if added or duplicates:
+                print(f"  ✓ Message store: {added} archived, {duplicates} already archived "
+                      f"(keeping the last {store_days} days)")
+
+        if not os.path.isdir(folder):
+            print(f"⚠ No folder {folder}")
+            self.enforce_retention(today)
+            return 0
+
+        cutoff = datetime.now().timestamp() - older_than_days * 86400
+        mbox_files = sorted(os.path.join(folder, f) for f in os.listdir(folder) if f.endswith('.mbox'))
+        mbox_files = [f for f in mbox_files if os.path.getmtime(f) <= cutoff]
+
+        for filepath in mbox_files:
+            size_mb = os.path.getsize(filepath) / (1024 * 1024)
+            added, duplicates = self.compact_mbox(filepath, today)
+            print(f"  ✓ {os.path.basename(filepath)} ({size_mb:.1f} MB): {added} archived, {duplicates} already archived")
+            if not keep:
+                os.remove(filepath)
+                if os.path.exists(filepath + '.idx'):
+                    os.remove(filepath + '.idx')
+
+        self.enforce_retention(today)
+        return len(mbox_files)
+
+    def _iter_text_segment(self, month):
+        path = self._segment_path(month, 'text')
+        if not os.path.exists(path):
+            return
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+    def _iter_raw_segment(self, month):
+        path = self._segment_path(month, 'raw')
+        if os.path.exists(path):
+            yield from iter_segment_messages(path)
+
+    def enforce_retention(self, today=None):
+        """
+        Move months that aged out of their tier down to the next one
+
+        Returns:
+            Dictionary of tier changes, e.g. {'raw->text': 2}
+        """
+        changes = {}
+        for month, segment in sorted(self.segments.items()):
+            target = tier_for_month(month, today, self.raw_days, self.text_days)
+            if TIERS.index(target) <= TIERS.index(segment['tier']):
+                continue
+
+            if segment['tier'] == 'raw':
+                records = []
+                for raw in self._iter_raw_segment(month):
+                    key = self._raw_key(raw)
+                    records.append(self._normalize(email.message_from_bytes(raw), key, self.dates.get(key, '')))
+                segment['aggregates'] = None
+                self._tally(segment, [(r['subject'] + " " if r['subject'] else "") + r['text'] for r in records])
+
+                if target == 'text':
+                    tmp_path = self._segment_path(month, 'text') + '.tmp'
+                    with gzip.open(tmp_path, 'wt', encoding='utf-8', compresslevel=6) as f:
+                        for record in records:
+                            f.write(json.dumps(record) + "\n")
+                    os.replace(tmp_path, self._segment_path(month, 'text'))
+                os.remove(self._segment_path(month, 'raw'))
+
+            elif segment['tier'] == 'text':
+                if segment['aggregates'] is None:
+                    self._tally(segment, [(r['subject'] + " " if r['subject'] else "") + r['text']
+                                          for r in self._iter_text_segment(month)])
+                os.remove(self._segment_path(month, 'text'))
+
+            change = f"{segment['tier']}->{target}"
+            changes[change] = changes.get(change, 0) + 1
+            segment['tier'] = target
+            # Save after each month so an interruption never loses a demoted segment's aggregates
+            self._save_manifest()
+
+        for change, count in changes.items():
+            print(f"  ✓ {count} month(s) {change}")
+        return changes
+
+    @staticmethod
+    def _raw_key(raw):
+        headers = BytesHeaderParser().parsebytes(raw)
+        return message_key(raw, (headers.get('Message-ID') or '').strip())
+
+    def _months_between(self, start, end):
+        return [month for month in sorted(self.segments) if start[:7] <= month <= end[:7]]
+
+    def iter_messages(self, start, end):
+        """
+        Parsed messages with start <= date < end from the raw and text tiers
+
+        Text tier messages are rebuilt with Subject, From, Date, Message-ID and
+        thread headers and the normalized body.
+
+        Args:
+            start: datetime (UTC)
+            end: datetime (UTC)
+        """
+        start_text = start.strftime('%Y-%m-%dT%H:%M:%S')
+        end_text = end.strftime('%Y-%m-%dT%H:%M:%S')
+
+        for month in self._months_between(start_text, end_text):
+            tier = self.segments[month]['tier']
+            if tier == 'raw':
+                for raw in self._iter_raw_segment(month):
+                    if start_text <= self.dates.get(self._raw_key(raw), '') < end_text:
+                        yield email.message_from_bytes(raw)
+            elif tier == 'text':
+                for record in self._iter_text_segment(month):
+                    if start_text <= record['date'] < end_text:
+                        yield self._rebuild(record)
+
+    @staticmethod
+    def _rebuild(record):
+        """Email message from a text tier record"""
+        message = EmailMessage()
+        message['Subject'] = record['subject']
+        message['From'] = record['sender']
+        message['Date'] = email.utils.format_datetime(
+            datetime.strptime(record['date'], '%Y-%m-%dT%H:%M:%S').replace(tzinfo=timezone.utc))
+        if not record['key'].startswith('sha256:'):
+            message['Message-ID'] = record['key']
+        if record.get('thread_id'):
+            message[THREAD_HEADER] = record['thread_id']
+        message.set_content(record['text'])
+        return message
+
+    def export_mbox(self, output_file, start, end):
+        """
+        Write an archived period to an mbox for the analysis tools
+
+        Returns:
+            (exported, skipped_months) - months only kept as aggregates are skipped
+        """
+        start_text = start.strftime('%Y-%m-%dT%H:%M:%S')
+        end_text = end.strftime('%Y-%m-%dT%H:%M:%S')
+        skipped = [month for month in self._months_between(start_text, end_text)
+                   if self.segments[month]['tier'] == 'aggregate']
+
+        count = 0
+        mbox = mailbox.mbox(output_file)
+        mbox.lock()
+        try:
+            for message in self.iter_messages(start, end):
+                mbox.add(message)
+                count += 1
+        finally:
+            mbox.unlock()
+            mbox.close()
+        return count, skipped
+
+    def aggregates(self, start_month=None, end_month=None):
+        """
+        Monthly aggregates (every tier) for a month range
+
+        Raw months have no stored aggregates until they are demoted, so they
+        are computed on the fly.
+
+        Returns:
+            Dictionary of month -> {'total_emails', 'categories'}
+        """
+        result = {}
+        for month, segment in sorted(self.segments.items()):
+            if (start_month and month < start_month) or (end_month and month > end_month):
+                continue
+            if segment['aggregates'] is None:
+                if segment['tier'] == 'raw':
+                    texts = [self.analyzer._extract_email_content(email.message_from_bytes(raw))
+                             for raw in self._iter_raw_segment(month)]
+                else:
+                    texts = [(r['subject'] + " " if r['subject'] else "") + r['text']
+                             for r in self._iter_text_segment(month)]
+                scratch = {'aggregates': None}
+                self._tally(scratch, texts)
+                result[month] = scratch['aggregates']
+            else:
+                result[month] = segment['aggregates']
+        return result
+
+    def stats(self):
+        """Summary of the archive per tier"""
+        info = {tier: {'months': 0, 'messages': 0, 'raw_mb': 0.0, 'stored_mb': 0.0} for tier in TIERS}
+        for month, segment in self.segments.items():
+            tier = info[segment['tier']]
+            tier['months'] += 1
+            tier['messages'] += segment['count']
+            tier['raw_mb'] += segment['raw_bytes'] / (1024 * 1024)
+            if segment['tier'] != 'aggregate':
+                path = self._segment_path(month, segment['tier'])
+                if os.path.exists(path):
+                    tier['stored_mb'] += os.path.getsize(path) / (1024 * 1024)
+        return info
+
+
+def main():
+    """Command line archive maintenance"""
+    if len(sys.argv) < 2 or sys.argv[1] not in ('compact', 'retention', 'export', 'stats'):
+        print(__doc__)
+        return
+
+    archive = ArchiveManager()
+    command = sys.argv[1]
+
+    if command == 'compact':
+        days = int(sys.argv[2]) if len(sys.argv) > 2 else 7
+        store = None
+        if os.path.exists(os.path.join(DEFAULT_STORE_DIR, 'index.jsonl')):
+            store = MessageStore(DEFAULT_STORE_DIR)
+            print(f"Compacting message store emails older than {STORE_RETENTION_DAYS} days...")
+        print(f"Compacting mbox files in data/raw/ older than {days} days...")
+        count = archive.compact('data/raw', days, store=store)
+        print(f"✓ Compacted {count} mbox file(s)")
+
+    elif command == 'retention':
+        if not archive.enforce_retention():
+            print("✓ Every month is already in its retention tier")
+
+    elif command == 'export':
+        if len(sys.argv) != 5:
+            print("Usage: python archive_manager.py export START_DATE END_DATE output.mbox")
+            return
+        start = datetime.strptime(sys.argv[2], '%Y-%m-%d')
+        end = datetime.strptime(sys.argv[3], '%Y-%m-%d') + timedelta(days=1)
+        count, skipped = archive.export_mbox(sys.argv[4], start, end)
+        print(f"✓ Exported {count} messages to {sys.argv[4]}")
+        if skipped:
+            print(f"⚠ Only aggregates are kept for {', '.join(skipped)} - see 'stats'")
+
+    info = archive.stats()
+    print("\n" + "="*70)
+    print("EMAIL ARCHIVE")
+    print("="*70)
+    print(f"  Location: {archive.root}")
+    print(f"  Retention: raw {archive.raw_days} days, text {archive.text_days or 'forever'} days, aggregates forever")
+    for tier in TIERS:
+        data = info[tier]
+        if not data['months']:
+            continue
+        size = f", {data['stored_mb']:.2f} MB stored" if tier != 'aggregate' else ""
+        print(f"  {tier:10} {data['months']:3} months, {data['messages']} messages "
+              f"({data['raw_mb']:.2f} MB original{size})")
+    if command == 'stats':
+        for month, segment in sorted(archive.segments.items()):
+            print(f"    {month}: {segment['count']} emails ({segment['tier']})")
+    print("="*70)
+
+
+if __name__ == "__main__":
+    main()
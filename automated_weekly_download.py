@@ -4,7 +4,7 @@ Automated Weekly Email Download
 Run this script every Monday to automatically download last week's support emails
 """
 
-from gmail_downloader import GmailDownloader
+from gmail_downloader import GmailDownloader, download_problem
 from datetime import datetime
 
 def download_weekly_support_emails():
@@ -43,14 +43,21 @@ def download_weekly_support_emails():
     
     # Download
     try:
+        stats = {}
         downloader.download_to_mbox(
             output_file=filename,
             query=SEARCH_QUERY,
             max_results=MAX_RESULTS,
             days_back=DAYS_BACK,
-            show_progress=True
+            show_progress=True,
+            stats=stats
         )
         
+        problem = download_problem(stats)
+        if problem:
+            print(f"❌ Download incomplete: {problem}")
+            return False
+        
         print(f"\n✓ Weekly download complete!")
         print(f"  File: {filename}")
         print(f"\nNext steps:")
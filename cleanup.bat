@@ -8,10 +8,16 @@ echo ============================================================
 echo.
 echo This will delete:
 echo   - All downloaded email files (data/raw/*.mbox)
+echo   - The local message store (data/store/) and daily rollups (data/rollups/)
+echo   - Cached analysis results (data/cache/)
+echo   - The full-text search database (data/corpus.db)
 echo   - All generated reports (reports/*)
 echo   - Previous week comparison data
 echo.
 echo Files in root directory will NOT be deleted.
+echo The email archive (data/archive/) and results history (data/results_history.jsonl)
+echo are kept: their monthly aggregates are permanent history.
+echo To archive old emails before cleaning up, run: python archive_manager.py compact
 echo.
 
 set /p confirm="Continue? (y/n): "
@@ -32,6 +38,38 @@ if exist "data\raw\*.mbox" (
     echo   - No email files found in data/raw/
 )
 
+REM Delete message store
+if exist "data\store" (
+    rmdir /s /q "data\store"
+    echo   ✓ Deleted message store data/store/
+) else (
+    echo   - No message store found
+)
+
+REM Delete daily rollups
+if exist "data\rollups" (
+    rmdir /s /q "data\rollups"
+    echo   ✓ Deleted daily rollups data/rollups/
+) else (
+    echo   - No daily rollups found
+)
+
+REM Delete analysis cache
+if exist "data\cache" (
+    rmdir /s /q "data\cache"
+    echo   ✓ Deleted analysis cache data/cache/
+) else (
+    echo   - No analysis cache found
+)
+
+REM Delete search database
+if exist "data\corpus.db" (
+    del /q "data\corpus.db*"
+    echo   ✓ Deleted search database data/corpus.db
+) else (
+    echo   - No search database found
+)
+
 REM Delete report files
 if exist "reports\*.txt" (
     del /q "reports\*.txt"
@@ -8,10 +8,16 @@ echo "============================================================"
 echo ""
 echo "This will delete:"
 echo "  - All downloaded email files (data/raw/*.mbox)"
+echo "  - The local message store (data/store/) and daily rollups (data/rollups/)"
+echo "  - Cached analysis results (data/cache/)"
+echo "  - The full-text search database (data/corpus.db)"
 echo "  - All generated reports (reports/*)"
 echo "  - Previous week comparison data"
 echo ""
 echo "Files in root directory will NOT be deleted."
+echo "The email archive (data/archive/) and results history (data/results_history.jsonl)"
+echo "are kept: their monthly aggregates are permanent history."
+echo "To archive old emails before cleaning up, run: python archive_manager.py compact"
 echo ""
 
 read -p "Continue? (y/n): " confirm
@@ -32,6 +38,38 @@ else
     echo "  - No email files found in data/raw/"
 fi
 
+# Delete message store
+if [ -d "data/store" ]; then
+    rm -rf data/store
+    echo "  ✓ Deleted message store data/store/"
+else
+    echo "  - No message store found"
+fi
+
+# Delete daily rollups
+if [ -d "data/rollups" ]; then
+    rm -rf data/rollups
+    echo "  ✓ Deleted daily rollups data/rollups/"
+else
+    echo "  - No daily rollups found"
+fi
+
+# Delete analysis cache
+if [ -d "data/cache" ]; then
+    rm -rf data/cache
+    echo "  ✓ Deleted analysis cache data/cache/"
+else
+    echo "  - No analysis cache found"
+fi
+
+# Delete search database
+if [ -f "data/corpus.db" ]; then
+    rm -f data/corpus.db data/corpus.db-wal data/corpus.db-shm
+    echo "  ✓ Deleted search database data/corpus.db"
+else
+    echo "  - No search database found"
+fi
+
 # Delete report files
 if ls reports/*.txt 1> /dev/null 2>&1; then
     rm -f reports/*.txt
@@ -0,0 +1,471 @@
+#!/usr/bin/env python3
+"""
+Support Email Corpus Database
+Loads parsed emails (headers, normalized body, date, thread) into a local
+SQLite database with an FTS5 full-text index, so ad-hoc questions like
+"how many emails mention 'did not receive' this week" are answered from the
+index instead of re-reading every mbox.
+
+Ingesting is incremental: mbox files that are unchanged since they were
+loaded are skipped, and only store emails not in the database yet are read.
+Emails stay in the database after they leave the store (e.g. moved to the
+archive), so counts cover everything ever ingested.
+
+search_index.py adds needle counts (phrases, NEAR/k, misspellings) on top of
+this database; it reads word positions from the same FTS5 index.
+
+Usage:
+    python corpus_db.py ingest data/raw/*.mbox          # load mbox dumps
+    python corpus_db.py ingest --store                  # load the message store
+    python corpus_db.py count '"did not receive"' --days 7
+    python corpus_db.py search 'firmware AND (reboot OR restart)' --days 30
+    python corpus_db.py stats
+
+Queries use SQLite FTS5 syntax: "exact phrase", a AND b, a OR b, a NOT b, NEAR(a b, 5),
+prefix*, and column filters such as subject:firmware.
+"""
+
+import os
+import re
+import sys
+import time
+import sqlite3
+import hashlib
+import argparse
+from datetime import datetime, timedelta, timezone
+from email.utils import parsedate_to_datetime, parseaddr
+from mbox_writer import open_mbox, THREAD_HEADER
+
+DEFAULT_DB_FILE = "data/corpus.db"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS emails (
+    id INTEGER PRIMARY KEY,
+    message_key TEXT UNIQUE NOT NULL,
+    message_id TEXT,
+    thread_id TEXT,
+    date TEXT,
+    sender TEXT,
+    subject TEXT,
+    body TEXT,
+    source TEXT
+);
+CREATE INDEX IF NOT EXISTS emails_date ON emails(date);
+CREATE INDEX IF NOT EXISTS emails_thread ON emails(thread_id);
+CREATE VIRTUAL TABLE IF NOT EXISTS emails_fts USING fts5(
+    subject, body,
+    content='emails', content_rowid='id',
+    tokenize='unicode61 remove_diacritics 2'
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS emails_vocab USING fts5vocab(emails_fts, row);
+CREATE VIRTUAL TABLE IF NOT EXISTS emails_positions USING fts5vocab(emails_fts, instance);
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    size INTEGER,
+    mtime_ns INTEGER
+);
+"""
+
+_TAGS = re.compile(r'<[^>]+>')
+
+
+def _message_date(message):
+    """Date header as a naive UTC 'YYYY-MM-DDTHH:MM:SS' string (None if missing)"""
+    try:
+        date = parsedate_to_datetime(message.get('Date', ''))
+    except (TypeError, ValueError):
+        return None
+    if date is None:
+        return None
+    if date.tzinfo is not None:
+        date = date.astimezone(timezone.utc).replace(tzinfo=None)
+    return date.strftime('%Y-%m-%dT%H:%M:%S')
+
+
+def _body_text(message):
+    """Plain-text body with whitespace collapsed (HTML parts are used only if there is no text part)"""
+    plain = []
+    html = []
+    for part in message.walk():
+        content_type = part.get_content_type()
+        if content_type not in ('text/plain', 'text/html') or part.get_filename():
+            continue
+        try:
+            payload = part.get_payload(decode=True)
+        except Exception:
+            continue
+        if not payload:
+            continue
+        text = payload.decode(part.get_content_charset() or 'utf-8', errors='ignore')
+        (plain if content_type == 'text/plain' else html).append(text)
+
+    text = ' '.join(plain) if plain else _TAGS.sub(' ', ' '.join(html))
+    return ' '.join(text.split())
+
+
+def store_key(entry):
+    """Database key of a message store entry (its Message-ID, else its sha)"""
+    return entry.get('message_id') or 'sha:' + entry['sha']
+
+
+def _file_signature(path):
+    stat = os.stat(path)
+    return stat.st_size, stat.st_mtime_ns
+
+
+def _utc_bound(value):
+    """Local datetime → naive UTC index string"""
+    return value.astimezone().astimezone(timezone.utc).strftime('%Y-%m-%dT%H:%M:%S')
+
+
+class CorpusDB:
+    def __init__(self, db_file=DEFAULT_DB_FILE, shared=False):
+        """
+        Open (or create) the corpus database
+
+        Args:
+            db_file: SQLite database path (default: data/corpus.db)
+            shared: Allow the connection to be used from several threads
+                    (the caller serializes access)
+        """
+        self.db_file = db_file
+        folder = os.path.dirname(db_file)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+
+        self.conn = sqlite3.connect(db_file, check_same_thread=not shared)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(_SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def __len__(self):
+        return self.conn.execute("SELECT COUNT(*) FROM emails").fetchone()[0]
+
+    def keys(self):
+        """Set of message keys already in the database"""
+        return {row[0] for row in self.conn.execute("SELECT message_key FROM emails")}
+
+    def ingest_messages(self, messages, source='', batch_size=500, show_progress=True):
+        """
+        Add parsed emails, skipping ones already in the database
+
+        Args:
+            messages: Iterable of email.message.Message objects, or
+                      (message, key, date) tuples when the caller already knows
+                      a stable key and UTC date (e.g. the message store)
+            source: Label stored with each row (file name or 'store')
+            batch_size: Rows per transaction
+            show_progress: Print progress every few thousand emails
+
+        Returns:
+            Number of new emails added
+        """
+        existing = self.keys()
+        added = 0
+        seen = 0
+        batch = []
+
+        for item in messages:
+            if isinstance(item, tuple):
+                message, key, date = item
+            else:
+                message, key, date = item, None, None
+            seen += 1
+
+            message_id = (message.get('Message-ID') or '').strip()
+            subject = str(message.get('Subject', '') or '')
+            body = _body_text(message)
+
+            if key is None:
+                key = message_id or 'sha:' + hashlib.sha256(
+                    f"{message.get('From', '')}\n{message.get('Date', '')}\n{subject}\n{body}".encode('utf-8')
+                ).hexdigest()
+            if key in existing:
+                continue
+            existing.add(key)
+
+            batch.append((
+                key,
+                message_id,
+                str(message.get(THREAD_HEADER, '') or '') or None,
+                date or _message_date(message),
+                parseaddr(str(message.get('From', '')))[1].lower(),
+                subject,
+                body,
+                source
+            ))
+
+            if len(batch) >= batch_size:
+                added += self._insert(batch)
+                batch = []
+                if show_progress and added % 5000 < batch_size:
+                    print(f"  Ingested {added} emails...")
+
+        if batch:
+            added += self._insert(batch)
+
+        if show_progress:
+            print(f"✓ {added} new emails added ({seen - added} already indexed)")
+        return added
+
+    def _insert(self, rows):
+        """Insert a batch of rows and their full-text entries in one transaction"""
+        with self.conn:
+            for row in rows:
+                cursor = self.conn.execute(
+                    "INSERT OR IGNORE INTO emails "
+                    "(message_key, message_id, thread_id, date, sender, subject, body, source) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)", row)
+                if cursor.rowcount:
+                    self.conn.execute("INSERT INTO emails_fts(rowid, subject, body) VALUES (?, ?, ?)",
+                                      (cursor.lastrowid, row[5], row[6]))
+        return len(rows)
+
+    def file_changed(self, path):
+        """True if a file is new or changed since it was last ingested"""
+        row = self.conn.execute("SELECT size, mtime_ns FROM files WHERE path = ?",
+                                (os.path.abspath(path),)).fetchone()
+        return row is None or tuple(row) != _file_signature(path)
+
+    def ingested_files(self):
+        """Absolute paths of every file ingested so far"""
+        return [row[0] for row in self.conn.execute("SELECT path FROM files")]
+
+    def _record_file(self, path):
+        size, mtime_ns = _file_signature(path)
+        with self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO files (path, size, mtime_ns) VALUES (?, ?, ?)",
+                              (os.path.abspath(path), size, mtime_ns))
+
+    def forget_file(self, path):
+        """
+        Forget a deleted file: a plain-text document is removed, while the
+        emails of an mbox stay in the database like the rest of the corpus
+        """
+        self._remove('file:' + os.path.abspath(path))
+        with self.conn:
+            self.conn.execute("DELETE FROM files WHERE path = ?", (os.path.abspath(path),))
+
+    def _remove(self, key):
+        """Delete one email and its full-text entry"""
+        with self.conn:
+            self.conn.execute(
+                "INSERT INTO emails_fts(emails_fts, rowid, subject, body) "
+                "SELECT 'delete', id, subject, body FROM emails WHERE message_key = ?", (key,))
+            self.conn.execute("DELETE FROM emails WHERE message_key = ?", (key,))
+
+    def ingest_mbox(self, filepath, show_progress=True, force=False):
+        """
+        Load every email in an mbox file
+
+        Args:
+            filepath: mbox to load
+            show_progress: Print progress
+            force: Read the file even if it is unchanged since the last ingest
+
+        Returns:
+            Number of new emails added
+        """
+        if not force and not self.file_changed(filepath):
+            if show_progress:
+                print(f"✓ {filepath} unchanged since the last ingest")
+            return 0
+        mbox = open_mbox(filepath)
+        try:
+            added = self.ingest_messages(iter(mbox), source=os.path.basename(filepath),
+                                         show_progress=show_progress)
+        finally:
+            mbox.close()
+        self._record_file(filepath)
+        return added
+
+    def ingest_text(self, filepath):
+        """
+        Load a plain-text file (not an mbox) as one email whose body is the file
+
+        The document is replaced whenever the file changes.
+
+        Returns:
+            Number of new emails added (1, or 0 if the file is unchanged)
+        """
+        if not self.file_changed(filepath):
+            return 0
+        with open(filepath, 'r', encoding='utf-8', errors='ignore') as f:
+            text = f.read()
+        key = 'file:' + os.path.abspath(filepath)
+        self._remove(key)
+        self._insert([(key, '', None, None, '', '', ' '.join(text.split()), filepath)])
+        self._record_file(filepath)
+        return 1
+
+    def ingest_store(self, store, start=None, end=None, show_progress=True):
+        """Load a date range (default: everything) from a MessageStore, reading only new emails"""
+        existing = self.keys()
+
+        def messages():
+            for entry in store.select(start, end):
+                key = store_key(entry)
+                if key in existing:
+                    continue
+                try:
+                    yield store.get_message(entry), key, entry['date']
+                except (OSError, EOFError) as e:
+                    print(f"  ⚠ Could not read stored message {entry['sha'][:12]}: {e}")
+
+        return self.ingest_messages(messages(), source='store', show_progress=show_progress)
+
+    def _where(self, query, start, end):
+        """WHERE clause and parameters for a full-text query plus date range"""
+        clauses = ["emails_fts MATCH ?"]
+        params = [query]
+        if start is not None:
+            clauses.append("emails.date >= ?")
+            params.append(_utc_bound(start))
+        if end is not None:
+            clauses.append("emails.date < ?")
+            params.append(_utc_bound(end))
+        return " AND ".join(clauses), params
+
+    def count(self, query, start=None, end=None):
+        """
+        Number of emails matching an FTS5 query
+
+        Args:
+            query: FTS5 query ('"did not receive"', 'firmware AND reboot', ...)
+            start: Optional local datetime lower bound (inclusive)
+            end: Optional local datetime upper bound (exclusive)
+        """
+        where, params = self._where(query, start, end)
+        sql = ("SELECT COUNT(*) FROM emails_fts JOIN emails ON emails.id = emails_fts.rowid "
+               f"WHERE {where}")
+        return self.conn.execute(sql, params).fetchone()[0]
+
+    def count_threads(self, query, start=None, end=None):
+        """Number of distinct conversations with at least one matching email"""
+        where, params = self._where(query, start, end)
+        sql = ("SELECT COUNT(DISTINCT COALESCE(emails.thread_id, emails.message_key)) "
+               "FROM emails_fts JOIN emails ON emails.id = emails_fts.rowid "
+               f"WHERE {where}")
+        return self.conn.execute(sql, params).fetchone()[0]
+
+    def search(self, query, start=None, end=None, limit=20):
+        """
+        Best-matching emails for an FTS5 query (bm25 ranking)
+
+        Returns:
+            List of dicts with date, sender, subject, thread_id and a snippet
+        """
+        where, params = self._where(query, start, end)
+        sql = ("SELECT emails.date, emails.sender, emails.subject, emails.thread_id, "
+               "snippet(emails_fts, 1, '[', ']', '...', 12) "
+               "FROM emails_fts JOIN emails ON emails.id = emails_fts.rowid "
+               f"WHERE {where} ORDER BY bm25(emails_fts) LIMIT ?")
+        rows = self.conn.execute(sql, params + [limit]).fetchall()
+        return [
+            {'date': date, 'sender': sender, 'subject': subject, 'thread_id': thread_id, 'snippet': snippet}
+            for date, sender, subject, thread_id, snippet in rows
+        ]
+
+    def stats(self):
+        """Summary of the database contents"""
+        count, first, last, threads = self.conn.execute(
+            "SELECT COUNT(*), MIN(date), MAX(date), COUNT(DISTINCT thread_id) FROM emails").fetchone()
+        return {
+            'emails': count,
+            'threads': threads,
+            'first_date': first,
+            'last_date': last,
+            'size_mb': os.path.getsize(self.db_file) / (1024 * 1024)
+        }
+
+
+def _date_range(args):
+    """(start, end) local datetimes from --days / --since / --until"""
+    start = end = None
+    if args.days:
+        start = datetime.combine((datetime.now() - timedelta(days=args.days)).date(), datetime.min.time())
+    if args.since:
+        start = datetime.strptime(args.since, '%Y-%m-%d')
+    if args.until:
+        end = datetime.strptime(args.until, '%Y-%m-%d') + timedelta(days=1)
+    return start, end
+
+
+def main():
+    """Command line ingest and query"""
+    parser = argparse.ArgumentParser(description="Full-text support email database",
+                                     formatter_class=argparse.RawDescriptionHelpFormatter,
+                                     epilog=__doc__.split('Usage:')[1])
+    parser.add_argument('--db', default=DEFAULT_DB_FILE, help="database file (default: data/corpus.db)")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    ingest = commands.add_parser('ingest', help="load mbox files or the message store")
+    ingest.add_argument('mbox_files', nargs='*')
+    ingest.add_argument('--store', nargs='?', const='data/store', help="message store directory")
+
+    for name, help_text in (('count', "count matching emails"), ('search', "show best-matching emails")):
+        command = commands.add_parser(name, help=help_text)
+        command.add_argument('query', help="FTS5 query, e.g. '\"did not receive\"'")
+        command.add_argument('--days', type=int, help="only the last N days")
+        command.add_argument('--since', help="start date YYYY-MM-DD")
+        command.add_argument('--until', help="end date YYYY-MM-DD (inclusive)")
+        if name == 'search':
+            command.add_argument('--limit', type=int, default=20)
+
+    commands.add_parser('stats', help="show database summary")
+    args = parser.parse_args()
+
+    db = CorpusDB(args.db)
+    try:
+        if args.command == 'ingest':
+            for filepath in args.mbox_files:
+                print(f"Ingesting {filepath}...")
+                db.ingest_mbox(filepath)
+            if args.store:
+                from message_store import MessageStore
+                print(f"Ingesting message store {args.store}...")
+                db.ingest_store(MessageStore(args.store))
+
+        elif args.command in ('count', 'search'):
+            start, end = _date_range(args)
+            began = time.perf_counter()
+            try:
+                if args.command == 'count':
+                    emails = db.count(args.query, start, end)
+                    threads = db.count_threads(args.query, start, end)
+                else:
+                    results = db.search(args.query, start, end, args.limit)
+            except sqlite3.OperationalError as e:
+                print(f"❌ Invalid query: {e}")
+                sys.exit(1)
+            elapsed_ms = (time.perf_counter() - began) * 1000
+
+            if args.command == 'count':
+                print(f"{args.query}: {emails} emails in {threads} conversations ({elapsed_ms:.1f} ms)")
+            else:
+                for result in results:
+                    print(f"\n{result['date']}  {result['sender']}")
+                    print(f"  Subject: {result['subject']}")
+                    print(f"  {result['snippet']}")
+                print(f"\n{len(results)} results ({elapsed_ms:.1f} ms)")
+
+        if args.command in ('ingest', 'stats'):
+            info = db.stats()
+            print("\n" + "="*70)
+            print("CORPUS DATABASE")
+            print("="*70)
+            print(f"  Location: {db.db_file}")
+            print(f"  Emails: {info['emails']} ({info['threads']} Gmail threads)")
+            if info['emails']:
+                print(f"  Date range: {info['first_date']} - {info['last_date']} (UTC)")
+                print(f"  Size: {info['size_mb']:.2f} MB")
+            print("="*70)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
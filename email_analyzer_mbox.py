@@ -1,8 +1,7 @@
 import os
 import csv
 import json
-import mailbox
-from collections import Counter
+from mbox_writer import open_mbox
 from datetime import datetime
 import email
 from email import policy
@@ -118,7 +117,7 @@ class EmailAnalyzer:
             file_size_mb = file_size / (1024 * 1024)
             print(f"File size: {file_size_mb:.2f} MB")
             
-            mbox = mailbox.mbox(filepath)
+            mbox = open_mbox(filepath)
             total_messages = len(mbox)
             print(f"Total messages in mbox: {total_messages}")
             
@@ -250,44 +249,65 @@ class EmailAnalyzer:
         """
         print(f"\nAnalyzing {len(emails)} emails...")
         
+        self.start_analysis()
+        
+        for i, email in enumerate(emails):
+            if show_progress and (i + 1) % 100 == 0:
+                print(f"  Analyzing email {i + 1}/{len(emails)}...")
+            
+            self.add_email(email)
+        
+        print("Analysis complete!")
+        return self.results
+    
+    def start_analysis(self):
+        """
+        Reset results so emails can be tallied one at a time with add_email()
+        
+        Used by streaming mode, where emails arrive while the download is still running.
+        """
         self.results = {
-            'total_emails': len(emails),
+            'total_emails': 0,
             'categories': {},
             'keyword_details': {}
         }
         
-        for category, keywords in self.keyword_categories.items():
-            category_count = 0
-            emails_with_category = 0
-            keyword_counts = Counter()
-            
-            for i, email in enumerate(emails):
-                if show_progress and (i + 1) % 100 == 0:
-                    print(f"  Analyzing email {i + 1}/{len(emails)}...")
-                
-                email_lower = email.lower()
-                email_has_category = False
-                
-                for keyword in keywords:
-                    keyword_lower = keyword.lower()
-                    count = email_lower.count(keyword_lower)
-                    if count > 0:
-                        category_count += count
-                        keyword_counts[keyword] += count
-                        email_has_category = True
-                
-                if email_has_category:
-                    emails_with_category += 1
-            
+        for category in self.keyword_categories:
             self.results['categories'][category] = {
-                'total_mentions': category_count,
-                'emails_with_category': emails_with_category,
-                'keywords': dict(keyword_counts)
+                'total_mentions': 0,
+                'emails_with_category': 0,
+                'keywords': {}
             }
         
-        print("Analysis complete!")
         return self.results
     
+    def add_email(self, email):
+        """
+        Tally keyword mentions for a single email into the current results
+        
+        Args:
+            email: Email text string
+        """
+        if not self.results:
+            self.start_analysis()
+        
+        self.results['total_emails'] += 1
+        email_lower = email.lower()
+        
+        for category, keywords in self.keyword_categories.items():
+            data = self.results['categories'][category]
+            email_has_category = False
+            
+            for keyword in keywords:
+                count = email_lower.count(keyword.lower())
+                if count > 0:
+                    data['total_mentions'] += count
+                    data['keywords'][keyword] = data['keywords'].get(keyword, 0) + count
+                    email_has_category = True
+            
+            if email_has_category:
+                data['emails_with_category'] += 1
+    
     def generate_report(self, output_file=None):
         """
         Generate a human-readable report
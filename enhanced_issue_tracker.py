@@ -1,11 +1,34 @@
 import os
 import csv
 import json
-import mailbox
+from mbox_writer import open_mbox
 from collections import Counter, defaultdict
 from datetime import datetime
 import re
 
+# Severity score bands (scores run 0-20)
+SEVERITY_BANDS = (('critical', 15), ('high', 10), ('medium', 5), ('low', 0))
+
+
+def severity_distribution(scores):
+    """Count severity scores per band (critical 15+, high 10-14, medium 5-9, low 0-4)"""
+    distribution = {band: 0 for band, _ in SEVERITY_BANDS}
+    for score in scores:
+        for band, minimum in SEVERITY_BANDS:
+            if score >= minimum:
+                distribution[band] += 1
+                break
+    return distribution
+
+
+def affected_products(matched_emails):
+    """Number of matched conversations mentioning each affected product"""
+    counts = Counter()
+    for email_data in matched_emails:
+        counts.update(set(email_data.get('mentioned_products', [])))
+    return dict(counts)
+
+
 class IssueTracker:
     def __init__(self, issue_config_file=None):
         """
@@ -173,7 +196,7 @@ class IssueTracker:
             file_size = os.path.getsize(filepath) / (1024 * 1024)
             print(f"File size: {file_size:.2f} MB")
             
-            mbox = mailbox.mbox(filepath)
+            mbox = open_mbox(filepath)
             total_messages = len(mbox)
             print(f"Total messages: {total_messages}")
             
@@ -194,13 +217,7 @@ class IssueTracker:
                         emails.append(email_text)
                         
                         # Extract metadata
-                        meta = {
-                            'subject': message.get('Subject', ''),
-                            'from': message.get('From', ''),
-                            'date': message.get('Date', ''),
-                            'message_id': message.get('Message-ID', f'email_{count}')
-                        }
-                        metadata.append(meta)
+                        metadata.append(self._extract_metadata(message, count))
                         count += 1
                 except:
                     continue
@@ -212,6 +229,16 @@ class IssueTracker:
         
         return emails, metadata
     
+    def _extract_metadata(self, message, index):
+        """Extract subject/from/date/message-id/thread-id metadata from email message"""
+        return {
+            'subject': message.get('Subject', ''),
+            'from': message.get('From', ''),
+            'date': message.get('Date', ''),
+            'message_id': message.get('Message-ID', f'email_{index}'),
+            'thread_id': message.get('X-GM-THRID', '')
+        }
+    
     def _extract_email_content(self, message):
         """Extract text content from email message"""
         email_text = ""
@@ -271,18 +298,27 @@ class IssueTracker:
         return emails, metadata
     
     def deduplicate_keep_highest_severity(self, matched_emails):
-        """Keep only the highest severity email from each conversation thread"""
+        """
+        Keep only the highest severity email from each conversation thread
+        
+        Emails downloaded from Gmail are grouped by their exact thread ID;
+        others fall back to grouping by subject without Re:/Fwd: prefixes.
+        """
         conversations = {}
         
         for email_data in matched_emails:
-            subject = email_data.get('metadata', {}).get('subject', '')
-            # Clean subject - remove Re:, RE:, Fwd:, FW: prefixes
-            clean_subject = re.sub(r'^(Re:|RE:|Fwd:|FW:)\s*', '', subject, flags=re.IGNORECASE).strip()
+            meta = email_data.get('metadata', {})
+            if meta.get('thread_id'):
+                key = ('thread', meta['thread_id'])
+            else:
+                # Clean subject - remove Re:, RE:, Fwd:, FW: prefixes
+                subject = meta.get('subject', '')
+                key = ('subject', re.sub(r'^(Re:|RE:|Fwd:|FW:)\s*', '', subject, flags=re.IGNORECASE).strip())
             severity = email_data.get('severity_score', 0)
             
             # Keep the highest severity email for each conversation
-            if clean_subject not in conversations or severity > conversations[clean_subject]['severity_score']:
-                conversations[clean_subject] = email_data
+            if key not in conversations or severity > conversations[key]['severity_score']:
+                conversations[key] = email_data
         
         return list(conversations.values())
     
@@ -400,9 +436,6 @@ class IssueTracker:
                 }
                 matched_emails.append(email_data)
         
-        # NEW: Deduplicate conversation threads (keep highest severity from each thread)
-        matched_emails = self.deduplicate_keep_highest_severity(matched_emails)
-        
         # NEW: Deduplicate conversation threads (keep highest severity from each thread)
         original_count = len(matched_emails)
         matched_emails = self.deduplicate_keep_highest_severity(matched_emails)
@@ -431,7 +464,9 @@ class IssueTracker:
             'severity_scores': severity_scores,
             'avg_severity': avg_severity,
             'high_severity_count': high_severity_count,
-            'critical_severity_count': critical_severity_count
+            'critical_severity_count': critical_severity_count,
+            'severity_distribution': severity_distribution(severity_scores),
+            'affected_products': affected_products(matched_emails)
         }
         
         self.affected_emails = matched_emails
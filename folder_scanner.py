@@ -0,0 +1,454 @@
+#!/usr/bin/env python3
+"""
+Folder Scanner
+Counts any number of needles across every file in a folder - or every email
+in the message store - in one pass per file, with files scanned in parallel
+(processes by default, threads with --threads).
+
+Without --folder the message store (data/store, where the weekly and monthly
+runs keep downloads) is scanned when it exists, else data/raw. Each stored
+email is one file: its decompressed raw bytes are matched like a file's.
+
+Matching is case-insensitive. ASCII needles are matched directly on the
+memory-mapped bytes of each file (no decoding, no lowercased copy). Non-ASCII
+needles fall back to reading the file as text in chunks; the last (longest
+needle - 1) characters of a chunk are carried into the next one, so matches
+that straddle a chunk boundary are counted exactly once.
+
+For each needle the scan reports how many files contain it and how many
+times it occurs in total. Per-file results are cached (scan_cache.py), so a
+re-run with the same needles only reads new or changed files - or, for the
+store, emails added since the last scan (stored emails are cached by sha).
+
+Usage:
+    python folder_scanner.py "did not receive" "didn't recieve link" onvif
+    python folder_scanner.py --folder data/raw --threads --workers 4 vlan cmp
+    python folder_scanner.py --store onvif            # the message store only
+    python folder_scanner.py --no-cache onvif
+"""
+
+import os
+import re
+import sys
+import gzip
+import mmap
+import argparse
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from scan_cache import ScanCache, store_source
+from message_store import MessageStore, DEFAULT_STORE_DIR
+
+DEFAULT_FOLDER = "data/raw"
+CHUNK_SIZE = 1024 * 1024  # 1MB
+
+
+# UTF-8 characters whose Unicode lowercase contains ASCII letters
+# (U+0130 'İ' -> 'i̇', U+212A KELVIN SIGN -> 'k'); files containing them need
+# the Unicode path so they match exactly like str.lower() would
+_FOLDS_TO_ASCII = ('\u0130'.encode('utf-8'), '\u212a'.encode('utf-8'))
+
+
+def _is_ascii(text):
+    return all(ord(char) < 128 for char in text)
+
+
+class _Alternation:
+    """One regex alternation over a set of lowercased needles (str or ASCII bytes)"""
+
+    def __init__(self, needles, binary=False):
+        """
+        Args:
+            needles: Lowercased needles
+            binary: Match lowercased bytes instead of lowercased text
+        """
+        keys = [needle.encode('ascii') for needle in needles] if binary else list(needles)
+        empty = b'' if binary else ''
+
+        # Longest first, so the alternation prefers the longest needle at a position
+        ordered = sorted(keys, key=len, reverse=True)
+        self.pattern = re.compile((b'|' if binary else '|').join(re.escape(key) for key in ordered))
+
+        self.by_first = {}
+        for needle, key in zip(needles, keys):
+            self.by_first.setdefault(key[0], []).append((needle, key))
+
+        # Characters carried between chunks so a match can't be split
+        self.overlap = max(len(key) for key in keys) - 1
+        self.empty = empty
+
+    def count(self, buffer, min_end=0):
+        """
+        Needle occurrences in a lowercased buffer
+
+        Each search restarts one character after the previous match start, so
+        overlapping occurrences are found while the regex engine still skips
+        ahead to the next candidate on its own.
+        """
+        hits = Counter()
+        search = self.pattern.search
+        match = search(buffer)
+        while match:
+            position = match.start()
+            for needle, key in self.by_first[buffer[position]]:
+                if position + len(key) > min_end and buffer.startswith(key, position):
+                    hits[needle] += 1
+            match = search(buffer, position + 1)
+        return hits
+
+    def count_chunks(self, chunks):
+        """
+        Needle occurrences across lowercased chunks of one file
+
+        The last (longest needle - 1) characters of each chunk are carried
+        into the next, so boundary matches are counted exactly once.
+        """
+        hits = Counter()
+        tail = self.empty
+        for chunk in chunks:
+            buffer = tail + chunk
+            hits.update(self.count(buffer, min_end=len(tail)))
+            tail = buffer[-self.overlap:] if self.overlap else self.empty
+        return hits
+
+
+class MultiNeedleMatcher:
+    """
+    Finds every occurrence of several needles in one pass over a file
+
+    A single regex alternation finds each position where any needle starts
+    (searching again from the next character, so overlapping occurrences
+    count); the needles sharing that first character are then confirmed with
+    startswith().
+
+    ASCII needles are matched on the raw bytes of a memory-mapped file, one
+    ASCII-lowercased chunk at a time - nothing is decoded. Non-ASCII needles,
+    and files containing characters that lowercase to ASCII, are read as text
+    in chunks and lowercased.
+    """
+
+    def __init__(self, needles):
+        """
+        Args:
+            needles: Strings to count (matched case-insensitively)
+        """
+        self.needles = list(dict.fromkeys(needle.lower() for needle in needles if needle))
+        if not self.needles:
+            raise ValueError("No needles to scan for")
+
+        ascii_needles = [needle for needle in self.needles if _is_ascii(needle)]
+        unicode_needles = [needle for needle in self.needles if not _is_ascii(needle)]
+
+        self._text_all = _Alternation(self.needles)
+        self._bytes = _Alternation(ascii_needles, binary=True) if ascii_needles else None
+        self._text_unicode = _Alternation(unicode_needles) if unicode_needles else None
+
+    def count(self, text, min_end=0):
+        """
+        Count needle occurrences in lowercased text
+
+        Args:
+            text: Lowercased text to search
+            min_end: Only count matches ending after this offset (skips matches
+                     that lie entirely in the carried-over overlap)
+
+        Returns:
+            Counter of needle -> occurrences
+        """
+        return self._text_all.count(text, min_end)
+
+    def scan_bytes(self, data):
+        """
+        Count needle occurrences in raw bytes held in memory (e.g. one stored email)
+
+        Returns:
+            Counter of needle -> occurrences
+        """
+        if any(sequence in data for sequence in _FOLDS_TO_ASCII):
+            return self._text_all.count(data.decode('utf-8', errors='ignore').lower())
+        hits = self._bytes.count(data.lower()) if self._bytes else Counter()
+        if self._text_unicode:
+            hits.update(self._text_unicode.count(data.decode('utf-8', errors='ignore').lower()))
+        return hits
+
+    def _scan_text(self, path, alternation, chunk_size):
+        """Count needles in a file decoded as UTF-8 and lowercased, chunk by chunk"""
+        with open(path, 'r', encoding='utf-8', errors='ignore') as f:
+            return alternation.count_chunks(chunk.lower() for chunk in iter(lambda: f.read(chunk_size), ''))
+
+    def scan_file(self, path, chunk_size=CHUNK_SIZE):
+        """
+        Count needle occurrences in a file
+
+        Args:
+            path: File to scan
+            chunk_size: Bytes (or characters, when read as text) per chunk
+
+        Returns:
+            Counter of needle -> occurrences
+        """
+        size = os.path.getsize(path)
+        if size == 0:
+            return Counter()
+
+        with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            if any(data.find(sequence) != -1 for sequence in _FOLDS_TO_ASCII):
+                return self._scan_text(path, self._text_all, chunk_size)
+            hits = Counter()
+            if self._bytes:
+                # bytes.lower() only folds A-Z, so UTF-8 sequences pass through untouched
+                hits = self._bytes.count_chunks(data[start:start + chunk_size].lower()
+                                                for start in range(0, size, chunk_size))
+
+        if self._text_unicode:
+            hits.update(self._scan_text(path, self._text_unicode, chunk_size))
+        return hits
+
+
+# One matcher per worker process, built on first use
+_matchers = {}
+
+
+def _matcher(needles):
+    matcher = _matchers.get(needles)
+    if matcher is None:
+        matcher = _matchers[needles] = MultiNeedleMatcher(needles)
+    return matcher
+
+
+def _scan_file(args):
+    """Worker: (path, needles, chunk_size) -> (path, hits)"""
+    path, needles, chunk_size = args
+    try:
+        return path, _matcher(needles).scan_file(path, chunk_size)
+    except OSError as e:
+        print(f"  ⚠ Could not read {path}: {e}")
+        return path, None
+
+
+def _scan_stored(args):
+    """Worker: (sha, object path, needles) -> (sha, hits) for one stored email"""
+    sha, path, needles = args
+    try:
+        with gzip.open(path, 'rb') as f:
+            return sha, _matcher(needles).scan_bytes(f.read())
+    except (OSError, EOFError) as e:
+        print(f"  ⚠ Could not read stored message {sha[:12]}: {e}")
+        return sha, None
+
+
+def list_files(folder):
+    """Files in a folder (recursively), skipping mbox offset indexes and temp files"""
+    paths = []
+    for dirpath, _, filenames in os.walk(folder):
+        for filename in sorted(filenames):
+            if filename.endswith(('.idx', '.tmp')):
+                continue
+            paths.append(os.path.join(dirpath, filename))
+    return sorted(paths)
+
+
+def _has_store(store_dir):
+    return os.path.exists(os.path.join(store_dir, 'index.jsonl'))
+
+
+def _results(needles):
+    """Empty scan results and a function adding one file's hits to them"""
+    results = {
+        'files': 0,
+        'cached': 0,
+        'needles': {needle: {'files': 0, 'hits': 0} for needle in needles}
+    }
+    # Report under the caller's spelling of each needle
+    spellings = {}
+    for needle in needles:
+        spellings.setdefault(needle.lower(), []).append(needle)
+
+    def tally(hits):
+        results['files'] += 1
+        for needle, count in hits.items():
+            for spelling in spellings[needle]:
+                results['needles'][spelling]['files'] += 1
+                results['needles'][spelling]['hits'] += count
+
+    return results, tally
+
+
+def scan_folder(folder, needles, workers=None, use_threads=False, chunk_size=CHUNK_SIZE, use_cache=True):
+    """
+    Count needles across every file in a folder
+
+    Args:
+        folder: Folder to scan (recursively)
+        needles: Strings to count (case-insensitive)
+        workers: Pool size (default: CPU count)
+        use_threads: Use a thread pool instead of a process pool
+        chunk_size: Characters read per chunk when a file is read as text
+        use_cache: Reuse results for files unchanged since the last scan with
+                   the same needles (see scan_cache.py)
+
+    Returns:
+        Dictionary with 'files' scanned, 'cached' (how many of them came from
+        the cache) and per-needle {'files', 'hits'} under 'needles'
+    """
+    # Validate once up front rather than in every worker
+    matcher = MultiNeedleMatcher(needles)
+    lowered = tuple(matcher.needles)
+    paths = list_files(folder)
+    results, tally = _results(needles)
+
+    if not paths and os.path.abspath(folder) == os.path.abspath(DEFAULT_FOLDER) and _has_store(DEFAULT_STORE_DIR):
+        print(f"⚠ No files in {folder} - downloads are kept in the message store {DEFAULT_STORE_DIR}; "
+              f"use scan() or scan_store() (or folder_scanner.py without --folder)")
+
+    cache = ScanCache() if use_cache else None
+    cached = cache.load(folder, lowered) if cache else {}
+    scanned = {}    # relative path -> [size, mtime_ns, hits], written back to the cache
+    signatures = {}
+    jobs = []
+
+    for path in paths:
+        relpath = os.path.relpath(path, folder)
+        try:
+            stat = os.stat(path)
+        except OSError as e:
+            print(f"  ⚠ Could not read {path}: {e}")
+            continue
+        hits = ScanCache.lookup(cached, relpath, stat)
+        if hits is not None:
+            scanned[relpath] = cached[relpath]
+            results['cached'] += 1
+            tally(hits)
+        else:
+            signatures[path] = (relpath, stat.st_size, stat.st_mtime_ns)
+            jobs.append((path, lowered, chunk_size))
+
+    if jobs:
+        pool_class = ThreadPoolExecutor if use_threads else ProcessPoolExecutor
+        workers = max(1, min(workers or os.cpu_count() or 1, len(jobs)))
+
+        with pool_class(max_workers=workers) as pool:
+            for path, hits in pool.map(_scan_file, jobs, chunksize=1 if use_threads else 16):
+                if hits is None:
+                    continue
+                relpath, size, mtime_ns = signatures[path]
+                scanned[relpath] = [size, mtime_ns, dict(hits)]
+                tally(hits)
+
+    if cache and paths:
+        cache.save(folder, lowered, scanned)
+
+    return results
+
+
+def scan_store(needles, store_dir=DEFAULT_STORE_DIR, workers=None, use_threads=False, use_cache=True):
+    """
+    Count needles across every email in the message store
+
+    Args:
+        needles: Strings to count (case-insensitive)
+        store_dir: Message store directory
+        workers: Pool size (default: CPU count)
+        use_threads: Use a thread pool instead of a process pool
+        use_cache: Reuse results for emails already scanned with the same
+                   needles (stored emails never change, so they are keyed by sha)
+
+    Returns:
+        Same shape as scan_folder(), with each email counted as one file
+    """
+    matcher = MultiNeedleMatcher(needles)
+    lowered = tuple(matcher.needles)
+    results, tally = _results(needles)
+    if not _has_store(store_dir):
+        return results
+
+    store = MessageStore(store_dir)
+    source = store_source(store_dir)
+    cache = ScanCache() if use_cache else None
+    cached = cache.load(source, lowered) if cache else {}
+    scanned = {}    # sha -> hits, written back to the cache
+    jobs = []
+
+    for entry in store.entries:
+        sha = entry['sha']
+        hits = cached.get(sha)
+        if hits is not None:
+            scanned[sha] = hits
+            results['cached'] += 1
+            tally(hits)
+        else:
+            jobs.append((sha, store.object_path(entry), lowered))
+
+    if jobs:
+        pool_class = ThreadPoolExecutor if use_threads else ProcessPoolExecutor
+        workers = max(1, min(workers or os.cpu_count() or 1, len(jobs)))
+
+        with pool_class(max_workers=workers) as pool:
+            # Stored emails are small - hand them to processes in large batches
+            for sha, hits in pool.map(_scan_stored, jobs, chunksize=16 if use_threads else 256):
+                if hits is not None:
+                    scanned[sha] = dict(hits)
+                    tally(hits)
+
+    # Only emails still in the store are kept, so compacted ones drop out
+    if cache and (jobs or len(scanned) != len(cached)):
+        cache.save(source, lowered, scanned)
+
+    return results
+
+
+def scan(needles, folder=None, **options):
+    """
+    Count needles across the downloaded emails
+
+    Args:
+        needles: Strings to count (case-insensitive)
+        folder: Folder to scan; by default the message store when it exists, else data/raw
+        options: workers, use_threads, use_cache (and chunk_size for folders)
+
+    Returns:
+        See scan_folder()
+    """
+    if folder is None and _has_store(DEFAULT_STORE_DIR):
+        options.pop('chunk_size', None)
+        return scan_store(needles, DEFAULT_STORE_DIR, **options)
+    return scan_folder(folder or DEFAULT_FOLDER, needles, **options)
+
+
+def main():
+    """Scan a folder or the message store for needles from the command line"""
+    parser = argparse.ArgumentParser(description="Count needles across every file in a folder or every stored email")
+    parser.add_argument('needles', nargs='+', help="Strings to count (case-insensitive)")
+    parser.add_argument('--folder', default=None,
+                        help="Folder to scan (default: the message store if it exists, else data/raw)")
+    parser.add_argument('--store', action='store_true', help="Scan the message store (data/store)")
+    parser.add_argument('--workers', type=int, default=None, help="Parallel workers (default: CPU count)")
+    parser.add_argument('--threads', action='store_true', help="Use threads instead of processes")
+    parser.add_argument('--no-cache', action='store_true', help="Rescan every file (or stored email) instead of reusing cached results")
+    args = parser.parse_args()
+
+    use_store = args.store or (args.folder is None and _has_store(DEFAULT_STORE_DIR))
+    if use_store:
+        if not _has_store(DEFAULT_STORE_DIR):
+            print(f"❌ Message store not found: {DEFAULT_STORE_DIR}")
+            sys.exit(1)
+        print(f"Scanning message store {DEFAULT_STORE_DIR}...")
+        results = scan_store(args.needles, DEFAULT_STORE_DIR, args.workers, args.threads,
+                             use_cache=not args.no_cache)
+    else:
+        folder = args.folder or DEFAULT_FOLDER
+        if not os.path.isdir(folder):
+            print(f"❌ Folder not found: {folder}")
+            sys.exit(1)
+        results = scan_folder(folder, args.needles, args.workers, args.threads, use_cache=not args.no_cache)
+
+    print("\nScan summary:")
+    print("Total emails:" if use_store else "Total files:", results['files'])
+    if results['cached']:
+        unit = "emails" if use_store else "files"
+        print(f"  ({results['cached']} unchanged {unit} served from the scan cache)")
+    for needle, info in results['needles'].items():
+        print(f"  {needle}: {info['files']} files ({info['hits']} hits)")
+
+
+if __name__ == "__main__":
+    main()
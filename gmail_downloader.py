@@ -6,31 +6,219 @@ Downloads emails from Gmail and saves to mbox format for analysis
 
 import os
 import sys
+import json
+import time
+import random
 import pickle
 import base64
-import mailbox
+import quopri
+import secrets
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from datetime import datetime, timedelta
 from email.mime.text import MIMEText
-from googleapiclient.discovery import build
-from google_auth_oauthlib.flow import InstalledAppFlow
-from google.auth.transport.requests import Request
 import email
+from email.message import Message
+from mbox_writer import MboxWriter, add_thread_header
+
+# The Google client libraries are imported inside authenticate() and
+# _build_service(), so analysis-only tools that import this module start fast.
 
 # Gmail API scope - readonly access
 SCOPES = ['https://www.googleapis.com/auth/gmail.readonly']
 
+# Gmail API discovery document, cached so the client can be built offline
+DISCOVERY_URL = 'https://gmail.googleapis.com/$discovery/rest?version=v1'
+DISCOVERY_CACHE_FILE = os.path.join('.cache', 'gmail_v1_discovery.json')
+
+# Returned by the download workers for messages rejected by the prefilter
+_FILTERED = object()
+
+# Rate limits and transient server errors are retried with exponential backoff
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+MAX_RETRIES = 5
+RETRY_DELAY = 1.0  # Seconds before the first retry; doubles with each attempt
+
+
+def _http_status(error):
+    """HTTP status of an API error (googleapiclient HttpError or FakeHttpError), or None"""
+    status = getattr(error, 'status_code', None)
+    if status is None:
+        status = getattr(getattr(error, 'resp', None), 'status', None)
+    try:
+        return int(status)
+    except (TypeError, ValueError):
+        return None
+
+
+def is_retryable(error):
+    """True for rate limits, 5xx responses and dropped connections"""
+    if isinstance(error, (ConnectionError, TimeoutError)):
+        return True
+    status = _http_status(error)
+    if status in RETRY_STATUSES:
+        return True
+    # Gmail also reports per-user rate limits as 403 rateLimitExceeded
+    return status == 403 and 'ratelimitexceeded' in str(error).lower()
+
+
+
+def payload_to_raw(payload):
+    """
+    Rebuild RFC822 bytes from a Gmail API message payload (format='full')
+    
+    threads.get has no raw format, so thread downloads reassemble each message
+    from its MIME tree. Bodies arrive decoded and are re-encoded with the
+    part's Content-Transfer-Encoding. Attachment bodies are not included in
+    the payload and are left empty.
+    
+    Args:
+        payload: The message's 'payload' dict
+    
+    Returns:
+        Message bytes with CRLF line endings
+    """
+    headers = [(h['name'], h['value']) for h in payload.get('headers', [])]
+    parts = payload.get('parts')
+    
+    if payload.get('mimeType', '').startswith('multipart/') and parts:
+        content_type = Message()
+        content_type['Content-Type'] = next((v for k, v in headers if k.lower() == 'content-type'),
+                                            payload['mimeType'])
+        boundary = content_type.get_param('boundary')
+        if not boundary:
+            boundary = '=' * 15 + secrets.token_hex(16) + '=='
+            headers = [(k, v) for k, v in headers if k.lower() != 'content-type']
+            headers.append(('Content-Type', f'{payload["mimeType"]}; boundary="{boundary}"'))
+        
+        delimiter = b'--' + boundary.encode('ascii', errors='replace')
+        body = b''.join(delimiter + b'\r\n' + payload_to_raw(part) + b'\r\n' for part in parts)
+        body += delimiter + b'--\r\n'
+    else:
+        data = payload.get('body', {}).get('data', '')
+        data = base64.urlsafe_b64decode(data.encode('ASCII')) if data else b''
+        
+        encoding = next((v for k, v in headers if k.lower() == 'content-transfer-encoding'), '')
+        encoding = encoding.strip().lower()
+        if encoding == 'base64':
+            body = base64.encodebytes(data)
+        elif encoding == 'quoted-printable':
+            body = quopri.encodestring(data)
+        else:
+            body = data
+        body = body.replace(b'\r\n', b'\n').replace(b'\n', b'\r\n')
+    
+    header_bytes = b''.join(f"{name}: {value}\r\n".encode('utf-8') for name, value in headers)
+    return header_bytes + b'\r\n' + body
+
+def download_problem(stats):
+    """
+    Describe why a finished download missed messages
+    
+    Args:
+        stats: Stats dict filled by iter_downloads()/iter_thread_downloads()
+    
+    Returns:
+        Description of what is missing, or None if every listed message was
+        downloaded (or deliberately skipped) and the listing ran to the end
+    """
+    # Thread downloads list and skip whole threads
+    if 'threads' in stats:
+        unit, listed = 'threads', stats['threads']
+    else:
+        unit, listed = 'messages', stats.get('listed', 0)
+    
+    if stats.get('list_error'):
+        return f"listing stopped early after {listed} {unit} ({stats['list_error']})"
+    if stats.get('skipped'):
+        return f"{stats['skipped']} {unit} failed to download"
+    return None
+
+class MessagePrefilter:
+    """
+    Sender/subject/label rules checked against message metadata before the
+    full raw message is downloaded
+    
+    All matches are case-insensitive substrings. A message is skipped if it
+    matches any exclude rule, or if include rules are set and it matches none.
+    """
+    
+    # Only these headers are requested in the metadata phase
+    HEADERS = ['From', 'Subject']
+    
+    def __init__(self, exclude_senders=None, exclude_subjects=None, exclude_labels=None,
+                 include_senders=None, include_subjects=None):
+        self.exclude_senders = [s.lower() for s in exclude_senders or []]
+        self.exclude_subjects = [s.lower() for s in exclude_subjects or []]
+        self.exclude_labels = set(exclude_labels or [])
+        self.include_senders = [s.lower() for s in include_senders or []]
+        self.include_subjects = [s.lower() for s in include_subjects or []]
+    
+    @classmethod
+    def from_config(cls, filepath):
+        """Load prefilter rules from a JSON file (see prefilter.json)"""
+        with open(filepath, 'r') as f:
+            config = json.load(f)
+        
+        return cls(
+            exclude_senders=config.get('exclude_senders'),
+            exclude_subjects=config.get('exclude_subjects'),
+            exclude_labels=config.get('exclude_labels'),
+            include_senders=config.get('include_senders'),
+            include_subjects=config.get('include_subjects')
+        )
+    
+    def is_candidate(self, headers, label_ids):
+        """
+        Check whether a message is worth downloading in full
+        
+        Args:
+            headers: Dict of header name -> value from the metadata response
+            label_ids: List of Gmail label IDs on the message
+        """
+        sender = headers.get('From', '').lower()
+        subject = headers.get('Subject', '').lower()
+        
+        if self.exclude_labels.intersection(label_ids or []):
+            return False
+        if any(pattern in sender for pattern in self.exclude_senders):
+            return False
+        if any(pattern in subject for pattern in self.exclude_subjects):
+            return False
+        
+        if self.include_senders or self.include_subjects:
+            return (any(pattern in sender for pattern in self.include_senders) or
+                    any(pattern in subject for pattern in self.include_subjects))
+        
+        return True
+
+
 class GmailDownloader:
-    def __init__(self, credentials_file='credentials.json', token_file='token.pickle'):
+    def __init__(self, credentials_file='credentials.json', token_file='token.pickle', workers=8,
+                 shard_hours=None, max_retries=MAX_RETRIES, retry_delay=RETRY_DELAY):
         """
         Initialize Gmail Downloader
         
         Args:
             credentials_file: Path to OAuth credentials from Google Cloud Console
             token_file: Path to save authorization token (auto-generated)
+            workers: Number of parallel message downloads
+            shard_hours: Split the search window into shards of this many hours
+                         and list them in parallel (None = one sequential listing)
+            max_retries: Retries for each API call failing with a rate limit or
+                         server error before it counts as failed
+            retry_delay: Seconds before the first retry (doubled each time, plus jitter)
         """
         self.credentials_file = credentials_file
         self.token_file = token_file
+        self.workers = max(1, workers)
+        self.shard_hours = shard_hours
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
         self.service = None
+        self.credentials = None
+        self._local = threading.local()
+        self._discovery_doc = None
     
     def authenticate(self):
         """Authenticate with Gmail API"""
@@ -45,6 +233,7 @@ class GmailDownloader:
         # If no valid credentials, get new ones
         if not creds or not creds.valid:
             if creds and creds.expired and creds.refresh_token:
+                from google.auth.transport.requests import Request
                 print("Refreshing expired credentials...")
                 creds.refresh(Request())
             else:
@@ -54,6 +243,7 @@ class GmailDownloader:
                     print("See GMAIL_SETUP_GUIDE.md for instructions.")
                     sys.exit(1)
                 
+                from google_auth_oauthlib.flow import InstalledAppFlow
                 print("\nFirst time setup - opening browser for authorization...")
                 flow = InstalledAppFlow.from_client_secrets_file(
                     self.credentials_file, SCOPES)
@@ -65,9 +255,108 @@ class GmailDownloader:
                 pickle.dump(creds, token)
         
         print("✓ Authentication successful!")
-        self.service = build('gmail', 'v1', credentials=creds)
+        self.credentials = creds
+        self.service = self._build_service(creds)
         return self.service
     
+    def _load_discovery_document(self):
+        """
+        Load the Gmail discovery document, fetching and caching it on first use
+        
+        Returns:
+            Parsed discovery document, or None if it could not be loaded
+        """
+        if self._discovery_doc is not None:
+            return self._discovery_doc
+        
+        if os.path.exists(DISCOVERY_CACHE_FILE):
+            try:
+                with open(DISCOVERY_CACHE_FILE, 'r', encoding='utf-8') as f:
+                    self._discovery_doc = json.load(f)
+                return self._discovery_doc
+            except ValueError:
+                print("⚠ Cached discovery document is corrupt, fetching a new one...")
+        
+        content = None
+        try:
+            # google-api-python-client 2.x ships discovery documents with the package
+            from googleapiclient.discovery_cache import get_static_doc
+            content = get_static_doc('gmail', 'v1')
+        except ImportError:
+            pass
+        
+        if not content:
+            try:
+                import urllib.request
+                with urllib.request.urlopen(DISCOVERY_URL, timeout=30) as response:
+                    content = response.read().decode('utf-8')
+            except Exception as e:
+                print(f"⚠ Could not fetch discovery document: {e}")
+                return None
+        
+        try:
+            self._discovery_doc = json.loads(content)
+        except ValueError:
+            return None
+        
+        try:
+            os.makedirs(os.path.dirname(DISCOVERY_CACHE_FILE), exist_ok=True)
+            with open(DISCOVERY_CACHE_FILE, 'w', encoding='utf-8') as f:
+                json.dump(self._discovery_doc, f)
+        except OSError as e:
+            print(f"⚠ Could not cache discovery document: {e}")
+        
+        return self._discovery_doc
+    
+    def _build_service(self, creds):
+        """Build a Gmail API client from the cached discovery document (no network round trip)"""
+        from googleapiclient.discovery import build, build_from_document
+        
+        discovery_doc = self._load_discovery_document()
+        if discovery_doc is None:
+            return build('gmail', 'v1', credentials=creds)
+        return build_from_document(discovery_doc, credentials=creds)
+    
+    def _get_service(self):
+        """
+        Get the API client for the current thread
+        
+        The discovery client's HTTP transport is not thread-safe, so each
+        download worker builds its own client from the shared credentials.
+        Injected services (e.g. the fake service) are shared as-is.
+        """
+        if self.credentials is None or threading.current_thread() is threading.main_thread():
+            return self.service
+        
+        service = getattr(self._local, 'service', None)
+        if service is None:
+            service = self._build_service(self.credentials)
+            self._local.service = service
+        return service
+    
+    def _execute(self, request):
+        """
+        Execute an API request, retrying rate limits and server errors
+        
+        Waits retry_delay, 2 x retry_delay, 4 x retry_delay... (each plus up to
+        the same again of random jitter, so parallel workers don't retry in
+        lockstep) for up to max_retries retries.
+        
+        Args:
+            request: googleapiclient HttpRequest (or the fake service's request)
+        
+        Returns:
+            The response of the first successful attempt
+        """
+        for attempt in range(self.max_retries + 1):
+            try:
+                return request.execute()
+            except Exception as e:
+                if attempt == self.max_retries or not is_retryable(e):
+                    raise
+                delay = self.retry_delay * 2 ** attempt
+                time.sleep(delay + random.uniform(0, delay))
+    
     def get_messages(self, query='', max_results=None, days_back=7):
         """
         Get list of messages matching query
@@ -84,6 +373,43 @@ class GmailDownloader:
             print("Not authenticated! Call authenticate() first.")
             return []
         
+        messages = []
+        
+        try:
+            for page in self.iter_message_pages(query, max_results, days_back):
+                messages.extend(page)
+            
+            print(f"✓ Total messages found: {len(messages)}")
+            
+        except Exception as e:
+            print(f"❌ Error searching messages: {e}")
+            return []
+        
+        return messages
+    
+    def iter_message_pages(self, query='', max_results=None, days_back=7, resource='messages'):
+        """
+        Yield pages of message IDs as soon as each messages.list call returns
+        
+        Lets downloads start after the first round trip instead of after the
+        whole listing. Pagination stops as soon as max_results IDs are found.
+        With shard_hours set, the window is listed as parallel date shards
+        (see _iter_sharded_pages).
+        
+        Args:
+            query: Gmail search query (e.g., 'from:support@example.com')
+            max_results: Maximum number of messages to retrieve (None = all)
+            days_back: Number of days to look back (default: 7)
+            resource: 'messages' or 'threads' (list conversations instead)
+        
+        Yields:
+            Lists of message dicts ({'id': ..., 'threadId': ...}), or thread
+            dicts ({'id': ..., 'historyId': ...}) when listing threads
+        """
+        if self.shard_hours and days_back:
+            yield from self._iter_sharded_pages(query, max_results, days_back, resource)
+            return
+        
         # Add date filter to query
         date_filter = self._get_date_query(days_back)
         if query:
@@ -93,37 +419,131 @@ class GmailDownloader:
         
         print(f"\nSearching Gmail with query: {full_query}")
         
-        messages = []
+        found = 0
         page_token = None
         
-        try:
-            while True:
-                results = self.service.users().messages().list(
-                    userId='me',
-                    q=full_query,
-                    pageToken=page_token,
-                    maxResults=500
-                ).execute()
-                
-                if 'messages' in results:
-                    messages.extend(results['messages'])
-                    print(f"  Found {len(messages)} messages so far...")
-                
-                page_token = results.get('nextPageToken')
-                
-                if not page_token or (max_results and len(messages) >= max_results):
-                    break
+        while True:
+            page_size = 500
+            if max_results:
+                page_size = min(page_size, max_results - found)
             
+            page, page_token = self._list_page(full_query, page_token, page_size, resource)
             if max_results:
-                messages = messages[:max_results]
+                page = page[:max_results - found]
             
-            print(f"✓ Total messages found: {len(messages)}")
+            if page:
+                found += len(page)
+                print(f"  Found {found} {resource} so far...")
+                yield page
             
-        except Exception as e:
-            print(f"❌ Error searching messages: {e}")
-            return []
+            if not page_token or (max_results and found >= max_results):
+                break
+    
+    def _list_page(self, full_query, page_token=None, page_size=500, resource='messages'):
+        """
+        Fetch one page of messages.list (or threads.list) results
         
-        return messages
+        Returns:
+            (list of message or thread dicts, next page token or None)
+        """
+        users = self._get_service().users()
+        api = users.threads() if resource == 'threads' else users.messages()
+        results = self._execute(api.list(
+            userId='me',
+            q=full_query,
+            pageToken=page_token,
+            maxResults=page_size
+        ))
+        return results.get(resource, []), results.get('nextPageToken')
+    
+    def _get_date_shards(self, days_back):
+        """
+        Split the search window into after:/before: query terms
+        
+        Shards use epoch seconds and tile the window from midnight `days_back`
+        days ago (the same start as _get_date_query). The newest shard has no
+        upper bound so mail arriving during the run is still found.
+        
+        Returns:
+            List of date filter strings, newest first
+        """
+        start = datetime.combine((datetime.now() - timedelta(days=days_back)).date(), datetime.min.time())
+        step = timedelta(hours=self.shard_hours)
+        now = datetime.now()
+        
+        shards = []
+        lo = start
+        while lo + step < now:
+            hi = lo + step
+            shards.append(f"after:{int(lo.timestamp())} before:{int(hi.timestamp())}")
+            lo = hi
+        shards.append(f"after:{int(lo.timestamp())}")
+        
+        shards.reverse()
+        return shards
+    
+    def _iter_sharded_pages(self, query, max_results, days_back, resource='messages'):
+        """
+        List date shards concurrently, yielding pages as they arrive
+        
+        Each shard's pagination chain still runs in order, but the chains run
+        side by side, so a long window costs about as many round trips as its
+        busiest shard instead of its total page count. IDs are deduplicated in
+        case Gmail returns a message on both sides of a shard boundary.
+        
+        Args:
+            query: Gmail search query
+            max_results: Maximum number of messages to retrieve (None = all).
+                         Shards finish in any order, so this is a sample of the
+                         window rather than strictly the newest messages.
+            days_back: Number of days to look back
+            resource: 'messages' or 'threads'
+        
+        Yields:
+            Lists of message (or thread) dicts
+        """
+        shards = self._get_date_shards(days_back)
+        queries = [f"{query} {shard}" if query else shard for shard in shards]
+        
+        date_filter = self._get_date_query(days_back)
+        print(f"\nSearching Gmail with query: {query + ' ' if query else ''}{date_filter}")
+        print(f"  Listing {len(queries)} date shards of {self.shard_hours}h in parallel")
+        
+        seen = set()
+        found = 0
+        
+        with ThreadPoolExecutor(max_workers=min(self.workers, len(queries))) as pool:
+            # One outstanding page request per shard; the next page is requested
+            # as soon as the previous one returns
+            pending = {pool.submit(self._list_page, q, None, 500, resource): q for q in queries}
+            
+            try:
+                while pending:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        full_query = pending.pop(future)
+                        page, page_token = future.result()
+                        
+                        if page_token:
+                            pending[pool.submit(self._list_page, full_query, page_token, 500,
+                                                resource)] = full_query
+                        
+                        page = [m for m in page if m['id'] not in seen]
+                        if max_results:
+                            page = page[:max_results - found]
+                        if not page:
+                            continue
+                        
+                        seen.update(m['id'] for m in page)
+                        found += len(page)
+                        print(f"  Found {found} {resource} so far...")
+                        yield page
+                        
+                        if max_results and found >= max_results:
+                            return
+            finally:
+                for future in pending:
+                    future.cancel()
     
     def _get_date_query(self, days_back):
         """Generate date query for Gmail search"""
@@ -131,6 +551,32 @@ class GmailDownloader:
         date_str = date_from.strftime('%Y/%m/%d')
         return f"after:{date_str}"
     
+    def download_raw(self, msg_id):
+        """
+        Download a single message as raw RFC822 bytes
+        
+        Args:
+            msg_id: Gmail message ID
+        
+        Returns:
+            Dict with 'id', 'threadId', 'internalDate', 'labelIds' and the decoded
+            'raw' bytes, or None if it still failed after retries
+        """
+        try:
+            message = self._execute(self._get_service().users().messages().get(
+                userId='me',
+                id=msg_id,
+                format='raw'
+            ))
+            
+            # Decode the raw message
+            message['raw'] = base64.urlsafe_b64decode(message['raw'].encode('ASCII'))
+            return message
+            
+        except Exception as e:
+            print(f"  ⚠ Error downloading message {msg_id}: {e}")
+            return None
+    
     def download_message(self, msg_id):
         """
         Download a single message in RFC822 format
@@ -141,24 +587,241 @@ class GmailDownloader:
         Returns:
             Email message object or None
         """
+        message = self.download_raw(msg_id)
+        if message is None:
+            return None
+        
+        return email.message_from_bytes(message['raw'])
+    
+    def is_candidate(self, msg_id, prefilter):
+        """
+        Metadata phase of a two-phase download
+        
+        Fetches only the headers the prefilter needs (partial response, no body)
+        and checks them locally.
+        
+        Args:
+            msg_id: Gmail message ID
+            prefilter: MessagePrefilter with the rules to apply
+        
+        Returns:
+            True if the message should be downloaded in full
+        """
         try:
-            message = self.service.users().messages().get(
+            message = self._execute(self._get_service().users().messages().get(
                 userId='me',
                 id=msg_id,
-                format='raw'
-            ).execute()
+                format='metadata',
+                metadataHeaders=prefilter.HEADERS,
+                fields='id,labelIds,payload/headers'
+            ))
+        except Exception as e:
+            # Fall back to downloading so a metadata error never drops an email
+            print(f"  ⚠ Error fetching metadata for {msg_id}: {e}")
+            return True
+        
+        headers = {h['name']: h['value'] for h in message.get('payload', {}).get('headers', [])}
+        return prefilter.is_candidate(headers, message.get('labelIds', []))
+    
+    def _download_if_candidate(self, msg_id, prefilter, fetch):
+        """Download a message, checking its metadata first when a prefilter is set"""
+        if prefilter and not self.is_candidate(msg_id, prefilter):
+            return _FILTERED
+        return fetch(msg_id)
+    
+    def iter_downloads(self, query='', max_results=None, days_back=7, prefilter=None,
+                       fetch=None, skip_id=None, stats=None):
+        """
+        Download matching messages in parallel, yielding each one as it completes
+        
+        Each page of IDs is handed to the worker pool as soon as messages.list
+        returns it, so downloads overlap with the rest of the listing.
+        
+        Args:
+            query: Gmail search query
+            max_results: Max messages to download (None = all)
+            days_back: Days to look back (default: 7)
+            prefilter: Optional MessagePrefilter checked before the full download
+            fetch: Function downloading one message ID (default: download_message)
+            skip_id: Optional predicate; IDs it returns True for are not downloaded
+            stats: Optional dict updated with 'listed', 'skipped', 'filtered'
+                   and 'existing' counts, and 'list_error' if the listing
+                   stopped early (see download_problem)
+        
+        Yields:
+            Whatever fetch returns for each successfully downloaded message
+        """
+        fetch = fetch or self.download_message
+        if stats is None:
+            stats = {}
+        for key in ('listed', 'skipped', 'filtered', 'existing'):
+            stats.setdefault(key, 0)
+        stats.setdefault('list_error', None)
+        
+        def finished(done):
+            for future in done:
+                result = future.result()
+                if result is _FILTERED:
+                    stats['filtered'] += 1
+                elif not result:
+                    stats['skipped'] += 1
+                else:
+                    yield result
+        
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            pending = set()
             
-            # Decode the raw message
-            msg_str = base64.urlsafe_b64decode(message['raw'].encode('ASCII'))
-            mime_msg = email.message_from_bytes(msg_str)
+            try:
+                for page in self.iter_message_pages(query, max_results, days_back):
+                    stats['listed'] += len(page)
+                    for msg_info in page:
+                        if skip_id and skip_id(msg_info['id']):
+                            stats['existing'] += 1
+                            continue
+                        
+                        pending.add(pool.submit(self._download_if_candidate, msg_info['id'],
+                                                prefilter, fetch))
+                        
+                        # Keep a bounded number of downloads in flight
+                        if len(pending) >= self.workers * 4:
+                            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                            yield from finished(done)
+            except Exception as e:
+                # Downloads already started still finish; the caller sees list_error
+                print(f"❌ Error searching messages: {e}")
+                stats['list_error'] = str(e)
             
-            return mime_msg
+            if stats['list_error']:
+                print(f"⚠ Listing stopped early - only {stats['listed']} messages found")
+            elif stats['listed']:
+                print(f"✓ Total messages found: {stats['listed']}")
             
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                yield from finished(done)
+        
+        if stats['filtered']:
+            print(f"  Prefiltered: {stats['filtered']} emails skipped by metadata rules")
+    
+    def download_thread(self, thread_id):
+        """
+        Download a whole conversation in one threads.get call
+        
+        Args:
+            thread_id: Gmail thread ID
+        
+        Returns:
+            List of message dicts shaped like download_raw() results (with
+            'raw' bytes rebuilt from the full payload and 'headers'), oldest
+            first, or None if it still failed after retries
+        """
+        try:
+            thread = self._execute(self._get_service().users().threads().get(
+                userId='me',
+                id=thread_id,
+                format='full'
+            ))
         except Exception as e:
-            print(f"  ⚠ Error downloading message {msg_id}: {e}")
+            print(f"  ⚠ Error downloading thread {thread_id}: {e}")
             return None
+        
+        messages = []
+        for message in thread.get('messages', []):
+            payload = message.pop('payload', {})
+            message['headers'] = {h['name']: h['value'] for h in payload.get('headers', [])}
+            message['raw'] = payload_to_raw(payload)
+            message.setdefault('threadId', thread_id)
+            messages.append(message)
+        return messages
     
-    def download_to_mbox(self, output_file, query='', max_results=None, days_back=7, show_progress=True):
+    def iter_thread_downloads(self, query='', max_results=None, days_back=7, prefilter=None,
+                              skip_id=None, stats=None):
+        """
+        Download matching conversations in parallel, yielding each message
+        
+        One threads.get call returns every message in a conversation, so a
+        chatty support thread costs one request instead of one per reply.
+        Threads come back whole, including replies older than the window.
+        The prefilter is checked locally against each message's headers
+        (no extra metadata calls).
+        
+        Args:
+            query: Gmail search query
+            max_results: Max threads to download (None = all)
+            days_back: Days to look back (default: 7)
+            prefilter: Optional MessagePrefilter applied to each message
+            skip_id: Optional predicate; message IDs it returns True for are not yielded
+            stats: Optional dict updated with 'threads', 'listed', 'skipped',
+                   'filtered' and 'existing' counts, and 'list_error' if the
+                   listing stopped early (see download_problem)
+        
+        Yields:
+            Message dicts (see download_thread) for each message kept
+        """
+        if stats is None:
+            stats = {}
+        for key in ('threads', 'listed', 'skipped', 'filtered', 'existing'):
+            stats.setdefault(key, 0)
+        stats.setdefault('list_error', None)
+        
+        def finished(done):
+            for future in done:
+                messages = future.result()
+                if messages is None:
+                    stats['skipped'] += 1
+                    continue
+                
+                for message in messages:
+                    stats['listed'] += 1
+                    if skip_id and skip_id(message['id']):
+                        stats['existing'] += 1
+                    elif prefilter and not prefilter.is_candidate(message['headers'],
+                                                                  message.get('labelIds', [])):
+                        stats['filtered'] += 1
+                    else:
+                        yield message
+        
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            pending = set()
+            
+            try:
+                for page in self.iter_message_pages(query, max_results, days_back, resource='threads'):
+                    stats['threads'] += len(page)
+                    for thread_info in page:
+                        pending.add(pool.submit(self.download_thread, thread_info['id']))
+                        
+                        # Keep a bounded number of downloads in flight
+                        if len(pending) >= self.workers * 4:
+                            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                            yield from finished(done)
+            except Exception as e:
+                # Downloads already started still finish; the caller sees list_error
+                print(f"❌ Error searching threads: {e}")
+                stats['list_error'] = str(e)
+            
+            if stats['list_error']:
+                print(f"⚠ Listing stopped early - only {stats['threads']} threads found")
+            elif stats['threads']:
+                print(f"✓ Total threads found: {stats['threads']}")
+            
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                yield from finished(done)
+        
+        if stats['filtered']:
+            print(f"  Prefiltered: {stats['filtered']} emails skipped by metadata rules")
+    
+    def _iter_raw_downloads(self, query, max_results, days_back, prefilter=None, threads=False,
+                            skip_id=None, stats=None):
+        """Raw message dicts from per-message (messages.get) or per-thread (threads.get) downloads"""
+        if threads:
+            return self.iter_thread_downloads(query, max_results, days_back, prefilter=prefilter,
+                                              skip_id=skip_id, stats=stats)
+        return self.iter_downloads(query, max_results, days_back, prefilter=prefilter,
+                                   fetch=self.download_raw, skip_id=skip_id, stats=stats)
+    
+    def download_to_mbox(self, output_file, query='', max_results=None, days_back=7, show_progress=True,
+                         on_message=None, prefilter=None, threads=False, stats=None):
         """
         Download messages and save to mbox file
         
@@ -168,6 +831,19 @@ class GmailDownloader:
             max_results: Max messages to download (None = all)
             days_back: Days to look back (default: 7)
             show_progress: Show download progress
+            on_message: Optional callback called with each message's raw RFC822 bytes
+                        after it is saved (used by streaming mode to analyze while
+                        downloading)
+            prefilter: Optional MessagePrefilter; messages are checked by metadata
+                       first and only candidates are downloaded in full
+            threads: Download whole conversations with threads.get (max_results
+                     then counts threads)
+            stats: Optional dict filled with the download counts; check it with
+                   download_problem() to find out whether messages were missed
+        
+        Every message is saved with an X-GM-THRID header holding its Gmail
+        thread ID. Messages that could not be listed or downloaded are reported
+        in stats, not raised; errors writing the mbox propagate.
         """
         print("\n" + "="*70)
         print("GMAIL EMAIL DOWNLOADER")
@@ -177,51 +853,129 @@ class GmailDownloader:
         if not self.service:
             self.authenticate()
         
-        # Get message list
-        messages = self.get_messages(query, max_results, days_back)
-        
-        if not messages:
-            print("\n⚠ No messages found matching criteria")
-            return
-        
-        # Create mbox file
-        print(f"\nDownloading {len(messages)} messages to {output_file}...")
-        mbox = mailbox.mbox(output_file)
-        mbox.lock()
+        mbox = None
+        downloaded = 0
+        if stats is None:
+            stats = {}
         
         try:
-            downloaded = 0
-            skipped = 0
-            
-            for i, msg_info in enumerate(messages, 1):
-                if show_progress and i % 10 == 0:
-                    print(f"  Progress: {i}/{len(messages)} ({i/len(messages)*100:.1f}%)")
+            # Raw bytes go straight to the file - no parse/re-serialize round trip
+            for message in self._iter_raw_downloads(query, max_results, days_back, prefilter, threads,
+                                                    stats=stats):
+                if mbox is None:
+                    print(f"\nDownloading messages to {output_file}...")
+                    mbox = MboxWriter(output_file)
                 
-                msg = self.download_message(msg_info['id'])
+                raw = add_thread_header(message['raw'], message.get('threadId'))
+                mbox.add_raw(raw, message.get('internalDate'))
+                downloaded += 1
+                if on_message:
+                    on_message(raw)
                 
-                if msg:
-                    mbox.add(msg)
-                    downloaded += 1
-                else:
-                    skipped += 1
-            
-            mbox.unlock()
-            mbox.close()
+                if show_progress and downloaded % 10 == 0:
+                    print(f"  Progress: {downloaded} downloaded ({stats['listed']} found so far)")
+        finally:
+            # Keep whatever was downloaded, even if writing failed part way
+            if mbox is not None:
+                mbox.close()
+        
+        if mbox is None:
+            if stats['skipped']:
+                print(f"\n⚠ All {stats['skipped']} messages failed to download")
+            elif stats['list_error']:
+                print(f"\n⚠ Could not list messages: {stats['list_error']}")
+            else:
+                print("\n⚠ No messages found matching criteria")
+            return
+        
+        problem = download_problem(stats)
+        print("\n" + "="*70)
+        print("⚠ DOWNLOAD INCOMPLETE" if problem else "✓ DOWNLOAD COMPLETE!")
+        print("="*70)
+        print(f"  Downloaded: {downloaded} emails")
+        if stats['skipped'] > 0:
+            print(f"  Skipped: {stats['skipped']} emails (errors)")
+        if stats['filtered'] > 0:
+            print(f"  Prefiltered: {stats['filtered']} emails (not downloaded)")
+        if problem:
+            print(f"  Missing emails: {problem}")
+        print(f"  Saved to: {output_file}")
+        print(f"  File size: {os.path.getsize(output_file) / (1024*1024):.2f} MB")
+        print("="*70)
+    
+    def download_to_store(self, store, query='', max_results=None, days_back=7, show_progress=True,
+                          on_message=None, prefilter=None, threads=False, stats=None):
+        """
+        Download messages into the local message store
+        
+        Messages already in the store (by Gmail ID) are not downloaded again, so
+        overlapping weekly/monthly windows only fetch what is new.
+        
+        Args:
+            store: MessageStore to add messages to
+            query: Gmail search query
+            max_results: Max messages to list (None = all)
+            days_back: Days to look back (default: 7)
+            show_progress: Show download progress
+            on_message: Optional callback called with the raw bytes of each newly stored message
+            prefilter: Optional MessagePrefilter applied before full downloads
+            threads: Download whole conversations with threads.get (messages
+                     already stored are then skipped after the thread call)
+            stats: Optional dict filled with the download counts; check it with
+                   download_problem() to find out whether messages were missed
+        
+        Returns:
+            Number of messages added to the store
+        """
+        print("\n" + "="*70)
+        print("GMAIL EMAIL DOWNLOADER")
+        print("="*70)
+        
+        # Authenticate if needed
+        if not self.service:
+            self.authenticate()
+        
+        added = 0
+        if stats is None:
+            stats = {}
+        
+        print(f"\nDownloading new messages to store: {store.root}")
+        
+        for message in self._iter_raw_downloads(query, max_results, days_back, prefilter, threads,
+                                                skip_id=store.has_gmail_id, stats=stats):
+            entry = store.add(
+                message['raw'],
+                gmail_id=message.get('id'),
+                thread_id=message.get('threadId'),
+                internal_date=message.get('internalDate')
+            )
+            if entry is None:
+                continue
             
-            print("\n" + "="*70)
-            print("✓ DOWNLOAD COMPLETE!")
-            print("="*70)
-            print(f"  Downloaded: {downloaded} emails")
-            if skipped > 0:
-                print(f"  Skipped: {skipped} emails (errors)")
-            print(f"  Saved to: {output_file}")
-            print(f"  File size: {os.path.getsize(output_file) / (1024*1024):.2f} MB")
-            print("="*70)
+            added += 1
+            if on_message:
+                on_message(add_thread_header(message['raw'], message.get('threadId')))
             
-        except Exception as e:
-            print(f"\n❌ Error during download: {e}")
-            mbox.unlock()
-            mbox.close()
+            if show_progress and added % 10 == 0:
+                print(f"  Progress: {added} stored ({stats['listed']} found so far)")
+        
+        problem = download_problem(stats)
+        print("\n" + "="*70)
+        print("⚠ DOWNLOAD INCOMPLETE" if problem else "✓ DOWNLOAD COMPLETE!")
+        print("="*70)
+        print(f"  New emails stored: {added}")
+        if stats['existing'] > 0:
+            print(f"  Already in store: {stats['existing']} emails")
+        if stats['skipped'] > 0:
+            print(f"  Skipped: {stats['skipped']} emails (errors)")
+        if stats['filtered'] > 0:
+            print(f"  Prefiltered: {stats['filtered']} emails (not downloaded)")
+        if problem:
+            print(f"  Missing emails: {problem}")
+        print(f"  Store total: {len(store)} emails")
+        print("="*70)
+        
+        return added
 
 
 def main():
@@ -1,7 +1,7 @@
 import os
 import csv
 import json
-import mailbox
+from mbox_writer import open_mbox
 from collections import Counter, defaultdict
 from datetime import datetime
 import re
@@ -112,7 +112,7 @@ class IssueTracker:
             file_size = os.path.getsize(filepath) / (1024 * 1024)
             print(f"File size: {file_size:.2f} MB")
             
-            mbox = mailbox.mbox(filepath)
+            mbox = open_mbox(filepath)
             total_messages = len(mbox)
             print(f"Total messages: {total_messages}")
             
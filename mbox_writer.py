@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+"""
+Raw Mbox Writer
+Appends downloaded RFC822 bytes straight to an mbox file, without parsing the
+message into an email.message.Message and serializing it back. Writes are
+batched, and a byte-offset index (<file>.idx) is saved next to the mbox so
+readers can open it without scanning the whole file. The index also records
+a SHA-256 digest of every entry, so it identifies the mbox's contents (see
+mbox_content_digest) without re-reading the mbox.
+
+Entries use the mboxrd convention: a "From " separator line, body lines
+starting with ">*From " get one extra ">" so they can't be mistaken for a
+separator, and each entry ends with a blank line.
+"""
+
+import os
+import re
+import json
+import time
+import hashlib
+import mailbox
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+# Body lines that need quoting: "From ", ">From ", ">>From ", ...
+_FROM_LINE = re.compile(rb'^(>*From )', re.MULTILINE)
+
+# Header carrying the Gmail thread ID, so analyzers can group exact conversations
+THREAD_HEADER = 'X-GM-THRID'
+
+
+def add_thread_header(raw, thread_id):
+    """
+    Prepend the Gmail thread ID header to raw RFC822 bytes
+
+    Args:
+        raw: Message bytes
+        thread_id: Gmail thread ID (returns raw unchanged if empty)
+
+    Returns:
+        Message bytes with an X-GM-THRID header
+    """
+    if not thread_id or raw.startswith(THREAD_HEADER.encode('ascii') + b':'):
+        return raw
+    return f"{THREAD_HEADER}: {thread_id}\r\n".encode('ascii') + raw
+
+
+def format_mbox_entry(raw, internal_date=None):
+    """
+    Format raw RFC822 bytes as one mbox entry
+
+    Args:
+        raw: Message bytes (CRLF or LF line endings)
+        internal_date: Optional Gmail internalDate (ms since epoch) for the From line
+
+    Returns:
+        Bytes ready to append to an mbox file
+    """
+    body = raw.replace(b'\r\n', b'\n')
+
+    # Keep an existing Unix From line, like mailbox.mbox.add() does
+    from_line = None
+    if body.startswith(b'From '):
+        newline = body.find(b'\n')
+        if newline == -1:
+            from_line, body = body, b''
+        else:
+            from_line, body = body[:newline], body[newline + 1:]
+
+    if from_line is None:
+        timestamp = int(internal_date) / 1000 if internal_date else time.time()
+        from_line = b'From MAILER-DAEMON ' + time.asctime(time.gmtime(timestamp)).encode('ascii')
+
+    body = _FROM_LINE.sub(rb'>\1', body)
+    if not body.endswith(b'\n'):
+        body += b'\n'
+
+    return from_line + b'\n' + body + b'\n'
+
+
+def _index_path(filepath):
+    return filepath + '.idx'
+
+
+def _read_index(filepath):
+    """The index written alongside an mbox, or None if missing or out of date"""
+    try:
+        with open(_index_path(filepath), 'r') as f:
+            index = json.load(f)
+        if index.get('size') != os.path.getsize(filepath) or 'offsets' not in index:
+            return None
+        return index
+    except (OSError, ValueError):
+        return None
+
+
+def read_mbox_index(filepath):
+    """
+    Load the offset index written alongside an mbox by MboxWriter
+
+    Returns:
+        List of [start, stop] byte offsets per message, or None if there is no
+        index or it does not match the current file
+    """
+    index = _read_index(filepath)
+    return index['offsets'] if index else None
+
+
+def mbox_content_digest(filepath):
+    """
+    Digest of an mbox's contents from its index's per-entry digests
+
+    Returns:
+        Hex SHA-256 over the entry digests, or None if the index is missing,
+        out of date, or was written before entry digests were recorded
+    """
+    index = _read_index(filepath)
+    if not index or len(index.get('digests') or []) != len(index['offsets']):
+        return None
+    return hashlib.sha256("\n".join(index['digests']).encode('ascii')).hexdigest()
+
+
+class IndexedMbox:
+    """Read-only mbox reader that uses a saved offset index instead of scanning the file"""
+
+    def __init__(self, filepath, offsets):
+        self.filepath = filepath
+        self.offsets = offsets
+        self._file = open(filepath, 'rb')
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def get_bytes(self, i):
+        """Raw message bytes (without the From line) for message number i"""
+        start, stop = self.offsets[i]
+        self._file.seek(start)
+        self._file.readline()
+        return self._file.read(stop - self._file.tell())
+
+    def __iter__(self):
+        for i in range(len(self.offsets)):
+            yield mailbox.mboxMessage(self.get_bytes(i))
+
+    def close(self):
+        self._file.close()
+
+
+def open_mbox(filepath):
+    """Open an mbox for reading, skipping the full-file scan when an offset index exists"""
+    offsets = read_mbox_index(filepath)
+    if offsets is None:
+        return mailbox.mbox(filepath)
+    return IndexedMbox(filepath, offsets)
+
+
+def find_latest_mbox(folder):
+    """Newest .mbox file in a folder (by modification time), or None"""
+    if not os.path.isdir(folder):
+        return None
+
+    mbox_files = [os.path.join(folder, f) for f in os.listdir(folder) if f.endswith('.mbox')]
+    if not mbox_files:
+        return None
+    return max(mbox_files, key=os.path.getmtime)
+
+
+class MboxWriter:
+    """
+    Buffered append-only mbox writer
+
+    Holds one exclusive lock for its whole lifetime, writes messages in large
+    batches, fsyncs only at checkpoints and on close, and records each
+    message's byte offsets as it goes so readers never need to scan the file
+    (see open_mbox).
+    """
+
+    def __init__(self, filepath, batch_bytes=4 * 1024 * 1024, checkpoint_every=1000):
+        """
+        Open an mbox file for appending (created if missing)
+
+        Args:
+            filepath: Path to the mbox file
+            batch_bytes: Buffer size written to disk in one go
+            checkpoint_every: Flush, fsync and save the index every N messages
+        """
+        self.filepath = filepath
+        self.batch_bytes = batch_bytes
+        self.checkpoint_every = checkpoint_every
+        self.count = 0
+        self._buffer = []
+        self._buffered = 0
+
+        # Check for an index before opening, since appending changes the size
+        existing_size = os.path.getsize(filepath) if os.path.exists(filepath) else 0
+        index = _read_index(filepath) if existing_size else {'offsets': [], 'digests': []}
+        self.offsets = index['offsets'] if index else None
+        # None when continuing an index from before entry digests were recorded
+        self.digests = index.get('digests') if index else None
+        if self.digests is not None and len(self.digests) != len(self.offsets):
+            self.digests = None
+
+        self._file = open(filepath, 'a+b')
+        if fcntl is not None:
+            fcntl.lockf(self._file, fcntl.LOCK_EX)
+
+        # Make sure a new entry starts on its own line in an existing file
+        self._file.seek(0, 2)
+        self._offset = self._file.tell()
+        if self._offset > 0:
+            self._file.seek(-1, 2)
+            if self._file.read(1) != b'\n':
+                self._file.write(b'\n')
+                self._offset += 1
+
+        if self.offsets is None:
+            # Appending to an mbox without a valid index - drop any stale one
+            try:
+                os.remove(_index_path(filepath))
+            except OSError:
+                pass
+
+    def add_raw(self, raw, internal_date=None):
+        """Append one raw RFC822 message"""
+        entry = format_mbox_entry(raw, internal_date)
+
+        if self.offsets is not None:
+            # Stop excludes the blank separator line, matching mailbox.mbox's table of contents
+            self.offsets.append([self._offset, self._offset + len(entry) - 1])
+            if self.digests is not None:
+                self.digests.append(hashlib.sha256(entry).hexdigest())
+        self._offset += len(entry)
+
+        self._buffer.append(entry)
+        self._buffered += len(entry)
+        self.count += 1
+
+        if self._buffered >= self.batch_bytes:
+            self.flush()
+        if self.checkpoint_every and self.count % self.checkpoint_every == 0:
+            self.checkpoint()
+
+    def flush(self):
+        """Write buffered messages to the file in one call"""
+        if self._buffer:
+            self._file.write(b''.join(self._buffer))
+            self._buffer = []
+            self._buffered = 0
+        self._file.flush()
+
+    def checkpoint(self):
+        """Flush, fsync and save the offset index so a crash loses nothing before this point"""
+        self.flush()
+        os.fsync(self._file.fileno())
+        self._write_index()
+
+    def _write_index(self):
+        if self.offsets is None:
+            return
+        tmp_path = _index_path(self.filepath) + '.tmp'
+        index = {'size': self._offset, 'offsets': self.offsets}
+        if self.digests is not None:
+            index['digests'] = self.digests
+        with open(tmp_path, 'w') as f:
+            json.dump(index, f)
+        os.replace(tmp_path, _index_path(self.filepath))
+
+    def close(self):
+        """Write remaining messages, fsync, save the index, unlock and close"""
+        if self._file is None:
+            return
+        self.checkpoint()
+        if fcntl is not None:
+            fcntl.lockf(self._file, fcntl.LOCK_UN)
+        self._file.close()
+        self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
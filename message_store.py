@@ -0,0 +1,363 @@
+#!/usr/bin/env python3
+"""
+Local Message Store
+Keeps one compressed raw copy of every downloaded email, keyed by content hash,
+with a date index so reports can select any date range without re-downloading
+or re-parsing overlapping mbox dumps.
+
+Layout:
+    data/store/index.jsonl                 one line per message (append-only)
+    data/store/objects/ab/abcdef....eml.gz raw RFC822 bytes, gzip-compressed
+    data/store/compacted.json              day before which messages were moved
+                                           to the archive (archive_manager.py)
+
+Usage:
+    python message_store.py import data/raw/*.mbox
+    python message_store.py stats
+    python message_store.py export 2026-02-01 2026-02-28 february.mbox
+"""
+
+import os
+import sys
+import gzip
+import json
+import email
+import bisect
+import hashlib
+import mailbox
+from datetime import datetime, timedelta, timezone
+from email.parser import BytesHeaderParser
+from email.utils import parsedate_to_datetime
+from mbox_writer import THREAD_HEADER
+
+DEFAULT_STORE_DIR = "data/store"
+
+
+def _utc(dt):
+    """Normalize a datetime to naive UTC for index comparisons"""
+    if dt.tzinfo is not None:
+        dt = dt.astimezone(timezone.utc).replace(tzinfo=None)
+    return dt
+
+
+class MessageStore:
+    def __init__(self, root=DEFAULT_STORE_DIR):
+        """
+        Open (or create) a message store
+
+        Args:
+            root: Store directory (default: data/store)
+        """
+        self.root = root
+        self.objects_dir = os.path.join(root, 'objects')
+        self.index_file = os.path.join(root, 'index.jsonl')
+        self.compacted_file = os.path.join(root, 'compacted.json')
+        self.compacted_before = None   # 'YYYY-MM-DD' - earlier days live in the archive
+
+        self.entries = []        # index entries sorted by date
+        self._dates = []         # parallel list of entry dates for bisect
+        self.by_sha = {}
+        self.by_gmail_id = {}
+        self.by_message_id = {}
+
+        os.makedirs(self.objects_dir, exist_ok=True)
+        self._load_index()
+        if os.path.exists(self.compacted_file):
+            with open(self.compacted_file, 'r') as f:
+                self.compacted_before = json.load(f).get('before')
+
+    def __len__(self):
+        return len(self.by_sha)
+
+    def _load_index(self):
+        """Load the index file into memory"""
+        if not os.path.exists(self.index_file):
+            return
+
+        with open(self.index_file, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # A torn final line from an interrupted run - skip it
+                    continue
+                self._index_entry(entry)
+
+    def _index_entry(self, entry):
+        """Add an entry to the in-memory lookups"""
+        if entry['sha'] in self.by_sha:
+            # Later lines may add a Gmail ID to a message imported from an mbox
+            existing = self.by_sha[entry['sha']]
+            for key in ('gmail_id', 'thread_id'):
+                if entry.get(key) and not existing.get(key):
+                    existing[key] = entry[key]
+                    if key == 'gmail_id':
+                        self.by_gmail_id[entry[key]] = existing
+            return
+
+        self.by_sha[entry['sha']] = entry
+        if entry.get('gmail_id'):
+            self.by_gmail_id[entry['gmail_id']] = entry
+        if entry.get('message_id'):
+            self.by_message_id[entry['message_id']] = entry
+
+        position = bisect.bisect_right(self._dates, entry['date'])
+        self._dates.insert(position, entry['date'])
+        self.entries.insert(position, entry)
+
+    def _object_path(self, sha):
+        return os.path.join(self.objects_dir, sha[:2], f"{sha}.eml.gz")
+
+    def object_path(self, entry):
+        """Path of the gzip-compressed raw message for an index entry"""
+        return self._object_path(entry['sha'])
+
+    def has_gmail_id(self, gmail_id):
+        """Check whether a Gmail message ID is already stored"""
+        return gmail_id in self.by_gmail_id
+
+    def has_message_id(self, message_id):
+        """Check whether a Message-ID header is already stored"""
+        return message_id in self.by_message_id
+
+    def add(self, raw, gmail_id=None, thread_id=None, internal_date=None):
+        """
+        Add a raw RFC822 message to the store
+
+        Args:
+            raw: Message bytes
+            gmail_id: Gmail message ID (if downloaded from Gmail)
+            thread_id: Gmail thread ID
+            internal_date: Gmail internalDate (ms since epoch); falls back to the Date header
+
+        Returns:
+            The new index entry, or None if the message was already stored
+        """
+        if gmail_id and gmail_id in self.by_gmail_id:
+            return None
+
+        headers = BytesHeaderParser().parsebytes(raw)
+        message_id = (headers.get('Message-ID') or '').strip()
+        sha = hashlib.sha256(raw).hexdigest()
+
+        existing = self.by_sha.get(sha) or (self.by_message_id.get(message_id) if message_id else None)
+        if existing is not None:
+            if gmail_id and not existing.get('gmail_id'):
+                # Same message seen in an mbox import first - remember its Gmail ID
+                self._append_index(dict(existing, gmail_id=gmail_id, thread_id=thread_id))
+            return None
+
+        if internal_date:
+            date = datetime.fromtimestamp(int(internal_date) / 1000, tz=timezone.utc)
+        else:
+            try:
+                date = parsedate_to_datetime(headers.get('Date', ''))
+            except (TypeError, ValueError):
+                date = None
+            if date is None:
+                date = datetime.now(timezone.utc)
+
+        path = self._object_path(sha)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = path + '.tmp'
+            with gzip.open(tmp_path, 'wb', compresslevel=6) as f:
+                f.write(raw)
+            os.replace(tmp_path, path)
+
+        entry = {
+            'sha': sha,
+            'gmail_id': gmail_id,
+            'message_id': message_id,
+            'thread_id': thread_id,
+            'date': _utc(date).strftime('%Y-%m-%dT%H:%M:%S'),
+            'size': len(raw)
+        }
+        self._append_index(entry)
+        return entry
+
+    def _append_index(self, entry):
+        """Append an entry to the index file and the in-memory lookups"""
+        with open(self.index_file, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(entry) + "\n")
+        self._index_entry(entry)
+
+    def remove(self, entries, before=None):
+        """
+        Drop messages from the store (index lines and compressed objects)
+
+        Args:
+            entries: Index entries to drop
+            before: datetime.date - every message before this day has left the
+                    store; recorded so daily rollups keep their saved results
+
+        Returns:
+            Number of messages removed
+        """
+        shas = {entry['sha'] for entry in entries}
+        if shas:
+            tmp_path = self.index_file + '.tmp'
+            with open(self.index_file, 'r', encoding='utf-8') as src, \
+                    open(tmp_path, 'w', encoding='utf-8') as dst:
+                for line in src:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue
+                    if entry['sha'] not in shas:
+                        dst.write(json.dumps(entry) + "\n")
+            os.replace(tmp_path, self.index_file)
+
+            for sha in shas:
+                try:
+                    os.remove(self._object_path(sha))
+                except OSError:
+                    pass
+
+            self.entries = []
+            self._dates = []
+            self.by_sha = {}
+            self.by_gmail_id = {}
+            self.by_message_id = {}
+            self._load_index()
+
+        if before is not None:
+            before = before.isoformat()
+            if self.compacted_before is None or before > self.compacted_before:
+                with open(self.compacted_file, 'w') as f:
+                    json.dump({'before': before}, f)
+                self.compacted_before = before
+        return len(shas)
+
+    def get_raw(self, entry):
+        """Read the raw bytes for an index entry"""
+        with gzip.open(self._object_path(entry['sha']), 'rb') as f:
+            return f.read()
+
+    def get_message(self, entry):
+        """Parse the stored message for an index entry, adding its Gmail thread ID header"""
+        message = email.message_from_bytes(self.get_raw(entry))
+        if entry.get('thread_id') and THREAD_HEADER not in message:
+            message[THREAD_HEADER] = entry['thread_id']
+        return message
+
+    def select(self, start=None, end=None):
+        """
+        Index entries with start <= date < end, oldest first
+
+        Args:
+            start: datetime (naive = local time) or None for no lower bound
+            end: datetime (naive = local time) or None for no upper bound
+        """
+        lo = 0
+        hi = len(self.entries)
+        if start is not None:
+            lo = bisect.bisect_left(self._dates, _utc(start.astimezone()).strftime('%Y-%m-%dT%H:%M:%S'))
+        if end is not None:
+            hi = bisect.bisect_left(self._dates, _utc(end.astimezone()).strftime('%Y-%m-%dT%H:%M:%S'))
+        return self.entries[lo:hi]
+
+    def iter_messages(self, start=None, end=None):
+        """Yield parsed email.message.Message objects for a date range"""
+        for entry in self.select(start, end):
+            try:
+                yield self.get_message(entry)
+            except (OSError, EOFError) as e:
+                print(f"  ⚠ Could not read stored message {entry['sha'][:12]}: {e}")
+
+    def select_days_back(self, days_back):
+        """Entries since midnight `days_back` days ago (the same window as Gmail's after: query)"""
+        start = datetime.combine((datetime.now() - timedelta(days=days_back)).date(), datetime.min.time())
+        return self.select(start, None), start
+
+    def import_mbox(self, filepath, show_progress=True):
+        """
+        Import an existing mbox dump, skipping messages already stored
+
+        Returns:
+            Number of new messages added
+        """
+        added = 0
+        mbox = mailbox.mbox(filepath)
+        try:
+            for i, key in enumerate(mbox.keys(), 1):
+                if self.add(mbox.get_bytes(key)) is not None:
+                    added += 1
+                if show_progress and i % 500 == 0:
+                    print(f"  Imported {i} messages...")
+        finally:
+            mbox.close()
+        return added
+
+    def export_mbox(self, output_file, start=None, end=None):
+        """Write a date range to an mbox file (for tools that need a file)"""
+        count = 0
+        mbox = mailbox.mbox(output_file)
+        mbox.lock()
+        try:
+            for entry in self.select(start, end):
+                mbox.add(self.get_raw(entry))
+                count += 1
+        finally:
+            mbox.unlock()
+            mbox.close()
+        return count
+
+    def stats(self):
+        """Summary of the store contents"""
+        raw_bytes = sum(entry.get('size', 0) for entry in self.by_sha.values())
+        stored_bytes = 0
+        for dirpath, _, filenames in os.walk(self.objects_dir):
+            for filename in filenames:
+                stored_bytes += os.path.getsize(os.path.join(dirpath, filename))
+
+        return {
+            'messages': len(self),
+            'first_date': self._dates[0] if self._dates else None,
+            'last_date': self._dates[-1] if self._dates else None,
+            'raw_mb': raw_bytes / (1024 * 1024),
+            'stored_mb': stored_bytes / (1024 * 1024)
+        }
+
+
+def main():
+    """Command line store maintenance"""
+    if len(sys.argv) < 2 or sys.argv[1] not in ('import', 'stats', 'export'):
+        print(__doc__)
+        return
+
+    store = MessageStore()
+    command = sys.argv[1]
+
+    if command == 'import':
+        for filepath in sys.argv[2:]:
+            print(f"Importing {filepath}...")
+            added = store.import_mbox(filepath)
+            print(f"✓ {added} new messages added")
+
+    elif command == 'export':
+        if len(sys.argv) != 5:
+            print("Usage: python message_store.py export START_DATE END_DATE output.mbox")
+            return
+        start = datetime.strptime(sys.argv[2], '%Y-%m-%d')
+        end = datetime.strptime(sys.argv[3], '%Y-%m-%d') + timedelta(days=1)
+        count = store.export_mbox(sys.argv[4], start, end)
+        print(f"✓ Exported {count} messages to {sys.argv[4]}")
+
+    info = store.stats()
+    print("\n" + "="*70)
+    print("MESSAGE STORE")
+    print("="*70)
+    print(f"  Location: {store.root}")
+    print(f"  Messages: {info['messages']}")
+    if info['messages']:
+        print(f"  Date range: {info['first_date']} - {info['last_date']} (UTC)")
+        print(f"  Size: {info['stored_mb']:.2f} MB compressed ({info['raw_mb']:.2f} MB raw)")
+    print("="*70)
+
+
+if __name__ == "__main__":
+    main()
@@ -5,13 +5,31 @@ Complete automated workflow: Download emails → Analyze → Generate team repor
 Run this every Monday morning for instant weekly insights!
 """
 
+import time
+_IMPORT_START = time.perf_counter()
+
 import os
-from datetime import datetime
-from gmail_downloader import GmailDownloader
+import argparse
+from datetime import datetime, timedelta
 from weekly_report_generator import WeeklyReportGenerator
+from message_store import MessageStore
+from mbox_writer import find_latest_mbox
+from startup_budget import report_startup
+
+# gmail_downloader is imported inside monday_morning_report() only when a
+# download runs, so --skip-download never loads the Google client libraries
+STARTUP_TIME = time.perf_counter() - _IMPORT_START
+
 
-def monday_morning_report():
-    """Complete automated workflow"""
+def monday_morning_report(skip_download=False, mbox_file=None):
+    """
+    Complete automated workflow
+    
+    Args:
+        skip_download: Re-run analysis on emails already downloaded (no Gmail access)
+        mbox_file: Mbox to analyze when skipping the download (default: the message
+                   store, or the newest mbox in data/raw)
+    """
     
     print("="*70)
     print("🌅 MONDAY MORNING AUTOMATION")
@@ -41,9 +59,40 @@ def monday_morning_report():
     ]
     
     # Output directories
-    DATA_DIR = "data/raw"  # Where to save downloaded emails
+    DATA_DIR = "data/raw"  # Where to save downloaded emails (mbox mode)
+    STORE_DIR = "data/store"  # Local message store (one copy of every email)
     REPORTS_DIR = "reports"  # Where to save reports
     
+    # Message store mode: keep every email once in data/store and only download
+    # what is new, instead of writing a fresh timestamped mbox every run
+    USE_MESSAGE_STORE = True
+    
+    # List the search window as parallel date shards of this many hours
+    # (None = one sequential listing; helps most for long windows)
+    LIST_SHARD_HOURS = 24
+    
+    # Keep daily rollups (data/rollups) of each finished day in the store so
+    # monthly/quarterly reports merge them instead of re-analyzing
+    USE_ROLLUPS = True
+    
+    # Move store emails older than STORE_RETENTION_DAYS (45) into the compressed
+    # archive (data/archive) after each run, so data/store does not grow forever.
+    # Off by default: folder_scanner.py and query_server.py issue analysis read
+    # only the store, so archived mail drops out of them (corpus_db/search_index
+    # keep it). Turn on once older periods are read via archive_manager export.
+    USE_ARCHIVE = False
+    
+    # Thread mode: download each conversation with one threads.get call instead
+    # of one call per message (whole threads, including older replies)
+    DOWNLOAD_THREADS = False
+    
+    # Streaming mode: analyze emails while they download instead of after
+    STREAMING_MODE = True
+    STREAM_QUEUE_SIZE = 200  # Max downloaded emails waiting for analysis
+    
+    # Skip auto-replies/newsletters by checking headers before downloading bodies
+    PREFILTER_CONFIG = None  # e.g. 'prefilter.json' (None = download everything)
+    
     # ========================================
     # END CONFIGURATION
     # ========================================
@@ -60,38 +109,152 @@ def monday_morning_report():
     mbox_path = os.path.join(DATA_DIR, mbox_filename)
     report_path = os.path.join(REPORTS_DIR, f"weekly_team_report_{timestamp}.txt")
     
-    # Step 1: Download emails
-    print("\n" + "="*70)
-    print("STEP 1: DOWNLOADING EMAILS FROM GMAIL")
-    print("="*70)
+    reporter = WeeklyReportGenerator()
     
-    downloader = GmailDownloader()
+    # Load previous week for comparison
+    reporter.load_previous_week_data()
     
-    try:
-        downloader.authenticate()
-    except Exception as e:
-        print(f"\n❌ Gmail authentication failed: {e}")
-        print("\nPlease set up Gmail API first (see GMAIL_SETUP_GUIDE.md)")
-        return False
+    store = None
+    success = None
     
-    print(f"\nDownloading emails...")
-    print(f"  Query: {GMAIL_QUERY}")
-    print(f"  Period: Last {DAYS_BACK} days")
-    
-    try:
-        downloader.download_to_mbox(
-            output_file=mbox_path,
-            query=GMAIL_QUERY,
-            max_results=None,
-            days_back=DAYS_BACK,
-            show_progress=True
-        )
-    except Exception as e:
-        print(f"\n❌ Download failed: {e}")
-        return False
+    if skip_download:
+        # Step 1: Reuse emails already on disk - the Gmail libraries are never imported
+        print("\n" + "="*70)
+        print("STEP 1: USING PREVIOUSLY DOWNLOADED EMAILS")
+        print("="*70)
+        
+        if not mbox_file and USE_MESSAGE_STORE:
+            store = MessageStore(STORE_DIR)
+            if not len(store):
+                # Nothing stored yet - fall back to the newest mbox dump
+                store = None
+        
+        if mbox_file:
+            mbox_path = email_source = mbox_file
+        elif store is not None:
+            email_source = f"store:last_{DAYS_BACK}_days"
+            _, start = store.select_days_back(DAYS_BACK)
+            print(f"\nAnalyzing last {DAYS_BACK} days from message store: {STORE_DIR}")
+            success = reporter.analyze_general_trends_stream(store.iter_messages(start), 'keywords.json',
+                                                             source=email_source)
+        else:
+            mbox_path = email_source = find_latest_mbox(DATA_DIR)
+            if not mbox_path:
+                print(f"\n❌ No mbox files found in {DATA_DIR}")
+                return False
+        
+        if store is None:
+            print(f"\nAnalyzing existing mbox: {mbox_path}")
+    else:
+        # Step 1: Download emails
+        print("\n" + "="*70)
+        print("STEP 1: DOWNLOADING EMAILS FROM GMAIL")
+        print("="*70)
+        
+        # Gmail libraries are only imported when a download is requested
+        from gmail_downloader import GmailDownloader, MessagePrefilter
+        from streaming_pipeline import stream_download, stream_download_to_store, check_download, DownloadError
+        
+        downloader = GmailDownloader(shard_hours=LIST_SHARD_HOURS)
+        
+        try:
+            downloader.authenticate()
+        except Exception as e:
+            print(f"\n❌ Gmail authentication failed: {e}")
+            print("\nPlease set up Gmail API first (see GMAIL_SETUP_GUIDE.md)")
+            return False
+        
+        print(f"\nDownloading emails...")
+        print(f"  Query: {GMAIL_QUERY}")
+        print(f"  Period: Last {DAYS_BACK} days")
+        
+        prefilter = None
+        if PREFILTER_CONFIG and os.path.exists(PREFILTER_CONFIG):
+            prefilter = MessagePrefilter.from_config(PREFILTER_CONFIG)
+            print(f"  Prefilter: {PREFILTER_CONFIG}")
+        
+        try:
+            if USE_MESSAGE_STORE:
+                # Only messages not already in the store are downloaded
+                store = MessageStore(STORE_DIR)
+                email_source = f"store:last_{DAYS_BACK}_days"
+        
+                if STREAMING_MODE:
+                    # Steps 1 + 2 overlap: each email is analyzed as soon as it is downloaded
+                    print("  Mode: Streaming (download and analysis run together)")
+                    messages = stream_download_to_store(
+                        downloader,
+                        store,
+                        query=GMAIL_QUERY,
+                        max_results=None,
+                        days_back=DAYS_BACK,
+                        queue_size=STREAM_QUEUE_SIZE,
+                        show_progress=True,
+                        prefilter=prefilter,
+                        threads=DOWNLOAD_THREADS
+                    )
+                else:
+                    stats = {}
+                    downloader.download_to_store(
+                        store,
+                        query=GMAIL_QUERY,
+                        max_results=None,
+                        days_back=DAYS_BACK,
+                        show_progress=True,
+                        prefilter=prefilter,
+                        threads=DOWNLOAD_THREADS,
+                        stats=stats
+                    )
+                    check_download(stats)
+                    _, start = store.select_days_back(DAYS_BACK)
+                    messages = store.iter_messages(start)
+        
+            elif STREAMING_MODE:
+                email_source = mbox_path
+                print("  Mode: Streaming (download and analysis run together)")
+                messages = stream_download(
+                    downloader,
+                    output_file=mbox_path,
+                    query=GMAIL_QUERY,
+                    max_results=None,
+                    days_back=DAYS_BACK,
+                    queue_size=STREAM_QUEUE_SIZE,
+                    show_progress=True,
+                    prefilter=prefilter,
+                    threads=DOWNLOAD_THREADS
+                )
+        
+            else:
+                email_source = mbox_path
+                stats = {}
+                downloader.download_to_mbox(
+                    output_file=mbox_path,
+                    query=GMAIL_QUERY,
+                    max_results=None,
+                    days_back=DAYS_BACK,
+                    show_progress=True,
+                    prefilter=prefilter,
+                    threads=DOWNLOAD_THREADS,
+                    stats=stats
+                )
+                check_download(stats)
+                messages = None
+        except Exception as e:
+            print(f"\n❌ Download failed: {e}")
+            return False
+        
+        if messages is not None:
+            # In streaming mode the download finishes while the analysis consumes it;
+            # its errors (and missed messages) surface here as DownloadError,
+            # analysis errors propagate as-is
+            try:
+                success = reporter.analyze_general_trends_stream(messages, 'keywords.json', source=email_source)
+            except DownloadError as e:
+                print(f"\n❌ Download failed: {e}")
+                return False
     
     # Check if download successful
-    if not os.path.exists(mbox_path):
+    if store is None and not os.path.exists(mbox_path):
         print(f"\n❌ Mbox file not created: {mbox_path}")
         return False
     
@@ -100,14 +263,10 @@ def monday_morning_report():
     print("STEP 2: ANALYZING EMAILS & GENERATING REPORT")
     print("="*70)
     
-    reporter = WeeklyReportGenerator()
-    
-    # Load previous week for comparison
-    reporter.load_previous_week_data()
-    
-    # Run general analysis
-    print("\nRunning general trend analysis...")
-    success = reporter.analyze_general_trends(mbox_path, 'keywords.json')
+    if success is None:
+        # Run general analysis
+        print("\nRunning general trend analysis...")
+        success = reporter.analyze_general_trends(mbox_path, 'keywords.json')
     
     if not success:
         print("❌ Analysis failed")
@@ -119,7 +278,7 @@ def monday_morning_report():
     
     if active_configs:
         print(f"Found {len(active_configs)} active issue config(s)")
-        reporter.track_critical_issues(mbox_path, active_configs)
+        reporter.track_critical_issues(email_source, active_configs)
     else:
         print("No issue configs found (this is okay for general reports)")
     
@@ -130,16 +289,37 @@ def monday_morning_report():
     # Save data for next week's comparison
     reporter.save_current_week_data()
     
+    if store is not None and USE_ROLLUPS:
+        # Roll up this week's finished days for the monthly report
+        print("\nUpdating daily rollups...")
+        from rollups import RollupManager
+        _, start = store.select_days_back(DAYS_BACK)
+        yesterday = (datetime.now() - timedelta(days=1)).date()
+        RollupManager(store, 'keywords.json', active_configs).build(start.date(), yesterday)
+    
+    if store is not None and USE_ARCHIVE:
+        # After the rollups, so every archived day already has its rollup
+        from archive_manager import ArchiveManager, STORE_RETENTION_DAYS
+        print(f"\nArchiving stored emails older than {STORE_RETENTION_DAYS} days...")
+        archive = ArchiveManager()
+        added, duplicates = archive.compact_store(store)
+        archive.enforce_retention()
+        print(f"✓ {added + duplicates} emails moved to {archive.root}")
+    
     # Success summary
     print("\n" + "="*70)
     print("✅ MONDAY MORNING AUTOMATION COMPLETE!")
     print("="*70)
-    print(f"\n📧 Email File: {mbox_path}")
+    if store is not None:
+        print(f"\n📧 Message Store: {STORE_DIR} ({len(store)} emails)")
+    else:
+        print(f"\n📧 Email File: {mbox_path}")
     print(f"📊 Team Report: {report_path}")
     
-    file_size = os.path.getsize(mbox_path) / (1024 * 1024)
     print(f"\n📈 Statistics:")
-    print(f"  • Email file size: {file_size:.2f} MB")
+    if store is None:
+        file_size = os.path.getsize(mbox_path) / (1024 * 1024)
+        print(f"  • Email file size: {file_size:.2f} MB")
     print(f"  • Total emails: {reporter.general_results['total_emails']}")
     print(f"  • Critical issues tracked: {len(reporter.issue_results)}")
     
@@ -159,7 +339,7 @@ def monday_morning_report():
     return True
 
 
-def quick_check():
+def quick_check(require_credentials=True):
     """Quick configuration check before running"""
     print("\n" + "="*70)
     print("CONFIGURATION CHECK")
@@ -168,7 +348,9 @@ def quick_check():
     issues = []
     
     # Check for credentials
-    if not os.path.exists('credentials.json'):
+    if not require_credentials:
+        print("✓ Skipping download - Gmail credentials not needed")
+    elif not os.path.exists('credentials.json'):
         issues.append("❌ credentials.json not found - Gmail API not set up")
         issues.append("   → See GMAIL_SETUP_GUIDE.md")
     else:
@@ -204,6 +386,15 @@ def quick_check():
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Download, analyze and report on last week's support emails")
+    parser.add_argument('--skip-download', action='store_true',
+                        help="re-run analysis on emails already downloaded (no Gmail access)")
+    parser.add_argument('--mbox', help="mbox file to analyze with --skip-download")
+    args = parser.parse_args()
+    
+    if args.skip_download:
+        report_startup(STARTUP_TIME)
+    
     print("""
     ╔══════════════════════════════════════════════════════════════════╗
     ║                                                                  ║
@@ -215,7 +406,7 @@ if __name__ == "__main__":
     """)
     
     # Check configuration first
-    if not quick_check():
+    if not quick_check(require_credentials=not args.skip_download):
         print("\nPlease fix configuration issues and try again.")
         exit(1)
     
@@ -228,6 +419,6 @@ if __name__ == "__main__":
         exit(0)
     
     # Run automation
-    success = monday_morning_report()
+    success = monday_morning_report(skip_download=args.skip_download, mbox_file=args.mbox)
     
     exit(0 if success else 1)
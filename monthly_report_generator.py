@@ -5,13 +5,31 @@ Complete automated workflow: Download emails → Analyze → Generate monthly re
 Run this monthly for comprehensive insights into support trends over the last 30 days!
 """
 
+import time
+_IMPORT_START = time.perf_counter()
+
 import os
+import argparse
 from datetime import datetime
-from gmail_downloader import GmailDownloader
 from weekly_report_generator import WeeklyReportGenerator
+from message_store import MessageStore
+from mbox_writer import find_latest_mbox
+from startup_budget import report_startup
+
+# gmail_downloader is imported inside monthly_report() only when a download
+# runs, so --skip-download never loads the Google client libraries
+STARTUP_TIME = time.perf_counter() - _IMPORT_START
+
 
-def monthly_report():
-    """Complete automated workflow for monthly reporting"""
+def monthly_report(skip_download=False, mbox_file=None):
+    """
+    Complete automated workflow for monthly reporting
+    
+    Args:
+        skip_download: Re-run analysis on emails already downloaded (no Gmail access)
+        mbox_file: Mbox to analyze when skipping the download (default: the message
+                   store, or the newest mbox in data/raw)
+    """
     
     print("="*70)
     print("📅 MONTHLY REPORT GENERATOR")
@@ -41,9 +59,22 @@ def monthly_report():
     ]
     
     # Output directories
-    DATA_DIR = "data/raw"  # Where to save downloaded emails
+    DATA_DIR = "data/raw"  # Where to save downloaded emails (mbox mode)
+    STORE_DIR = "data/store"  # Local message store (shared with weekly runs)
     REPORTS_DIR = "reports"  # Where to save reports
     
+    # Message store mode: reuse emails the weekly runs already downloaded and
+    # only fetch what is missing from the last 30 days
+    USE_MESSAGE_STORE = True
+    
+    # Rollup mode: assemble the month from daily rollups (data/rollups) instead
+    # of re-analyzing 30 days of emails (needs the message store)
+    USE_ROLLUPS = True
+    
+    # List the search window as parallel date shards of this many hours
+    # (None = one sequential listing; 96h = 8 shards for the 30-day window)
+    LIST_SHARD_HOURS = 96
+    
     # ========================================
     # END CONFIGURATION
     # ========================================
@@ -60,38 +91,85 @@ def monthly_report():
     mbox_path = os.path.join(DATA_DIR, mbox_filename)
     report_path = os.path.join(REPORTS_DIR, f"monthly_team_report_{timestamp}.txt")
     
-    # Step 1: Download emails
-    print("\n" + "="*70)
-    print("STEP 1: DOWNLOADING MONTHLY EMAILS FROM GMAIL")
-    print("="*70)
-    
-    downloader = GmailDownloader()
-    
-    try:
-        downloader.authenticate()
-    except Exception as e:
-        print(f"\n❌ Gmail authentication failed: {e}")
-        print("\nPlease set up Gmail API first (see GMAIL_SETUP_GUIDE.md)")
-        return False
+    store = None
     
-    print(f"\nDownloading emails...")
-    print(f"  Query: {GMAIL_QUERY}")
-    print(f"  Period: Last {DAYS_BACK} days")
-    
-    try:
-        downloader.download_to_mbox(
-            output_file=mbox_path,
-            query=GMAIL_QUERY,
-            max_results=None,
-            days_back=DAYS_BACK,
-            show_progress=True
-        )
-    except Exception as e:
-        print(f"\n❌ Download failed: {e}")
-        return False
+    if skip_download:
+        # Step 1: Reuse emails already on disk - the Gmail libraries are never imported
+        print("\n" + "="*70)
+        print("STEP 1: USING PREVIOUSLY DOWNLOADED EMAILS")
+        print("="*70)
+        
+        if not mbox_file and USE_MESSAGE_STORE:
+            store = MessageStore(STORE_DIR)
+            if not len(store):
+                # Nothing stored yet - fall back to the newest mbox dump
+                store = None
+        
+        if mbox_file:
+            mbox_path = mbox_file
+        elif store is None:
+            mbox_path = find_latest_mbox(DATA_DIR)
+            if not mbox_path:
+                print(f"\n❌ No mbox files found in {DATA_DIR}")
+                return False
+        
+        print(f"\nAnalyzing existing emails: {STORE_DIR if store is not None else mbox_path}")
+    else:
+        # Step 1: Download emails
+        print("\n" + "="*70)
+        print("STEP 1: DOWNLOADING MONTHLY EMAILS FROM GMAIL")
+        print("="*70)
+        
+        # Gmail libraries are only imported when a download is requested
+        from gmail_downloader import GmailDownloader, download_problem
+        
+        downloader = GmailDownloader(shard_hours=LIST_SHARD_HOURS)
+        
+        try:
+            downloader.authenticate()
+        except Exception as e:
+            print(f"\n❌ Gmail authentication failed: {e}")
+            print("\nPlease set up Gmail API first (see GMAIL_SETUP_GUIDE.md)")
+            return False
+        
+        print(f"\nDownloading emails...")
+        print(f"  Query: {GMAIL_QUERY}")
+        print(f"  Period: Last {DAYS_BACK} days")
+        
+        stats = {}
+        try:
+            if USE_MESSAGE_STORE:
+                store = MessageStore(STORE_DIR)
+                downloader.download_to_store(
+                    store,
+                    query=GMAIL_QUERY,
+                    max_results=None,
+                    days_back=DAYS_BACK,
+                    show_progress=True,
+                    stats=stats
+                )
+            else:
+                downloader.download_to_mbox(
+                    output_file=mbox_path,
+                    query=GMAIL_QUERY,
+                    max_results=None,
+                    days_back=DAYS_BACK,
+                    show_progress=True,
+                    stats=stats
+                )
+        except Exception as e:
+            print(f"\n❌ Download failed: {e}")
+            return False
+        
+        # A report over a partial month would understate every count
+        problem = download_problem(stats)
+        if problem:
+            print(f"\n❌ Download incomplete: {problem}")
+            return False
+        
     
     # Check if download successful
-    if not os.path.exists(mbox_path):
+    if store is None and not os.path.exists(mbox_path):
         print(f"\n❌ Mbox file not created: {mbox_path}")
         return False
     
@@ -104,23 +182,42 @@ def monthly_report():
     reporter = WeeklyReportGenerator()
     
     # Load previous month for comparison (if available)
-    reporter.load_previous_week_data('previous_month_data.json')
+    reporter.load_previous_week_data('previous_month_data.json', period_type='month')
+    
+    active_configs = [cfg for cfg in ISSUE_CONFIGS if os.path.exists(cfg)]
+    from_rollups = store is not None and USE_ROLLUPS
     
     # Run general analysis
     print("\nRunning monthly trend analysis...")
-    success = reporter.analyze_general_trends(mbox_path, 'keywords.json')
+    if from_rollups:
+        # Merge the daily rollups weekly runs already computed - only days that
+        # are not rolled up yet (and today) are analyzed
+        email_source = f"store:last_{DAYS_BACK}_days"
+        _, start = store.select_days_back(DAYS_BACK)
+        success = reporter.analyze_from_rollups(store, start.date(), datetime.now().date(), 'keywords.json',
+                                                active_configs, source=email_source)
+    elif store is not None:
+        # Select the 30-day window from the store instead of a fresh mbox dump
+        email_source = f"store:last_{DAYS_BACK}_days"
+        _, start = store.select_days_back(DAYS_BACK)
+        success = reporter.analyze_general_trends_stream(store.iter_messages(start), 'keywords.json',
+                                                         source=email_source)
+    else:
+        email_source = mbox_path
+        success = reporter.analyze_general_trends(mbox_path, 'keywords.json')
     
     if not success:
         print("❌ Analysis failed")
         return False
     
-    # Track critical issues
+    # Track critical issues (already merged from the rollups in rollup mode)
     print("\nTracking critical issues over 30-day period...")
-    active_configs = [cfg for cfg in ISSUE_CONFIGS if os.path.exists(cfg)]
     
-    if active_configs:
+    if from_rollups:
+        print(f"Merged {len(reporter.issue_results)} issue(s) from daily rollups")
+    elif active_configs:
         print(f"Found {len(active_configs)} active issue config(s)")
-        reporter.track_critical_issues(mbox_path, active_configs)
+        reporter.track_critical_issues(email_source, active_configs)
     else:
         print("No issue configs found (this is okay for general reports)")
     
@@ -280,7 +377,10 @@ def monthly_report():
         lines.append(f"\n{'─'*70}")
         lines.append("📎 MONTHLY ATTACHMENTS")
         lines.append(f"{'─'*70}")
-        lines.append(f"\n• Raw email data: {mbox_filename}")
+        if USE_MESSAGE_STORE:
+            lines.append(f"\n• Raw email data: message store ({STORE_DIR})")
+        else:
+            lines.append(f"\n• Raw email data: {mbox_filename}")
         lines.append(f"• Detailed analysis: email_report_[timestamp].txt")
         if reporter.issue_results:
             lines.append("• Critical issue reports: issue_report_*.txt")
@@ -317,12 +417,16 @@ def monthly_report():
     print("\n" + "="*70)
     print("✅ MONTHLY REPORT GENERATION COMPLETE!")
     print("="*70)
-    print(f"\n📧 Email File: {mbox_path}")
+    if store is not None:
+        print(f"\n📧 Message Store: {STORE_DIR} ({len(store)} emails)")
+    else:
+        print(f"\n📧 Email File: {mbox_path}")
     print(f"📊 Monthly Report: {report_path}")
     
-    file_size = os.path.getsize(mbox_path) / (1024 * 1024)
     print(f"\n📈 Monthly Statistics:")
-    print(f"  • Email file size: {file_size:.2f} MB")
+    if store is None:
+        file_size = os.path.getsize(mbox_path) / (1024 * 1024)
+        print(f"  • Email file size: {file_size:.2f} MB")
     print(f"  • Total emails: {reporter.general_results['total_emails']}")
     print(f"  • Daily average: {reporter.general_results['total_emails']/DAYS_BACK:.1f} emails per day")
     print(f"  • Critical issues tracked: {len(reporter.issue_results)}")
@@ -344,7 +448,7 @@ def monthly_report():
     return True
 
 
-def quick_config_check():
+def quick_config_check(require_credentials=True):
     """Check configuration before running"""
     print("\n" + "="*70)
     print("MONTHLY CONFIGURATION CHECK")
@@ -353,7 +457,9 @@ def quick_config_check():
     issues = []
     
     # Check for credentials
-    if not os.path.exists('credentials.json'):
+    if not require_credentials:
+        print("✅ Skipping download - Gmail credentials not needed")
+    elif not os.path.exists('credentials.json'):
         issues.append("❌ credentials.json not found - Gmail API not set up")
         issues.append("   → See GMAIL_SETUP_GUIDE.md")
     else:
@@ -389,6 +495,15 @@ def quick_config_check():
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Download, analyze and report on the last 30 days of support emails")
+    parser.add_argument('--skip-download', action='store_true',
+                        help="re-run analysis on emails already downloaded (no Gmail access)")
+    parser.add_argument('--mbox', help="mbox file to analyze with --skip-download")
+    args = parser.parse_args()
+    
+    if args.skip_download:
+        report_startup(STARTUP_TIME)
+    
     print("""
     ╔══════════════════════════════════════════════════════════════════════╗
     ║                                                                      ║
@@ -402,7 +517,7 @@ if __name__ == "__main__":
     """)
     
     # Check configuration first
-    if not quick_config_check():
+    if not quick_config_check(require_credentials=not args.skip_download):
         print("\nPlease fix configuration issues and try again.")
         exit(1)
     
@@ -415,6 +530,6 @@ if __name__ == "__main__":
         exit(0)
     
     # Run monthly automation
-    success = monthly_report()
+    success = monthly_report(skip_download=args.skip_download, mbox_file=args.mbox)
     
     exit(0 if success else 1)
@@ -0,0 +1,461 @@
+#!/usr/bin/env python3
+"""
+Query Server
+Long-lived local HTTP service that keeps the search index (the corpus
+database, see search_index.py) open with its fuzzy vocabulary loaded, the compiled
+keyword matchers and the latest report aggregates in memory, so ad-hoc
+count, phrase, category and issue questions are answered in milliseconds
+instead of re-loading everything from disk on every script run. Requests are
+handled on separate threads, so several people can query at once.
+
+New emails in the message store (or data/raw when there is no store) are
+added to the index on every load, so new downloads show up after a reload.
+
+Listens on 127.0.0.1 only. Endpoints return JSON:
+
+    GET  /count?q=did+not+receive&q=onvif[&fuzzy=1]    emails per needle
+    GET  /phrase?q=firmware+NEAR/5+freezing[&limit=20] matching emails with positions
+    GET  /search?q=superjoy+hdmi+freezing[&limit=10]   BM25 top emails
+    GET  /category[?name=Firmware]                     keyword category: index counts + latest report
+    GET  /issue[?id=DARK-IMAGE-2026-001]               tracked issue: current matches + history trend
+    GET  /stats                                        index summary
+    POST /classify  (body = email text)                keyword category hits for a text
+    POST /reload                                       re-read index, configs, history
+
+Usage:
+    python query_server.py serve [--port 8765]
+    python query_server.py count "did not receive" onvif       # client
+    python query_server.py search superjoy hdmi freezing
+    python query_server.py category Firmware
+    python query_server.py issue
+"""
+
+import os
+import sys
+import json
+import time
+import io
+import argparse
+import threading
+import contextlib
+import traceback
+import urllib.parse
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from search_index import SearchIndex
+from corpus_db import DEFAULT_DB_FILE
+from folder_scanner import MultiNeedleMatcher
+from results_history import ResultsHistory, DEFAULT_HISTORY_FILE, sparkline
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+
+# Cap on emails listed by /phrase and /search
+MAX_RESULTS = 100
+
+
+class QueryState:
+    """Everything the server keeps warm; replaced as a whole on reload"""
+
+    def __init__(self, db_file=DEFAULT_DB_FILE, keywords_file='keywords.json',
+                 history_file=DEFAULT_HISTORY_FILE, issue_folder='.'):
+        """
+        Load the index, keyword categories, issue configs and results history
+
+        Args:
+            db_file: Corpus database searched by search_index.py
+            keywords_file: Keyword categories (defaults used if missing)
+            history_file: Results history with the latest aggregates
+            issue_folder: Folder with *_issue.json / *_issues.json configs
+        """
+        from email_analyzer_mbox import EmailAnalyzer
+
+        started = time.perf_counter()
+        self.index = SearchIndex(db_file)
+        changed, deleted = self.index.stale_files()
+        if changed or deleted:
+            # Pick up emails downloaded since the last build
+            self.index.update(show_progress=False)
+        # Load the fuzzy lookup tables now rather than inside a request
+        self.index._load_vocabulary()
+
+        analyzer = EmailAnalyzer(keywords_file if os.path.exists(keywords_file) else None)
+        self.categories = analyzer.keyword_categories
+        self.matchers = {name: MultiNeedleMatcher(keywords)
+                         for name, keywords in self.categories.items() if keywords}
+
+        self.issues = {}
+        self.issue_files = {}
+        for filename in sorted(os.listdir(issue_folder)):
+            if filename.endswith(('_issue.json', '_issues.json')):
+                path = os.path.join(issue_folder, filename)
+                with open(path, 'r') as f:
+                    config = json.load(f)
+                issue_id = config.get('issue_id', filename)
+                self.issues[issue_id] = config
+                self.issue_files[issue_id] = path
+
+        self.history = ResultsHistory(history_file)
+        self.loaded_at = time.strftime('%Y-%m-%dT%H:%M:%S')
+        self.load_seconds = time.perf_counter() - started
+        self._cache = {}
+        self._cache_lock = threading.Lock()
+        self._issue_lock = threading.Lock()
+        self._issue_results = None
+
+    def _cached(self, key, compute):
+        """Answer from the per-load cache, computing it on first use"""
+        with self._cache_lock:
+            if key in self._cache:
+                return self._cache[key]
+        value = compute()
+        with self._cache_lock:
+            # Another thread may have computed it meanwhile - keep the first
+            return self._cache.setdefault(key, value)
+
+    def _any_of(self, needles):
+        """Doc IDs matching any of several needles"""
+        docs = set()
+        for needle in needles:
+            docs.update(self.index.positions(needle))
+        return docs
+
+    def latest_record(self, period_type='week'):
+        records = self.history.periods(period_type)
+        return records[-1] if records else None
+
+    def category(self, name):
+        """Index and latest-report numbers for one keyword category"""
+        def compute():
+            keywords = self.categories[name]
+            latest = self.latest_record()
+            return {
+                'name': name,
+                'keywords': keywords,
+                'emails': len(self._any_of(keywords)),
+                'per_keyword': self.index.count(keywords),
+                'latest_report': {
+                    'period': latest['period'],
+                    **latest['categories'].get(name, {})
+                } if latest else None,
+                'trend': [value for _, value in self.history.series('week', 'category_emails', name, count=8)]
+            }
+        return self._cached(('category', name), compute)
+
+    def _analyze_issues(self):
+        """
+        Run every tracked issue's IssueTracker over the indexed emails
+
+        Uses the trackers themselves (substring keyword matching, match
+        criteria, exclusions and conversation dedup), so the numbers agree
+        with the reports. The emails are read once per load, on first use.
+
+        Returns:
+            Dictionary of issue ID -> analyze_for_issue results
+        """
+        with self._issue_lock:
+            if self._issue_results is not None:
+                return self._issue_results
+
+            from email_analyzer_mbox import EmailAnalyzer
+            from enhanced_issue_tracker import IssueTracker
+
+            analyzer = EmailAnalyzer()
+            metadata_reader = IssueTracker()
+            emails = []
+            metadata = []
+            for message in self.index.iter_messages():
+                try:
+                    text = analyzer._extract_email_content(message)
+                except Exception:
+                    continue
+                if not text:
+                    continue
+                emails.append(text)
+                metadata.append(metadata_reader._extract_metadata(message, len(metadata)))
+
+            results = {}
+            for issue_id, path in self.issue_files.items():
+                # analyze_for_issue prints a summary per call - not wanted in the server log
+                with contextlib.redirect_stdout(io.StringIO()):
+                    tracker = IssueTracker(path)
+                    results[issue_id] = tracker.analyze_for_issue(emails, metadata, show_progress=False)
+            self._issue_results = results
+            return results
+
+    def issue(self, issue_id):
+        """Current matches (the issue tracker over the indexed emails) and history for one tracked issue"""
+        def compute():
+            config = self.issues[issue_id]
+            current = self._analyze_issues()[issue_id]
+            series = self.history.series('week', 'issue_matches', issue_id, count=8)
+            values = [value for _, value in series]
+            latest = self.latest_record()
+            return {
+                'issue_id': issue_id,
+                'name': config.get('issue_name', issue_id),
+                'severity': config.get('severity', 'UNKNOWN'),
+                'alert_threshold': config.get('tracking_metrics', {}).get('alert_threshold', 5),
+                'escalation_threshold': config.get('tracking_metrics', {}).get('escalation_threshold', 10),
+                'current': {
+                    'emails_analyzed': current['total_emails_analyzed'],
+                    'matched_count': current['matched_emails_count'],
+                    'original_matches': current['original_matches'],
+                    'avg_severity': current['avg_severity'],
+                    'severity_distribution': current['severity_distribution'],
+                    'affected_products': current['affected_products']
+                },
+                'latest_report': dict(latest['issues'][issue_id], period=latest['period'])
+                if latest and issue_id in latest.get('issues', {}) else None,
+                'trend': values,
+                'sparkline': sparkline(values)
+            }
+        return self._cached(('issue', issue_id), compute)
+
+    def classify(self, text):
+        """Keyword hits per category for a piece of text"""
+        lowered = text.lower()
+        result = {}
+        for name, matcher in self.matchers.items():
+            hits = matcher.count(lowered)
+            if hits:
+                result[name] = dict(hits)
+        return result
+
+
+class QueryHandler(BaseHTTPRequestHandler):
+    """Routes requests to the server's current QueryState"""
+
+    server_version = "SupportQuery/1.0"
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def _send(self, status, payload):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _server_error(self, error):
+        """500 payload for an unexpected error; the traceback goes to stderr"""
+        sys.stderr.write(f"❌ Error handling {self.command} {self.path}:\n{traceback.format_exc()}")
+        return 500, {'error': f"{type(error).__name__}: {error}"}
+
+    def do_GET(self):
+        url = urllib.parse.urlparse(self.path)
+        params = urllib.parse.parse_qs(url.query)
+        started = time.perf_counter()
+        try:
+            status, payload = self.server.dispatch(url.path, params)
+        except (KeyError, ValueError) as e:
+            status, payload = 400, {'error': str(e)}
+        except Exception as e:
+            status, payload = self._server_error(e)
+        if isinstance(payload, dict):
+            payload.setdefault('ms', round((time.perf_counter() - started) * 1000, 2))
+        self._send(status, payload)
+
+    def do_POST(self):
+        url = urllib.parse.urlparse(self.path)
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+        except ValueError:
+            self._send(400, {'error': "Invalid Content-Length"})
+            return
+        body = self.rfile.read(length)
+
+        try:
+            if url.path == '/classify':
+                text = body.decode('utf-8', errors='replace')
+                status, payload = 200, {'categories': self.server.state.classify(text)}
+            elif url.path == '/reload':
+                state = self.server.reload()
+                status, payload = 200, {'reloaded': state.loaded_at, 'load_seconds': round(state.load_seconds, 2)}
+            else:
+                status, payload = 404, {'error': f"Unknown endpoint: {url.path}"}
+        except Exception as e:
+            status, payload = self._server_error(e)
+        self._send(status, payload)
+
+
+class QueryServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, state_args=None, verbose=False):
+        """
+        Args:
+            address: (host, port) to listen on
+            state_args: Keyword arguments for QueryState
+            verbose: Log every request
+        """
+        self.state_args = state_args or {}
+        self.state = QueryState(**self.state_args)
+        self.verbose = verbose
+        self._reload_lock = threading.Lock()
+        super().__init__(address, QueryHandler)
+
+    def reload(self):
+        """Re-read everything; requests keep using the old state until the new one is ready"""
+        with self._reload_lock:
+            state = QueryState(**self.state_args)
+            self.state = state
+        return state
+
+    def dispatch(self, path, params):
+        """
+        Answer one GET request
+
+        Returns:
+            (HTTP status, JSON-serializable payload)
+        """
+        state = self.state
+        index = state.index
+        queries = params.get('q', [])
+        fuzzy = params.get('fuzzy', ['0'])[0] in ('1', 'true', 'yes')
+        limit = min(int(params.get('limit', ['10'])[0]), MAX_RESULTS)
+
+        if path == '/count':
+            if not queries:
+                raise ValueError("count needs at least one q= parameter")
+            return 200, {'total': len(index), 'counts': index.count(queries, fuzzy)}
+
+        if path == '/phrase':
+            if not queries:
+                raise ValueError("phrase needs a q= parameter")
+            matches = index.positions(queries[0], fuzzy)
+            emails = [dict(index.document(doc_id), doc_id=doc_id, positions=matches[doc_id])
+                      for doc_id in sorted(matches)[:limit]]
+            return 200, {'query': queries[0], 'count': len(matches), 'emails': emails}
+
+        if path == '/search':
+            if not queries:
+                raise ValueError("search needs a q= parameter")
+            return 200, {'query': queries[0], 'results': index.search(queries[0], limit, fuzzy)}
+
+        if path == '/category':
+            name = params.get('name', [None])[0]
+            if name is None:
+                return 200, {'categories': {n: state.category(n)['emails'] for n in state.categories}}
+            if name not in state.categories:
+                return 404, {'error': f"Unknown category: {name}"}
+            return 200, dict(state.category(name))
+
+        if path == '/issue':
+            issue_id = params.get('id', [None])[0]
+            if issue_id is None:
+                return 200, {'issues': {i: state.issue(i)['current']['matched_count'] for i in state.issues}}
+            if issue_id not in state.issues:
+                return 404, {'error': f"Unknown issue: {issue_id}"}
+            return 200, dict(state.issue(issue_id))
+
+        if path == '/stats':
+            info = index.stats()
+            info.update(categories=len(state.categories), issues=len(state.issues),
+                        loaded_at=state.loaded_at, load_seconds=round(state.load_seconds, 2))
+            return 200, info
+
+        if path in ('/reload', '/classify'):
+            return 405, {'error': f"{path} needs POST"}
+
+        return 404, {'error': f"Unknown endpoint: {path}"}
+
+
+class QueryClient:
+    """Small client for a running query server"""
+
+    def __init__(self, host=DEFAULT_HOST, port=DEFAULT_PORT, timeout=30):
+        self.base_url = f"http://{host}:{port}"
+        self.timeout = timeout
+
+    def _get(self, path, **params):
+        query = urllib.parse.urlencode({k: v for k, v in params.items() if v is not None}, doseq=True)
+        with urllib.request.urlopen(f"{self.base_url}{path}?{query}", timeout=self.timeout) as response:
+            return json.loads(response.read().decode('utf-8'))
+
+    def count(self, *needles, fuzzy=False):
+        """Dictionary of needle -> number of emails"""
+        return self._get('/count', q=list(needles), fuzzy=int(fuzzy))['counts']
+
+    def phrase(self, needle, limit=20, fuzzy=False):
+        return self._get('/phrase', q=needle, limit=limit, fuzzy=int(fuzzy))
+
+    def search(self, query, limit=10, fuzzy=False):
+        return self._get('/search', q=query, limit=limit, fuzzy=int(fuzzy))['results']
+
+    def category(self, name=None):
+        return self._get('/category', name=name)
+
+    def issue(self, issue_id=None):
+        return self._get('/issue', id=issue_id)
+
+    def classify(self, text):
+        request = urllib.request.Request(f"{self.base_url}/classify", data=text.encode('utf-8'), method='POST')
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            return json.loads(response.read().decode('utf-8'))['categories']
+
+    def stats(self):
+        return self._get('/stats')
+
+    def reload(self):
+        request = urllib.request.Request(f"{self.base_url}/reload", data=b'', method='POST')
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            return json.loads(response.read().decode('utf-8'))
+
+
+def main():
+    """Run the server, or query a running one"""
+    parser = argparse.ArgumentParser(description="Warm query server over the support corpus")
+    parser.add_argument('command', choices=['serve', 'count', 'phrase', 'search', 'category', 'issue', 'stats', 'reload'])
+    parser.add_argument('args', nargs='*')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--fuzzy', action='store_true')
+    parser.add_argument('--limit', type=int, default=10)
+    parser.add_argument('--verbose', action='store_true', help="Log every request (serve)")
+    args = parser.parse_args()
+
+    if args.command == 'serve':
+        if not os.path.exists(DEFAULT_DB_FILE):
+            print(f"No corpus database yet - building it first...")
+        server = QueryServer((DEFAULT_HOST, args.port), verbose=args.verbose)
+        info = server.state.index.stats()
+        print(f"✓ Loaded {info['documents']} emails, {len(server.state.categories)} categories, "
+              f"{len(server.state.issues)} issues in {server.state.load_seconds:.2f}s")
+        print(f"✓ Serving on http://{DEFAULT_HOST}:{args.port} (Ctrl+C to stop)")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            print("\nStopped")
+        finally:
+            server.server_close()
+        return
+
+    client = QueryClient(port=args.port)
+    try:
+        if args.command == 'count':
+            result = client.count(*args.args, fuzzy=args.fuzzy)
+        elif args.command == 'phrase':
+            result = client.phrase(' '.join(args.args), args.limit, args.fuzzy)
+        elif args.command == 'search':
+            result = client.search(' '.join(args.args), args.limit, args.fuzzy)
+        elif args.command == 'category':
+            result = client.category(args.args[0] if args.args else None)
+        elif args.command == 'issue':
+            result = client.issue(args.args[0] if args.args else None)
+        elif args.command == 'stats':
+            result = client.stats()
+        else:
+            result = client.reload()
+    except OSError as e:
+        print(f"❌ Could not reach the query server on port {args.port}: {e}")
+        print("   Start it with: python query_server.py serve")
+        sys.exit(1)
+
+    print(json.dumps(result, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
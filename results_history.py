@@ -0,0 +1,310 @@
+#!/usr/bin/env python3
+"""
+Results History
+Keeps every report run's aggregates (total emails, per-category counts,
+per-issue matches) in an append-only time series keyed by period, so reports
+can compare against any earlier week or month, or a rolling baseline,
+without re-analyzing old downloads.
+
+Layout:
+    data/results_history.jsonl    one JSON record per run; a later record for
+                                  the same period replaces the earlier one
+
+Usage:
+    python results_history.py                          # list recorded periods
+    python results_history.py import previous_week_data.json week
+"""
+
+import os
+import sys
+import json
+from datetime import datetime
+
+DEFAULT_HISTORY_FILE = "data/results_history.jsonl"
+
+# Metrics that can be looked up with ResultsHistory.value()
+METRICS = ('total_emails', 'category_mentions', 'category_emails', 'issue_matches', 'issue_avg_severity')
+
+SPARK_CHARS = '▁▂▃▄▅▆▇█'
+
+
+def period_key(period_type, date=None):
+    """
+    Period label for a date
+
+    Args:
+        period_type: 'week' (ISO week, e.g. '2026-W42') or 'month' (e.g. '2026-10')
+        date: datetime/date (default: now)
+    """
+    date = date or datetime.now()
+    if period_type == 'month':
+        return date.strftime('%Y-%m')
+    year, week, _ = date.isocalendar()
+    return f"{year}-W{week:02d}"
+
+
+def sparkline(values):
+    """
+    One-line chart of a series, e.g. '▁▃▅█' (missing values shown as '·')
+    """
+    known = [v for v in values if v is not None]
+    if not known:
+        return ''
+    low, high = min(known), max(known)
+    span = (high - low) or 1
+    return ''.join('·' if v is None else SPARK_CHARS[int((v - low) / span * (len(SPARK_CHARS) - 1))]
+                   for v in values)
+
+
+def build_record(period_type, period, general_results, issue_results=None, source=None):
+    """
+    History record for one report run
+
+    Args:
+        period_type: 'week' or 'month'
+        period: Period label (see period_key)
+        general_results: EmailAnalyzer results
+        issue_results: WeeklyReportGenerator.issue_results (optional)
+        source: Mbox path or store selection the results came from
+    """
+    record = {
+        'period_type': period_type,
+        'period': period,
+        'recorded_at': datetime.now().strftime('%Y-%m-%dT%H:%M:%S'),
+        'source': source,
+        'total_emails': general_results['total_emails'],
+        'categories': {},
+        'issues': {}
+    }
+
+    for category, info in general_results['categories'].items():
+        record['categories'][category] = {
+            'total_mentions': info['total_mentions'],
+            'emails_with_category': info['emails_with_category']
+        }
+
+    for issue_id, info in (issue_results or {}).items():
+        record['issues'][issue_id] = {
+            'name': info.get('name', issue_id),
+            'severity': info.get('severity', 'UNKNOWN'),
+            'matched_count': info.get('matched_count', 0),
+            'percentage': info.get('percentage', 0),
+            'avg_severity': info.get('avg_severity', 0),
+            'high_severity_count': info.get('high_severity_count', 0),
+            'critical_severity_count': info.get('critical_severity_count', 0),
+            'original_matches': info.get('original_matches', info.get('matched_count', 0)),
+            'severity_distribution': info.get('severity_distribution', {}),
+            'affected_products': info.get('affected_products', {}),
+            'alert_threshold': info.get('alert_threshold'),
+            'escalation_threshold': info.get('escalation_threshold')
+        }
+
+    return record
+
+
+class ResultsHistory:
+    def __init__(self, filepath=DEFAULT_HISTORY_FILE):
+        """
+        Open (or create) the results history
+
+        Args:
+            filepath: JSONL history file (default: data/results_history.jsonl)
+        """
+        self.filepath = filepath
+        self.records = {}    # (period_type, period) -> latest record
+        self._load()
+
+    def _load(self):
+        """Load the history file, keeping the latest record for each period"""
+        if not os.path.exists(self.filepath):
+            return
+
+        with open(self.filepath, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # A torn final line from an interrupted run - skip it
+                    continue
+                self.records[(record['period_type'], record['period'])] = record
+
+    def append(self, record):
+        """Add a run's record (replaces any earlier record for the same period)"""
+        folder = os.path.dirname(self.filepath)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        with open(self.filepath, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(record) + "\n")
+        self.records[(record['period_type'], record['period'])] = record
+
+    def periods(self, period_type):
+        """All records of a period type, oldest first"""
+        return [record for (kind, _), record in sorted(self.records.items()) if kind == period_type]
+
+    def get(self, period_type, period):
+        """The record for one period, or None"""
+        return self.records.get((period_type, period))
+
+    def previous(self, period_type, before, count=1):
+        """
+        The most recent records strictly before a period
+
+        Args:
+            period_type: 'week' or 'month'
+            before: Period label to look before
+            count: How many periods to return
+
+        Returns:
+            List of up to `count` records, newest first
+        """
+        earlier = [record for record in self.periods(period_type) if record['period'] < before]
+        return earlier[::-1][:count]
+
+    def baseline(self, period_type, before, count=4):
+        """
+        Rolling average of the `count` periods before a period
+
+        Returns:
+            Record-shaped dict of averages (plus 'periods': number averaged),
+            or None if there is no earlier data
+        """
+        records = self.previous(period_type, before, count)
+        if not records:
+            return None
+
+        n = len(records)
+        result = {
+            'period_type': period_type,
+            'period': f"avg of {n} {period_type}{'s' if n != 1 else ''} before {before}",
+            'periods': n,
+            'total_emails': sum(r['total_emails'] for r in records) / n,
+            'categories': {},
+            'issues': {}
+        }
+
+        for section, fields in (('categories', ('total_mentions', 'emails_with_category')),
+                                ('issues', ('matched_count', 'avg_severity'))):
+            names = {name for r in records for name in r.get(section, {})}
+            for name in names:
+                result[section][name] = {
+                    field: sum(r.get(section, {}).get(name, {}).get(field, 0) for r in records) / n
+                    for field in fields
+                }
+
+        return result
+
+    @staticmethod
+    def value(record, metric, name=None):
+        """
+        One number from a record
+
+        Args:
+            record: History record (or baseline)
+            metric: 'total_emails', 'category_mentions', 'category_emails',
+                    'issue_matches' or 'issue_avg_severity'
+            name: Category name or issue ID for the per-category/issue metrics
+
+        Returns:
+            The value, or None if the record does not have it
+        """
+        if record is None:
+            return None
+        if metric == 'total_emails':
+            return record.get('total_emails')
+        if metric in ('category_mentions', 'category_emails'):
+            field = 'total_mentions' if metric == 'category_mentions' else 'emails_with_category'
+            return record.get('categories', {}).get(name, {}).get(field)
+        if metric == 'issue_matches':
+            return record.get('issues', {}).get(name, {}).get('matched_count')
+        if metric == 'issue_avg_severity':
+            return record.get('issues', {}).get(name, {}).get('avg_severity')
+        raise ValueError(f"Unknown metric: {metric} (expected one of {', '.join(METRICS)})")
+
+    def series(self, period_type, metric, name=None, until=None, count=None):
+        """
+        A metric over time
+
+        Args:
+            period_type: 'week' or 'month'
+            metric: See value()
+            name: Category name or issue ID
+            until: Last period to include (default: all)
+            count: Keep only the last N periods
+
+        Returns:
+            List of (period, value) pairs, oldest first (value None if not recorded)
+        """
+        records = [r for r in self.periods(period_type) if until is None or r['period'] <= until]
+        if count:
+            records = records[-count:]
+        return [(r['period'], self.value(r, metric, name)) for r in records]
+
+    def import_snapshot(self, filepath, period_type='week'):
+        """
+        Add a legacy previous_week_data.json / previous_month_data.json snapshot
+
+        Returns:
+            The imported record, or None if that period is already recorded
+        """
+        with open(filepath, 'r') as f:
+            data = json.load(f)
+
+        date = datetime.strptime(data['date'], '%Y-%m-%d')
+        period = period_key(period_type, date)
+        if self.get(period_type, period):
+            return None
+
+        record = {
+            'period_type': period_type,
+            'period': period,
+            'recorded_at': date.strftime('%Y-%m-%dT%H:%M:%S'),
+            'source': filepath,
+            'total_emails': data.get('total_emails', 0),
+            'categories': data.get('categories', {}),
+            'issues': {}
+        }
+        self.append(record)
+        return record
+
+
+def main():
+    """List recorded periods, or import a legacy snapshot"""
+    history = ResultsHistory()
+
+    if len(sys.argv) >= 3 and sys.argv[1] == 'import':
+        period_type = sys.argv[3] if len(sys.argv) > 3 else 'week'
+        record = history.import_snapshot(sys.argv[2], period_type)
+        if record:
+            print(f"✓ Imported {sys.argv[2]} as {period_type} {record['period']}")
+        else:
+            print(f"⚠ That {period_type} is already recorded - nothing imported")
+        return
+    elif len(sys.argv) > 1:
+        print(__doc__)
+        return
+
+    print("="*70)
+    print("RESULTS HISTORY")
+    print("="*70)
+    print(f"  Location: {history.filepath}")
+    for period_type in ('week', 'month'):
+        records = history.periods(period_type)
+        if not records:
+            continue
+        print(f"\n  {period_type.title()}s recorded: {len(records)}")
+        for record in records[-12:]:
+            print(f"    {record['period']}: {record['total_emails']} emails, "
+                  f"{len(record.get('issues', {}))} issues tracked")
+
+        issue_ids = sorted({issue_id for record in records for issue_id in record.get('issues', {})})
+        for issue_id in issue_ids:
+            values = [value for _, value in history.series(period_type, 'issue_matches', issue_id, count=12)]
+            print(f"    {issue_id}: {sparkline(values)}  (latest {values[-1] if values[-1] is not None else '-'})")
+    print("="*70)
+
+
+if __name__ == "__main__":
+    main()
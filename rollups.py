@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+"""
+Daily Rollups
+Stores analysis results for each day of the message store as a small,
+mergeable JSON file, so weekly, monthly, quarterly or any-range reports are
+assembled by merging days instead of re-analyzing every email.
+
+Each rollup holds the day's email count, category mention/email/keyword
+counts, and for every tracked issue the conversations that matched (message
+and thread IDs, severity). Merging sums the counts and re-runs the
+per-conversation dedup across days, so the result matches a fresh analysis
+of the whole range.
+
+Layout:
+    data/rollups/2026-10-12.json
+
+A rollup is recomputed when the keywords or issue configs change (config
+hash), when the store gained emails for that day, or for today (not over yet).
+Days whose emails were moved out of the store to the archive keep their
+saved rollup as is.
+
+Usage:
+    python rollups.py build 30                         # roll up the last 30 days
+    python rollups.py report 2026-07-01 2026-09-30     # totals for any range
+"""
+
+import os
+import sys
+import io
+import json
+import hashlib
+import contextlib
+from datetime import datetime, date, timedelta
+from email_analyzer_mbox import EmailAnalyzer
+from enhanced_issue_tracker import IssueTracker, severity_distribution, affected_products
+
+DEFAULT_ROLLUP_DIR = "data/rollups"
+
+# Bump when the rollup file format changes (forces a recompute)
+ROLLUP_VERSION = 2
+
+
+def config_hash(analyzer, trackers):
+    """Hash of the keyword categories and issue configs a rollup was computed with"""
+    config = {
+        'version': ROLLUP_VERSION,
+        'keywords': analyzer.keyword_categories,
+        'issues': {tracker.issue_config.get('issue_id', 'Unknown'): tracker.issue_config for tracker in trackers}
+    }
+    return hashlib.sha256(json.dumps(config, sort_keys=True).encode('utf-8')).hexdigest()[:16]
+
+
+def _day_bounds(day):
+    """Local midnight-to-midnight datetimes for a date"""
+    start = datetime.combine(day, datetime.min.time())
+    return start, start + timedelta(days=1)
+
+
+class RollupManager:
+    def __init__(self, store, keywords_file='keywords.json', issue_configs=None, rollup_dir=DEFAULT_ROLLUP_DIR):
+        """
+        Set up daily rollups over a message store
+
+        Args:
+            store: MessageStore the emails are read from
+            keywords_file: Path to keywords JSON (defaults are used if missing)
+            issue_configs: Issue config files to track
+            rollup_dir: Where rollup files are kept (default: data/rollups)
+        """
+        self.store = store
+        self.rollup_dir = rollup_dir
+        self.analyzer = EmailAnalyzer(keywords_file if keywords_file and os.path.exists(keywords_file) else None)
+        self.trackers = [IssueTracker(cfg) for cfg in (issue_configs or []) if os.path.exists(cfg)]
+        self._metadata_reader = IssueTracker()
+        self.config_hash = config_hash(self.analyzer, self.trackers)
+        os.makedirs(rollup_dir, exist_ok=True)
+
+    def _rollup_path(self, day):
+        return os.path.join(self.rollup_dir, f"{day.isoformat()}.json")
+
+    def load(self, day):
+        """The saved rollup for a day, or None if missing or out of date"""
+        path = self._rollup_path(day)
+        if not os.path.exists(path):
+            return None
+
+        try:
+            with open(path, 'r') as f:
+                rollup = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        if self.store.compacted_before and day.isoformat() < self.store.compacted_before:
+            # The day's emails were moved to the archive - this rollup is all that is left
+            return rollup
+        if rollup.get('config_hash') != self.config_hash:
+            return None
+        if rollup.get('store_count') != len(self.store.select(*_day_bounds(day))):
+            return None
+        return rollup
+
+    def compute(self, day):
+        """Analyze one day of stored emails into a rollup"""
+        entries = self.store.select(*_day_bounds(day))
+
+        analyzer = self.analyzer
+        analyzer.start_analysis()
+        emails = []
+        metadata = []
+
+        for entry in entries:
+            try:
+                message = self.store.get_message(entry)
+                email_text = analyzer._extract_email_content(message)
+            except Exception:
+                continue
+            if not email_text:
+                continue
+
+            analyzer.add_email(email_text)
+            emails.append(email_text)
+            metadata.append(self._metadata_reader._extract_metadata(message, len(metadata)))
+
+        rollup = {
+            'date': day.isoformat(),
+            'config_hash': self.config_hash,
+            'store_count': len(entries),
+            'total_emails': analyzer.results['total_emails'],
+            'categories': analyzer.results['categories'],
+            'issues': {}
+        }
+
+        for tracker in self.trackers:
+            issue_id = tracker.issue_config.get('issue_id', 'Unknown')
+            matches = []
+            original_count = 0
+            if emails:
+                # analyze_for_issue prints a summary per call - too noisy for one call per day
+                with contextlib.redirect_stdout(io.StringIO()):
+                    results = tracker.analyze_for_issue(emails, metadata, show_progress=False)
+                matches = [{'metadata': match['metadata'], 'severity_score': match['severity_score'],
+                            'mentioned_products': match['mentioned_products']}
+                           for match in results['matched_emails']]
+                original_count = results['original_matches']
+            rollup['issues'][issue_id] = {'matches': matches, 'original_matches': original_count}
+
+        return rollup
+
+    def save(self, rollup):
+        """Write a rollup file atomically"""
+        path = self._rollup_path(date.fromisoformat(rollup['date']))
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(rollup, f)
+        os.replace(tmp_path, path)
+
+    def get(self, day, today=None):
+        """
+        The rollup for a day, computing (and saving) it if needed
+
+        Returns:
+            (rollup, computed) - computed is True if the day was analyzed now
+        """
+        today = today or date.today()
+        rollup = self.load(day) if day < today else None
+        if rollup is not None:
+            return rollup, False
+
+        rollup = self.compute(day)
+        if day < today:
+            # Today is still receiving mail, so it is never saved
+            self.save(rollup)
+        return rollup, True
+
+    def build(self, start_day, end_day, show_progress=True):
+        """
+        Rollups for every day from start_day to end_day (inclusive)
+
+        Returns:
+            List of rollups, oldest first
+        """
+        rollups = []
+        computed = 0
+        today = date.today()
+
+        day = start_day
+        while day <= end_day:
+            rollup, fresh = self.get(day, today)
+            rollups.append(rollup)
+            computed += fresh
+            day += timedelta(days=1)
+
+        if show_progress:
+            print(f"✓ {len(rollups)} days: {len(rollups) - computed} from rollups, {computed} analyzed fresh")
+        return rollups
+
+    def merge(self, rollups):
+        """
+        Combine daily rollups into report results
+
+        Returns:
+            (general_results, issue_results) in the shapes WeeklyReportGenerator
+            uses for general_results and issue_results
+        """
+        # Deep copy so later compute() calls don't reset the merged results
+        general = json.loads(json.dumps(self.analyzer.start_analysis()))
+
+        for rollup in rollups:
+            general['total_emails'] += rollup['total_emails']
+            for category, info in rollup['categories'].items():
+                merged = general['categories'].setdefault(
+                    category, {'total_mentions': 0, 'emails_with_category': 0, 'keywords': {}})
+                merged['total_mentions'] += info['total_mentions']
+                merged['emails_with_category'] += info['emails_with_category']
+                for keyword, count in info['keywords'].items():
+                    merged['keywords'][keyword] = merged['keywords'].get(keyword, 0) + count
+
+        total = general['total_emails']
+        issues = {}
+        for tracker in self.trackers:
+            config = tracker.issue_config
+            issue_id = config.get('issue_id', 'Unknown')
+
+            matches = [match for rollup in rollups
+                       for match in rollup['issues'].get(issue_id, {}).get('matches', [])]
+            original_count = sum(rollup['issues'].get(issue_id, {}).get('original_matches', 0) for rollup in rollups)
+            # A conversation can span days - keep its highest severity email once
+            matches = tracker.deduplicate_keep_highest_severity(matches)
+            scores = [match['severity_score'] for match in matches]
+
+            issues[issue_id] = {
+                'name': config.get('issue_name', 'Unknown Issue'),
+                'matched_count': len(matches),
+                'percentage': (len(matches) / total * 100) if total else 0,
+                'severity': config.get('severity', 'UNKNOWN'),
+                'avg_severity': sum(scores) / len(scores) if scores else 0,
+                'high_severity_count': len([s for s in scores if s >= 10]),
+                'critical_severity_count': len([s for s in scores if s >= 15]),
+                'original_matches': original_count,
+                'severity_distribution': severity_distribution(scores),
+                'affected_products': affected_products(matches),
+                'alert_threshold': config.get('tracking_metrics', {}).get('alert_threshold', 5),
+                'escalation_threshold': config.get('tracking_metrics', {}).get('escalation_threshold', 10)
+            }
+
+        return general, issues
+
+    def results(self, start_day, end_day, show_progress=True):
+        """Merged report results for a date range (inclusive)"""
+        return self.merge(self.build(start_day, end_day, show_progress))
+
+
+def main():
+    """Build rollups or print totals for a date range"""
+    if len(sys.argv) < 3 or sys.argv[1] not in ('build', 'report'):
+        print(__doc__)
+        return
+
+    from message_store import MessageStore
+
+    issue_configs = [f for f in os.listdir('.') if f.endswith('_issue.json') or f.endswith('_issues.json')]
+    manager = RollupManager(MessageStore(), 'keywords.json', issue_configs)
+
+    if sys.argv[1] == 'build':
+        days_back = int(sys.argv[2])
+        start_day = date.today() - timedelta(days=days_back)
+        end_day = date.today()
+    else:
+        start_day = date.fromisoformat(sys.argv[2])
+        end_day = date.fromisoformat(sys.argv[3]) if len(sys.argv) > 3 else date.today()
+
+    general, issues = manager.results(start_day, end_day)
+
+    print("\n" + "="*70)
+    print(f"ROLLUP TOTALS: {start_day} - {end_day}")
+    print("="*70)
+    print(f"  Total emails: {general['total_emails']}")
+    for category, info in sorted(general['categories'].items(), key=lambda x: x[1]['total_mentions'], reverse=True):
+        print(f"  {category}: {info['total_mentions']} mentions in {info['emails_with_category']} emails")
+    for issue_id, info in issues.items():
+        print(f"  {issue_id}: {info['matched_count']} conversations (avg severity {info['avg_severity']:.1f})")
+    print("="*70)
+
+
+if __name__ == "__main__":
+    main()
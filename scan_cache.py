@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+"""
+Scan Result Cache
+Remembers per-file needle counts from folder_scanner.py so re-running a scan
+only reads files (or stored emails) that are new or changed since the last
+run; the rest are served from the cache.
+
+Entries are keyed by the scanned source - a folder, or the message store -
+and the needle set (lowercased and sorted, plus SCAN_VERSION). Within a
+folder entry each file is keyed by its path, size and mtime, so a file is
+rescanned whenever it is rewritten. Within a store entry each email is keyed
+by its sha: stored emails never change, so only emails added since the last
+scan are read. Files or emails no longer present are dropped. Changing the
+needles selects a different entry - results for another needle set are never
+reused - and 'invalidate' drops an entry explicitly.
+
+Files modified in the last RACY_SECONDS are rescanned next time too, since a
+same-size rewrite within the filesystem's mtime resolution would otherwise
+go unnoticed.
+
+Entries are evicted least recently used first, beyond max_sets. An entry's
+mtime is its last use: save() rewrites it and load() touches it, so an entry
+served fully from the cache (nothing new to scan, nothing saved) stays fresh.
+
+Layout:
+    data/cache/scan/<key>.json    source, needles, and
+                                  path -> [size, mtime_ns, hits] (folders) or sha -> hits (store)
+
+Usage:
+    python scan_cache.py list
+    python scan_cache.py invalidate "did not receive" cmp        # the store if it exists, else data/raw
+    python scan_cache.py invalidate "did not receive" cmp --folder data/raw
+    python scan_cache.py clear
+"""
+
+import os
+import sys
+import json
+import time
+import hashlib
+from datetime import datetime
+
+DEFAULT_SCAN_CACHE_DIR = "data/cache/scan"
+DEFAULT_FOLDER = "data/raw"
+DEFAULT_STORE_DIR = "data/store"
+DEFAULT_MAX_SETS = 50
+
+# Bump when matching changes in a way that changes counts
+SCAN_VERSION = 1
+
+RACY_SECONDS = 2
+
+
+def store_source(store_dir):
+    """Cache source name for a message store (folders use their path)"""
+    return 'store:' + os.path.abspath(store_dir)
+
+
+def _source_name(source):
+    return source if source.startswith('store:') else os.path.abspath(source)
+
+
+class ScanCache:
+    def __init__(self, cache_dir=DEFAULT_SCAN_CACHE_DIR, max_sets=DEFAULT_MAX_SETS):
+        """
+        Open (or create) the scan cache
+
+        Args:
+            cache_dir: Cache directory (default: data/cache/scan)
+            max_sets: Folder/needle-set entries kept before evicting the least recently used
+        """
+        self.cache_dir = cache_dir
+        self.max_sets = max_sets
+        os.makedirs(cache_dir, exist_ok=True)
+
+    @staticmethod
+    def make_key(source, needles):
+        """
+        Cache key for one source and needle set
+
+        Args:
+            source: Scanned folder, or store_source(store_dir)
+            needles: Needles (case and order do not matter)
+
+        Returns:
+            Hex key
+        """
+        parts = [str(SCAN_VERSION), _source_name(source)]
+        parts.extend(sorted(set(needle.lower() for needle in needles)))
+        return hashlib.sha256("\n".join(parts).encode('utf-8')).hexdigest()[:32]
+
+    def _entry_path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def load(self, source, needles):
+        """
+        Cached per-file results for a source and needle set
+
+        Returns:
+            Dictionary of path (relative to the folder) -> [size, mtime_ns, {needle: hits}],
+            or of store sha -> {needle: hits}
+        """
+        path = self._entry_path(self.make_key(source, needles))
+        if not os.path.exists(path):
+            return {}
+        try:
+            with open(path, 'r') as f:
+                files = json.load(f).get('files', {})
+            # Mark the entry used - eviction and 'list' go by mtime
+            os.utime(path)
+            return files
+        except (OSError, ValueError):
+            return {}
+
+    @staticmethod
+    def lookup(files, relpath, stat):
+        """
+        Cached hits for a file if it is unchanged
+
+        Args:
+            files: Result of load()
+            relpath: Path relative to the scanned folder
+            stat: os.stat() of the file now
+
+        Returns:
+            Dictionary of needle -> hits, or None if the file must be scanned
+        """
+        entry = files.get(relpath)
+        if entry and entry[0] == stat.st_size and entry[1] == stat.st_mtime_ns:
+            return entry[2]
+        return None
+
+    def save(self, source, needles, files):
+        """
+        Store per-file results, replacing the previous entry for this source and needle set
+
+        Args:
+            source: Scanned folder, or store_source(store_dir)
+            needles: Needles scanned for
+            files: Dictionary of relative path -> [size, mtime_ns, {needle: hits}],
+                   or of store sha -> {needle: hits}
+        """
+        if not source.startswith('store:'):
+            # Leave recently modified files out so a same-size rewrite is still noticed
+            racy_after = (time.time() - RACY_SECONDS) * 1e9
+            files = {path: entry for path, entry in files.items() if entry[1] < racy_after}
+
+        entry = {
+            'version': SCAN_VERSION,
+            'source': _source_name(source),
+            'needles': sorted(set(needle.lower() for needle in needles)),
+            'files': files
+        }
+        path = self._entry_path(self.make_key(source, needles))
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(entry, f)
+        os.replace(tmp_path, path)
+        self._evict()
+
+    def _entry_files(self):
+        return [os.path.join(self.cache_dir, name) for name in os.listdir(self.cache_dir)
+                if name.endswith('.json')]
+
+    def _evict(self):
+        """Drop the least recently used entries beyond max_sets"""
+        paths = sorted(self._entry_files(), key=os.path.getmtime, reverse=True)
+        for path in paths[self.max_sets:]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def invalidate(self, source, needles):
+        """
+        Drop the cached results for one source and needle set
+
+        Returns:
+            True if there was an entry to drop
+        """
+        path = self._entry_path(self.make_key(source, needles))
+        if os.path.exists(path):
+            os.remove(path)
+            return True
+        return False
+
+    def clear(self):
+        """Delete every cached scan"""
+        paths = self._entry_files()
+        for path in paths:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        return len(paths)
+
+    def entries(self):
+        """Summary of each cached folder/needle set, most recently used first"""
+        summaries = []
+        for path in self._entry_files():
+            try:
+                with open(path, 'r') as f:
+                    entry = json.load(f)
+                last_used = datetime.fromtimestamp(os.path.getmtime(path))
+            except (OSError, ValueError):
+                continue
+            summaries.append({
+                'key': os.path.basename(path)[:-len('.json')],
+                'source': entry.get('source') or entry.get('folder'),
+                'needles': entry.get('needles', []),
+                'files': len(entry.get('files', {})),
+                'last_used': last_used.strftime('%Y-%m-%dT%H:%M:%S'),
+                'size': os.path.getsize(path)
+            })
+        return sorted(summaries, key=lambda summary: summary['last_used'], reverse=True)
+
+
+def main():
+    """Inspect, invalidate or clear the scan cache"""
+    if len(sys.argv) < 2 or sys.argv[1] not in ('list', 'invalidate', 'clear'):
+        print(__doc__)
+        return
+
+    cache = ScanCache()
+    command = sys.argv[1]
+
+    if command == 'clear':
+        count = cache.clear()
+        print(f"✓ Cleared {count} cached scans")
+        return
+
+    if command == 'invalidate':
+        args = sys.argv[2:]
+        # Same default as folder_scanner.py: the message store if it exists, else data/raw
+        if os.path.exists(os.path.join(DEFAULT_STORE_DIR, 'index.jsonl')):
+            source = store_source(DEFAULT_STORE_DIR)
+        else:
+            source = DEFAULT_FOLDER
+        if '--folder' in args:
+            position = args.index('--folder')
+            source = args[position + 1]
+            del args[position:position + 2]
+        if not args:
+            print("❌ Give the needles whose cached results should be dropped")
+            sys.exit(1)
+        if cache.invalidate(source, args):
+            print(f"✓ Invalidated cached scan of {source} for {len(args)} needles")
+        else:
+            print(f"⚠ No cached scan of {source} for those needles")
+        return
+
+    print("="*70)
+    print("SCAN CACHE")
+    print("="*70)
+    entries = cache.entries()
+    for entry in entries:
+        needles = ', '.join(entry['needles'])
+        if len(needles) > 50:
+            needles = needles[:47] + '...'
+        print(f"  {entry['key'][:12]}  {entry['files']:5} files  {entry['size'] / 1024:7.1f} KB  "
+              f"last used {entry['last_used'][:16]}  {entry['source']}")
+        print(f"                needles: {needles}")
+    print(f"\n  {len(entries)} cached scans")
+    print("="*70)
+
+
+if __name__ == "__main__":
+    main()
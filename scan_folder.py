@@ -1,30 +1,14 @@
-import os
+from folder_scanner import scan
 
 counts = {
-    "DNR": 0,
+    "DNR": "Can you please provide me with a link?",
 }
 
-folder = "data/raw"
+if __name__ == "__main__":
+    results = scan(list(counts.values()))
 
-total = 0
-
-for filename in os.listdir(folder):
-    path = folder + "/" + filename
-    file = open(path, "r")
-    content = file.read()
-    file.close()
-
-    text = content.lower()
-    total += 1
-
-    
-    if "Can you please provide me with a link?" in text:
-        counts["DNR"] += 1
-
-
-print("\nWeekly summary:")
-print("Total emails:", total)
-
-for category in counts:
-    print(category, counts[category])
+    print("\nWeekly summary:")
+    print("Total emails:", results['files'])
 
+    for category in counts:
+        print(category, results['needles'][counts[category]]['files'])
@@ -0,0 +1,681 @@
+#!/usr/bin/env python3
+"""
+Search Index
+Needle counts over the corpus database (corpus_db.py), so counting any number
+of needles is a lookup instead of reading every file again (scan_folder.py,
+sentence_search.py).
+
+There is one index: the SQLite FTS5 index in data/corpus.db. Needles are
+translated to FTS5 phrase and NEAR queries, word positions for /phrase-style
+results come from the same index (fts5vocab), and the vocabulary for fuzzy
+matching is the index's own term list - so this module, corpus_db.py and
+query_server.py tokenize identically and always agree on counts.
+
+Sources ('build' adds their new emails to the database):
+    data/store (default when it exists - where the weekly and monthly runs
+    keep downloads): only emails not in the database yet are read.
+
+    a folder (data/raw, or one given to 'build'): mbox files new or changed
+    since the last build are read (emails already in the database are
+    skipped); any other file (e.g. data/raw/email1.txt) is one document,
+    replaced when the file changes and dropped when it is deleted.
+
+Emails stay in the database after they leave the store (e.g. moved to the
+archive by archive_manager.py), so counts cover every email ever built.
+
+Needles:
+    onvif                        a single word
+    did not receive              an exact phrase (words in this order, adjacent)
+    firmware NEAR/5 freezing     both sides at most 5 words apart, either order
+                                 (each side may itself be a phrase)
+
+Words are split like FTS5's unicode61 tokenizer: lowercase, accents removed,
+apostrophes split words ("didn't" is the phrase "didn t").
+
+With --fuzzy, every word also matches its misspellings in the corpus
+vocabulary ("recieve" finds "receive", "simpletrack" finds "simpltrack"):
+near-misses are looked up in a trigram index of the vocabulary and checked
+by edit distance (1 for words of 4-7 letters, 2 for longer words).
+
+Usage:
+    python search_index.py build                       # add new emails from data/store (or data/raw)
+    python search_index.py build data/raw              # add a folder instead
+    python search_index.py count "did not receive" onvif "firmware NEAR/5 freezing"
+    python search_index.py search superjoy hdmi freezing      # top 10 by BM25
+    python search_index.py search '"did not receive" link' --limit 25
+    python search_index.py count --fuzzy "didn't recieve link"
+    python search_index.py fuzzy recieve simpletrack     # show a word's near-misses
+    python search_index.py stats
+"""
+
+import os
+import re
+import sys
+import bisect
+import itertools
+import threading
+import unicodedata
+import email.message
+from mbox_writer import open_mbox, IndexedMbox
+from message_store import MessageStore, DEFAULT_STORE_DIR
+from corpus_db import CorpusDB, DEFAULT_DB_FILE, store_key
+
+DEFAULT_FOLDER = "data/raw"
+
+# Words as FTS5's unicode61 tokenizer splits them (letters and digits)
+_TOKEN = re.compile(r"[^\W_]+")
+
+# "left NEAR/k right" proximity needles
+_NEAR = re.compile(r'^(.+?)\s+NEAR/(\d+)\s+(.+)$')
+
+# Quoted phrases in a search query must appear in every result
+_QUOTED = re.compile(r'"([^"]+)"')
+
+# Padding marks word starts and ends, so short words still have trigrams
+_TRIGRAM_PAD = '$'
+
+# Spelling combinations a fuzzy phrase expands to (closest spellings first)
+MAX_FUZZY_COMBINATIONS = 64
+
+# Indexed columns, in FTS5 column order
+_COLUMNS = ('subject', 'body')
+
+# Positions of different columns are kept this far apart, so phrases never span them
+_COLUMN_SPAN = 10 ** 7
+
+
+def tokenize(text):
+    """Lowercase word tokens of a text, split like the FTS5 unicode61 tokenizer"""
+    text = unicodedata.normalize('NFKD', text.lower())
+    return _TOKEN.findall(''.join(char for char in text if not unicodedata.combining(char)))
+
+
+def trigrams(term):
+    """Set of character trigrams of a word (padded at both ends)"""
+    padded = _TRIGRAM_PAD * 2 + term + _TRIGRAM_PAD
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def max_edit_distance(term):
+    """Typos tolerated for a word: none below 4 letters, 1 up to 7, then 2"""
+    if len(term) < 4:
+        return 0
+    return 1 if len(term) < 8 else 2
+
+
+def edit_distance(a, b, limit):
+    """
+    Edit distance with adjacent transpositions ("recieve" -> "receive" is 1)
+
+    Returns:
+        The distance, or limit + 1 as soon as it is known to exceed limit
+    """
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+
+    before = None
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = a[i - 1] != b[j - 1]
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], before[j - 2] + 1)
+        if min(current) > limit:
+            return limit + 1
+        before, previous = previous, current
+
+    return previous[-1] if previous[-1] <= limit else limit + 1
+
+
+def _is_mbox(path):
+    """mbox files start with a 'From ' separator line"""
+    if path.endswith('.mbox'):
+        return True
+    with open(path, 'rb') as f:
+        return f.read(5) == b'From '
+
+
+def _has_store(store_dir):
+    return os.path.exists(os.path.join(store_dir, 'index.jsonl'))
+
+
+def _phrase(terms):
+    """FTS5 phrase for a word sequence (tokens are letters and digits, so no escaping is needed)"""
+    return '"' + ' '.join(terms) + '"'
+
+
+def list_files(folder):
+    """Files in a folder (recursively), skipping mbox offset indexes and temp files"""
+    paths = []
+    for dirpath, _, filenames in os.walk(folder):
+        for filename in filenames:
+            if not filename.endswith(('.idx', '.tmp')):
+                paths.append(os.path.join(dirpath, filename))
+    return sorted(paths)
+
+
+class SearchIndex:
+    def __init__(self, db_file=DEFAULT_DB_FILE, folder=None, store_dir=None):
+        """
+        Open the corpus database for needle queries
+
+        Args:
+            db_file: Corpus database (default: data/corpus.db)
+            folder: Folder of downloads to build from instead of the message store
+            store_dir: Message store to build from
+
+        With neither, builds read data/store if it exists, else data/raw.
+        Queries always cover the whole database.
+        """
+        self.db_file = db_file
+        self.db = CorpusDB(db_file, shared=True)
+        self.folder = None       # folder source, or None when building from the store
+        self.store_dir = None    # message store source
+        if folder:
+            self.folder = folder
+        elif store_dir:
+            self.store_dir = store_dir
+        elif _has_store(DEFAULT_STORE_DIR):
+            self.store_dir = DEFAULT_STORE_DIR
+        else:
+            self.folder = DEFAULT_FOLDER
+
+        # One connection shared by the query server's threads
+        self._lock = threading.RLock()
+        self._store = None
+        self._vocabulary = None  # term -> number of emails, loaded on first fuzzy lookup
+        self._trigrams = None    # trigram -> vocabulary terms
+        self._by_length = None   # word length -> vocabulary terms
+
+    @property
+    def source(self):
+        """What builds read, for messages"""
+        return f"message store {self.store_dir}" if self.store_dir else self.folder
+
+    def close(self):
+        self.db.close()
+
+    def __len__(self):
+        with self._lock:
+            return len(self.db)
+
+    def _get_store(self):
+        if self._store is None:
+            self._store = MessageStore(self.store_dir)
+        return self._store
+
+    def stale_files(self):
+        """
+        What the next build would read
+
+        Returns:
+            (changed, deleted): store emails not in the database yet (by sha),
+            or new/changed files and deleted files of the folder
+        """
+        with self._lock:
+            if self.store_dir:
+                if not _has_store(self.store_dir):
+                    return [], []
+                existing = self.db.keys()
+                return [entry['sha'] for entry in self._get_store().entries
+                        if store_key(entry) not in existing], []
+
+            paths = list_files(self.folder) if os.path.isdir(self.folder) else []
+            current = {os.path.abspath(path) for path in paths}
+            folder = os.path.abspath(self.folder) + os.sep
+            changed = [path for path in paths if self.db.file_changed(path)]
+            deleted = [path for path in self.db.ingested_files()
+                       if path.startswith(folder) and path not in current]
+            return changed, deleted
+
+    def update(self, show_progress=True):
+        """
+        Add new store emails (or new and changed files) to the database
+
+        Returns:
+            Dictionary with 'files' read, 'documents' added and 'removed' files
+            (store emails count as files)
+        """
+        changed, deleted = self.stale_files()
+        documents = 0
+        with self._lock:
+            if self.store_dir:
+                if changed:
+                    documents = self.db.ingest_store(self._get_store(), show_progress=show_progress)
+            else:
+                for path in deleted:
+                    self.db.forget_file(path)
+                for path in changed:
+                    if _is_mbox(path):
+                        added = self.db.ingest_mbox(path, show_progress=False)
+                    else:
+                        added = self.db.ingest_text(path)
+                    documents += added
+                    if show_progress:
+                        print(f"  ✓ {path}: {added} new documents")
+
+        if changed or deleted:
+            self._vocabulary = self._trigrams = self._by_length = None
+        return {'files': len(changed), 'documents': documents, 'removed': len(deleted)}
+
+    def iter_messages(self):
+        """
+        Yield every email of the build source as an email.message.Message
+        (non-mbox files of a folder as a message whose body is the file)
+        """
+        if self.store_dir:
+            if _has_store(self.store_dir):
+                yield from self._get_store().iter_messages()
+            return
+
+        for path in list_files(self.folder) if os.path.isdir(self.folder) else []:
+            if not _is_mbox(path):
+                message = email.message.Message()
+                with open(path, 'r', encoding='utf-8', errors='ignore') as f:
+                    message.set_payload(f.read())
+                yield message
+                continue
+            mbox = open_mbox(path)
+            try:
+                if isinstance(mbox, IndexedMbox):
+                    yield from mbox
+                else:
+                    for key in mbox.keys():
+                        yield mbox[key]
+            finally:
+                mbox.close()
+
+    def _rowids(self, query):
+        """Doc IDs (emails.id) matching an FTS5 query"""
+        if query is None:
+            return []
+        with self._lock:
+            return [row[0] for row in self.db.conn.execute(
+                "SELECT rowid FROM emails_fts WHERE emails_fts MATCH ? ORDER BY rowid", (query,))]
+
+    def document(self, doc_id):
+        """Subject, sender, date (UTC) and source of one email"""
+        with self._lock:
+            row = self.db.conn.execute("SELECT subject, sender, date, source FROM emails WHERE id = ?",
+                                       (doc_id,)).fetchone()
+        if row is None:
+            return None
+        subject, sender, date, source = row
+        return {'subject': subject, 'sender': sender, 'date': (date or '')[:16].replace('T', ' '),
+                'source': source}
+
+    def doc_ids(self, term):
+        """Documents containing a word"""
+        return self._rowids(_phrase([term]))
+
+    def _load_vocabulary(self):
+        """Index the vocabulary by trigram and by length"""
+        with self._lock:
+            vocabulary = dict(self.db.conn.execute("SELECT term, doc FROM emails_vocab"))
+        by_gram = {}
+        by_length = {}
+        for term in vocabulary:
+            for gram in trigrams(term):
+                by_gram.setdefault(gram, []).append(term)
+            by_length.setdefault(len(term), []).append(term)
+        # Publish complete tables only, so concurrent readers never see a partial one
+        self._by_length = by_length
+        self._trigrams = by_gram
+        self._vocabulary = vocabulary
+
+    def expand_term(self, term, max_distance=None):
+        """
+        A word and its near-misses in the corpus vocabulary
+
+        Candidates must share enough trigrams with the word (an edit changes
+        at most 4 of them) before the edit distance is computed, so only a
+        handful of words are compared.
+
+        Args:
+            term: Lowercase word
+            max_distance: Edits allowed (default: max_edit_distance(term))
+
+        Returns:
+            Dictionary of vocabulary word -> edit distance, closest first
+        """
+        if max_distance is None:
+            max_distance = max_edit_distance(term)
+        if self._vocabulary is None:
+            self._load_vocabulary()
+        if max_distance == 0:
+            return {term: 0} if term in self._vocabulary else {}
+
+        grams = trigrams(term)
+        needed = len(grams) - 4 * max_distance
+        if needed > 0:
+            shared = {}
+            for gram in grams:
+                for candidate in self._trigrams.get(gram, []):
+                    shared[candidate] = shared.get(candidate, 0) + 1
+            candidates = [candidate for candidate, count in shared.items() if count >= needed]
+        else:
+            # Too short for the trigram filter - compare words of similar length
+            candidates = [candidate for length in range(len(term) - max_distance, len(term) + max_distance + 1)
+                          for candidate in self._by_length.get(length, [])]
+
+        matches = {}
+        for candidate in candidates:
+            distance = edit_distance(term, candidate, max_distance)
+            if distance <= max_distance:
+                matches[candidate] = distance
+        return dict(sorted(matches.items(), key=lambda item: (item[1], item[0])))
+
+    def _slots(self, terms, fuzzy=False):
+        """Each phrase word as a list of alternative vocabulary words"""
+        if fuzzy:
+            return [list(self.expand_term(term)) for term in terms]
+        return [[term] for term in terms]
+
+    def _phrases(self, terms, fuzzy=False):
+        """FTS5 phrases for a word sequence - one per spelling combination with fuzzy"""
+        slots = self._slots(terms, fuzzy)
+        if not slots or not all(slots):
+            return []
+        return [_phrase(combination) for combination in
+                itertools.islice(itertools.product(*slots), MAX_FUZZY_COMBINATIONS)]
+
+    def fts_query(self, needle, fuzzy=False):
+        """
+        FTS5 query for a word, phrase or NEAR/k needle
+
+        Returns:
+            Query string, or None if the needle cannot match
+        """
+        near = _NEAR.match(needle.strip())
+        if near:
+            left = self._phrases(tokenize(near.group(1)), fuzzy)
+            right = self._phrases(tokenize(near.group(3)), fuzzy)
+            pairs = itertools.islice(itertools.product(left, right), MAX_FUZZY_COMBINATIONS)
+            query = ' OR '.join(f"NEAR({a} {b}, {int(near.group(2))})" for a, b in pairs)
+        else:
+            query = ' OR '.join(self._phrases(tokenize(needle), fuzzy))
+        return query or None
+
+    def match(self, needle, fuzzy=False):
+        """
+        Documents matching a word, phrase or NEAR/k needle
+
+        Returns:
+            Sorted list of doc IDs
+        """
+        return self._rowids(self.fts_query(needle, fuzzy))
+
+    def count(self, needles, fuzzy=False):
+        """
+        Per-needle document counts
+
+        Args:
+            needles: List of words or phrases
+            fuzzy: Let each word match its near-misses too
+
+        Returns:
+            Dictionary of needle -> number of documents
+        """
+        counts = {}
+        for needle in needles:
+            query = self.fts_query(needle, fuzzy)
+            if query is None:
+                counts[needle] = 0
+                continue
+            with self._lock:
+                counts[needle] = self.db.conn.execute(
+                    "SELECT COUNT(*) FROM emails_fts WHERE emails_fts MATCH ?", (query,)).fetchone()[0]
+        return counts
+
+    def _postings(self, term, docs):
+        """Doc ID -> positions of a word, for the given documents only"""
+        with self._lock:
+            rows = self.db.conn.execute("SELECT doc, col, offset FROM emails_positions WHERE term = ?",
+                                        (term,)).fetchall()
+        postings = {}
+        for doc_id, column, offset in rows:
+            if doc_id in docs:
+                postings.setdefault(doc_id, []).append(_COLUMNS.index(column) * _COLUMN_SPAN + offset)
+        return postings
+
+    def phrase_positions(self, terms, docs, fuzzy=False):
+        """
+        Where a phrase occurs in some documents
+
+        Args:
+            terms: Tokens of the phrase, in order
+            docs: Set of doc IDs to look in (e.g. the phrase's match())
+            fuzzy: Let each word match its near-misses too
+
+        Returns:
+            Dictionary of doc ID -> start positions of the phrase
+        """
+        slots = []
+        for alternatives in self._slots(terms, fuzzy):
+            merged = {}
+            for term in alternatives:
+                for doc_id, positions in self._postings(term, docs).items():
+                    merged.setdefault(doc_id, []).extend(positions)
+            slots.append(merged)
+        if not slots:
+            return {}
+
+        matches = {}
+        for doc_id in docs:
+            starts = None
+            for i, slot in enumerate(slots):
+                shifted = {position - i for position in slot.get(doc_id, [])}
+                starts = shifted if starts is None else starts & shifted
+                if not starts:
+                    break
+            if starts:
+                matches[doc_id] = sorted(starts)
+        return matches
+
+    def near_positions(self, left, right, distance, docs, fuzzy=False):
+        """
+        Where two phrases occur at most `distance` words apart (either order)
+
+        Returns:
+            Dictionary of doc ID -> start positions of the left phrase
+        """
+        left_matches = self.phrase_positions(left, docs, fuzzy)
+        if not left_matches:
+            return {}
+        right_matches = self.phrase_positions(right, set(left_matches), fuzzy)
+
+        matches = {}
+        for doc_id in left_matches.keys() & right_matches.keys():
+            right_starts = right_matches[doc_id]
+            starts = []
+            for start in left_matches[doc_id]:
+                # Only the nearest right occurrence on each side can be close enough
+                i = bisect.bisect_left(right_starts, start)
+                after = right_starts[i] - (start + len(left)) if i < len(right_starts) else distance + 1
+                before = start - (right_starts[i - 1] + len(right)) if i > 0 else distance + 1
+                # gap = words between the end of one phrase and the start of the other
+                if min(after, before) <= distance:
+                    starts.append(start)
+            if starts:
+                matches[doc_id] = starts
+        return matches
+
+    def positions(self, needle, fuzzy=False):
+        """
+        Doc ID -> match positions for a word, phrase or NEAR/k needle
+
+        Returns:
+            Dictionary of doc ID -> list of [column, word offset] pairs
+        """
+        docs = set(self.match(needle, fuzzy))
+        if not docs:
+            return {}
+        near = _NEAR.match(needle.strip())
+        if near:
+            matches = self.near_positions(tokenize(near.group(1)), tokenize(near.group(3)),
+                                          int(near.group(2)), docs, fuzzy)
+        else:
+            matches = self.phrase_positions(tokenize(needle), docs, fuzzy)
+        return {doc_id: [[_COLUMNS[position // _COLUMN_SPAN], position % _COLUMN_SPAN]
+                         for position in starts]
+                for doc_id, starts in matches.items()}
+
+    def search(self, query, limit=10, fuzzy=False):
+        """
+        Top documents for a query, ranked by FTS5's BM25 (k1 = 1.2, b = 0.75)
+
+        Every word of the query adds to the score; quoted phrases must also
+        appear in each result. With fuzzy, near-miss spellings of each word
+        count like the word itself.
+
+        Args:
+            query: Words and "quoted phrases"
+            limit: Number of results
+            fuzzy: Let each word match its near-misses too
+
+        Returns:
+            List of dictionaries (doc_id, score, matched term counts and the
+            document's subject, sender, date and source), best first
+        """
+        words = []
+        for term in tokenize(query):
+            for variant in (self.expand_term(term) if fuzzy else [term]):
+                if variant not in words:
+                    words.append(variant)
+        if not words:
+            return []
+
+        required = []
+        for phrase in _QUOTED.findall(query):
+            phrases = self._phrases(tokenize(phrase), fuzzy)
+            if not phrases:
+                return []
+            required.append('(' + ' OR '.join(phrases) + ')')
+        any_word = ' OR '.join(_phrase([word]) for word in words)
+        fts_query = ' AND '.join(required + [f"({any_word})"])
+
+        with self._lock:
+            rows = self.db.conn.execute(
+                "SELECT rowid, bm25(emails_fts) FROM emails_fts WHERE emails_fts MATCH ? "
+                "ORDER BY bm25(emails_fts) LIMIT ?", (fts_query, limit)).fetchall()
+
+        docs = {doc_id for doc_id, _ in rows}
+        matched = {doc_id: {} for doc_id in docs}
+        for word in words:
+            for doc_id, positions in self._postings(word, docs).items():
+                matched[doc_id][word] = len(positions)
+
+        # bm25() is lower-is-better; report it as a positive score
+        return [dict(self.document(doc_id), doc_id=doc_id, score=-rank, matched=matched[doc_id])
+                for doc_id, rank in rows]
+
+    def stats(self):
+        """Summary of the index"""
+        with self._lock:
+            terms = self.db.conn.execute("SELECT COUNT(*) FROM emails_vocab").fetchone()[0]
+            files = len(self.db.ingested_files())
+        return {
+            'files': files,
+            'documents': len(self),
+            'terms': terms,
+            # Recent writes sit in the write-ahead log until SQLite checkpoints them
+            'size_mb': sum(os.path.getsize(path) for path in (self.db_file, self.db_file + '-wal')
+                           if os.path.exists(path)) / (1024 * 1024)
+        }
+
+
+def main():
+    """Build the index, count needles or search"""
+    if len(sys.argv) < 2 or sys.argv[1] not in ('build', 'count', 'search', 'fuzzy', 'stats'):
+        print(__doc__)
+        return
+
+    command = sys.argv[1]
+    args = sys.argv[2:]
+    fuzzy = '--fuzzy' in args
+    if fuzzy:
+        args.remove('--fuzzy')
+    folder = sys.argv[2] if command == 'build' and len(sys.argv) > 2 else None
+    index = SearchIndex(folder=folder)
+
+    if command == 'build':
+        print(f"Indexing {index.source}...")
+        result = index.update()
+        if index.store_dir:
+            print(f"✓ Indexed {result['documents']} new emails")
+        else:
+            print(f"✓ Indexed {result['documents']} documents from {result['files']} new/changed files"
+                  f" ({result['removed']} removed)")
+
+    elif command == 'count':
+        needles = args
+        if not needles:
+            print("Usage: python search_index.py count [--fuzzy] NEEDLE [NEEDLE ...]")
+            return
+
+        changed, deleted = index.stale_files()
+        if changed or deleted:
+            what = "new email(s) in the store" if index.store_dir else "file(s) changed"
+            print(f"⚠ {len(changed) + len(deleted)} {what} since the last build - "
+                  f"run 'python search_index.py build' for current counts")
+
+        print("\nSummary:")
+        print("Total emails:", len(index))
+        for needle, count in index.count(needles, fuzzy).items():
+            print(f"  {needle}: {count}")
+        return
+
+    elif command == 'search':
+        limit = 10
+        if '--limit' in args:
+            position = args.index('--limit')
+            limit = int(args[position + 1])
+            del args[position:position + 2]
+        query = ' '.join(args)
+        if not query:
+            print("Usage: python search_index.py search QUERY [--limit N] [--fuzzy]")
+            return
+
+        results = index.search(query, limit, fuzzy)
+        print("="*70)
+        print(f"TOP {len(results)} FOR: {query}")
+        print("="*70)
+        if not results:
+            print("  No matching emails")
+        for rank, result in enumerate(results, 1):
+            terms = ', '.join(f"{term} x{count}" for term, count in result['matched'].items())
+            print(f"\n{rank:2}. [{result['score']:.2f}] {result['subject'] or '(no subject)'}")
+            print(f"    {result['date'] or '-'}  {result['sender'] or '-'}  ({result['source']})")
+            print(f"    Matched: {terms}")
+        print("="*70)
+        return
+
+    elif command == 'fuzzy':
+        if not args:
+            print("Usage: python search_index.py fuzzy WORD [WORD ...]")
+            return
+        for word in args:
+            for term in tokenize(word):
+                variants = index.expand_term(term)
+                listed = ', '.join(f"{variant} ({index._vocabulary[variant]} emails, {distance} edits)"
+                                   for variant, distance in variants.items())
+                print(f"  {term}: {listed or 'no matches'}")
+        return
+
+    info = index.stats()
+    print("\n" + "="*70)
+    print("SEARCH INDEX")
+    print("="*70)
+    print(f"  Location: {index.db_file}")
+    print(f"  Builds from: {index.source}")
+    print(f"  Files: {info['files']}")
+    print(f"  Documents: {info['documents']}")
+    print(f"  Terms: {info['terms']}")
+    print(f"  Size: {info['size_mb']:.2f} MB")
+    print("="*70)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,32 +1,14 @@
-import os
-
-folder = "data/raw"
+from folder_scanner import scan
 
 counts = {
-    "DNR": 0,
+    "DNR": "didn't recieve link",
 }
 
-total = 0
-needle = "didn't recieve link"
-
-for filename in os.listdir(folder):
-    path = os.path.join(folder, filename)
-
-    if not os.path.isfile(path):
-        continue
-
-    with open(path, "r", encoding="utf-8", errors="ignore") as file:
-        content = file.read()
-
-    total += 1
-    text = content.lower()
-
-    if needle in text:
-        counts["DNR"] += 1
-
-print("\nWeekly summary:")
-print("Total emails:", total)
+if __name__ == "__main__":
+    results = scan(list(counts.values()))
 
-for category, count in counts.items():
-    print(category, count)
+    print("\nWeekly summary:")
+    print("Total emails:", results['files'])
 
+    for category, needle in counts.items():
+        print(category, results['needles'][needle]['files'])
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Startup Budget Check
+Analysis-only runs (--skip-download) should start instantly: importing the
+report scripts must stay under a fixed time budget and must not load the
+Google API client libraries, which are only needed to download.
+
+Usage:
+    python startup_budget.py            # check every analysis entry point
+    python startup_budget.py 0.3        # check against a custom budget (seconds)
+"""
+
+import sys
+import json
+import subprocess
+
+# Max seconds to import an analysis entry point
+STARTUP_BUDGET_SECONDS = 0.5
+
+# Modules that must import without the Gmail download stack
+ENTRY_POINTS = [
+    'email_analyzer_mbox',
+    'enhanced_issue_tracker',
+    'weekly_report_generator',
+    'monday_morning_automation',
+    'monthly_report_generator',
+]
+
+# Packages only the download path should load
+HEAVY_PREFIXES = ('google', 'googleapiclient', 'google_auth_oauthlib', 'httplib2')
+
+_MEASURE = """
+import sys, time, json
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+heavy = sorted(m for m in sys.modules if m.split('.')[0] in {prefixes!r})
+print(json.dumps({{'elapsed': elapsed, 'heavy': heavy}}))
+"""
+
+
+def heavy_modules_loaded():
+    """Names of download-only packages already imported in this process"""
+    return sorted(m for m in sys.modules if m.split('.')[0] in HEAVY_PREFIXES)
+
+
+def report_startup(elapsed, budget=STARTUP_BUDGET_SECONDS):
+    """
+    Print the startup time of an analysis-only run and warn if it regressed
+
+    Args:
+        elapsed: Seconds spent importing the script's dependencies
+        budget: Allowed seconds
+
+    Returns:
+        True if within budget and no download-only packages were loaded
+    """
+    heavy = heavy_modules_loaded()
+    print(f"⏱  Startup: {elapsed:.2f}s (budget {budget:.2f}s)")
+
+    ok = True
+    if elapsed > budget:
+        print(f"⚠ Startup exceeded the {budget:.2f}s budget")
+        ok = False
+    if heavy:
+        print(f"⚠ Download-only modules loaded: {', '.join(heavy[:5])}")
+        ok = False
+    return ok
+
+
+def measure_import(module):
+    """
+    Import a module in a fresh interpreter
+
+    Returns:
+        Dictionary with 'elapsed' seconds and the 'heavy' modules it loaded
+    """
+    code = _MEASURE.format(module=module, prefixes=HEAVY_PREFIXES)
+    result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1] if result.stderr.strip() else 'import failed')
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    """Check every analysis entry point against the startup budget"""
+    budget = float(sys.argv[1]) if len(sys.argv) > 1 else STARTUP_BUDGET_SECONDS
+
+    print("="*70)
+    print(f"STARTUP BUDGET CHECK ({budget:.2f}s)")
+    print("="*70)
+
+    failures = 0
+    for module in ENTRY_POINTS:
+        try:
+            info = measure_import(module)
+        except RuntimeError as e:
+            print(f"  ❌ {module}: {e}")
+            failures += 1
+            continue
+
+        problems = []
+        if info['elapsed'] > budget:
+            problems.append("over budget")
+        if info['heavy']:
+            problems.append(f"loads {info['heavy'][0].split('.')[0]}")
+
+        mark = "❌" if problems else "✓"
+        detail = f" ({', '.join(problems)})" if problems else ""
+        print(f"  {mark} {module}: {info['elapsed']:.3f}s{detail}")
+        failures += bool(problems)
+
+    print("="*70)
+    if failures:
+        print(f"❌ {failures} entry point(s) failed the startup budget")
+        sys.exit(1)
+    print("✓ All entry points within budget")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+Streaming Download Pipeline
+Runs the Gmail download in a background thread and hands each message to the
+analysis stage through a bounded queue, so network time and CPU time overlap.
+"""
+
+import email
+import queue
+import threading
+from gmail_downloader import download_problem
+
+# Marks the end of the download in the queue
+_DONE = object()
+
+
+class DownloadError(Exception):
+    """The download failed or missed messages (listing cut short, downloads skipped)"""
+
+
+def check_download(stats):
+    """
+    Raise DownloadError if a finished download missed messages
+
+    Args:
+        stats: Stats dict filled by GmailDownloader.download_to_mbox()/download_to_store()
+    """
+    problem = download_problem(stats)
+    if problem:
+        raise DownloadError(problem)
+
+
+def _stream(run, queue_size):
+    """
+    Start a download in a background thread right away
+
+    Args:
+        run: Function taking an on_message callback, performing the download
+             and returning its stats dict
+        queue_size: Max messages waiting between download and analysis
+
+    Returns:
+        Generator yielding a parsed email.message.Message for each raw message
+        the download hands to on_message; raises DownloadError at the end if
+        the download failed or missed messages (see check_download)
+    """
+    message_queue = queue.Queue(maxsize=queue_size)
+    stop = threading.Event()
+    errors = []
+
+    def enqueue(raw):
+        # Block while the queue is full, but give up if the consumer went away
+        while not stop.is_set():
+            try:
+                message_queue.put(raw, timeout=0.5)
+                return
+            except queue.Full:
+                continue
+        raise RuntimeError("streaming consumer stopped")
+
+    def produce():
+        try:
+            check_download(run(enqueue))
+        except Exception as e:
+            errors.append(e)
+        finally:
+            while not stop.is_set():
+                try:
+                    message_queue.put(_DONE, timeout=0.5)
+                    break
+                except queue.Full:
+                    continue
+
+    def drain():
+        try:
+            while True:
+                raw = message_queue.get()
+                if raw is _DONE:
+                    break
+                # Parsing happens here, in the analysis thread
+                yield email.message_from_bytes(raw)
+        finally:
+            stop.set()
+            producer.join()
+
+        if errors:
+            if isinstance(errors[0], DownloadError):
+                raise errors[0]
+            raise DownloadError(str(errors[0])) from errors[0]
+
+    producer = threading.Thread(target=produce, name="gmail-download", daemon=True)
+    producer.start()
+    return drain()
+
+
+def stream_download(downloader, output_file, query='', max_results=None, days_back=7,
+                    queue_size=200, show_progress=True, prefilter=None, threads=False):
+    """
+    Download messages to an mbox file while yielding each one for analysis
+
+    The mbox is still written exactly as download_to_mbox() would write it.
+    The queue is bounded, so a slow consumer applies back-pressure to the
+    download instead of buffering the whole mailbox in memory.
+
+    Args:
+        downloader: Authenticated GmailDownloader
+        output_file: Path to output mbox file
+        query: Gmail search query
+        max_results: Max messages to download (None = all)
+        days_back: Days to look back (default: 7)
+        queue_size: Max messages waiting between download and analysis
+        show_progress: Show download progress
+        prefilter: Optional MessagePrefilter applied before full downloads
+        threads: Download whole conversations with threads.get
+
+    Yields:
+        email.message.Message objects in download order
+    """
+    def run(on_message):
+        stats = {}
+        downloader.download_to_mbox(
+            output_file=output_file,
+            query=query,
+            max_results=max_results,
+            days_back=days_back,
+            show_progress=show_progress,
+            on_message=on_message,
+            prefilter=prefilter,
+            threads=threads,
+            stats=stats
+        )
+        return stats
+
+    return _stream(run, queue_size)
+
+
+def stream_download_to_store(downloader, store, query='', max_results=None, days_back=7,
+                             queue_size=200, show_progress=True, prefilter=None, threads=False):
+    """
+    Yield every message in the reporting window from the message store
+
+    Messages already stored are yielded straight from disk while the download
+    of new ones runs in the background; new messages follow as they arrive.
+
+    Args:
+        downloader: Authenticated GmailDownloader
+        store: MessageStore to read from and add to
+        query: Gmail search query
+        max_results: Max messages to list (None = all)
+        days_back: Days to look back (default: 7)
+        queue_size: Max messages waiting between download and analysis
+        show_progress: Show download progress
+        prefilter: Optional MessagePrefilter applied before full downloads
+        threads: Download whole conversations with threads.get
+
+    Yields:
+        email.message.Message objects
+    """
+    # Snapshot before the download starts so new messages are not yielded twice
+    existing, _ = store.select_days_back(days_back)
+
+    def run(on_message):
+        stats = {}
+        downloader.download_to_store(
+            store,
+            query=query,
+            max_results=max_results,
+            days_back=days_back,
+            show_progress=show_progress,
+            on_message=on_message,
+            prefilter=prefilter,
+            threads=threads,
+            stats=stats
+        )
+        return stats
+
+    # The download starts now and runs while the stored messages are read
+    new_messages = _stream(run, queue_size)
+
+    for entry in existing:
+        try:
+            yield store.get_message(entry)
+        except (OSError, EOFError) as e:
+            print(f"  ⚠ Could not read stored message {entry['sha'][:12]}: {e}")
+
+    yield from new_messages
@@ -7,7 +7,7 @@ Specialized tracker for monitoring SuperJoy controller freezing when handling hi
 import os
 import csv
 import json
-import mailbox
+from mbox_writer import open_mbox
 from collections import Counter, defaultdict
 from datetime import datetime, timedelta
 import re
@@ -47,7 +47,7 @@ class SuperJoyIssueTracker:
         print(f"\nOpening mbox file: {filepath}")
         
         try:
-            mbox = mailbox.mbox(filepath)
+            mbox = open_mbox(filepath)
             total_messages = len(mbox)
             print(f"Total messages: {total_messages}")
             
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Regression test: folder_scanner needle counts across chunk boundaries
+
+Files are read CHUNK_SIZE (1MB) at a time - as raw bytes through mmap for
+ASCII needles, as decoded text for non-ASCII needles and for files with
+characters that lowercase to ASCII. Needles placed across a chunk boundary
+must be counted exactly once, the same as counting in the whole file.
+
+Usage:
+    python -m unittest test_folder_scanner
+"""
+
+import os
+import re
+import tempfile
+import unittest
+
+from folder_scanner import CHUNK_SIZE, MultiNeedleMatcher, scan_folder
+
+ASCII_NEEDLES = ["did not receive", "abab", "onvif"]
+UNICODE_NEEDLES = ["réception", "überweisung", "ошибка"]
+# Each needle as it appears in the file (mixed case)
+SPELLINGS = {
+    "did not receive": "Did NOT Receive",
+    "abab": "ABABAB",
+    "onvif": "ONVIF",
+    "réception": "RÉCEPTION",
+    "überweisung": "Überweisung",
+    "ошибка": "ОШИБКА",
+}
+
+
+def whole_file_counts(path, needles):
+    """Overlapping needle occurrences in the whole file, lowercased like str.lower()"""
+    with open(path, 'rb') as f:
+        text = f.read().decode('utf-8', errors='ignore').lower()
+    return {needle: len(re.findall('(?=' + re.escape(needle.lower()) + ')', text)) for needle in needles}
+
+
+def straddling_text(needles, chunk_size, chunks=3, suffix=''):
+    """
+    Text with each needle written across chunk boundaries at every split point
+
+    Offsets are in characters, so for non-ASCII text they are the boundaries
+    the text path sees; for ASCII needles they are also the mmap byte offsets.
+    The suffix goes after the last boundary.
+    """
+    placements = []
+    boundary = chunk_size
+    for needle in needles:
+        spelling = SPELLINGS.get(needle, needle)
+        for split in range(1, len(spelling)):
+            placements.append((boundary - split, spelling))
+            boundary += chunk_size
+    # Never past the last chunk, so every boundary is a real one
+    boundary = max(boundary, chunk_size * chunks)
+
+    text = ['.'] * (boundary + chunk_size // 2)
+    for offset, spelling in placements:
+        text[offset:offset + len(spelling)] = spelling
+    return ''.join(text) + suffix
+
+
+class ChunkBoundaryTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def write(self, name, text):
+        path = os.path.join(self.tmp.name, name)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(text)
+        return path
+
+    def assertCountsMatch(self, path, needles, chunk_size):
+        hits = MultiNeedleMatcher(needles).scan_file(path, chunk_size)
+        expected = whole_file_counts(path, needles)
+        self.assertEqual({needle: hits[needle] for needle in needles}, expected)
+        # Every placed needle really is in the file
+        self.assertTrue(all(expected.values()), expected)
+
+    def test_small_chunks(self):
+        # Every split point of every needle, on each read path
+        for chunk_size in (16, 17, 64):
+            with self.subTest(path='ascii/mmap', chunk_size=chunk_size):
+                path = self.write('ascii.txt', straddling_text(ASCII_NEEDLES, chunk_size))
+                self.assertCountsMatch(path, ASCII_NEEDLES, chunk_size)
+            with self.subTest(path='unicode text', chunk_size=chunk_size):
+                path = self.write('unicode.txt', straddling_text(UNICODE_NEEDLES, chunk_size))
+                self.assertCountsMatch(path, UNICODE_NEEDLES, chunk_size)
+            with self.subTest(path='fold', chunk_size=chunk_size):
+                # 'İ' and the Kelvin sign lowercase to ASCII, so the file is read as text
+                path = self.write('fold.txt', straddling_text(ASCII_NEEDLES, chunk_size, suffix='İ Key'))
+                self.assertCountsMatch(path, ASCII_NEEDLES + ['key'], chunk_size)
+
+    def test_one_megabyte_chunks(self):
+        needles = ["did not receive", "abab"]
+        placed = {
+            'ascii.txt': needles,
+            'unicode.txt': ["réception"],
+            'fold.txt': ["onvif"],
+        }
+        all_needles = needles + ["réception", "onvif"]
+        expected = {needle: 0 for needle in all_needles}
+        for name, file_needles in placed.items():
+            suffix = ' İ' if name == 'fold.txt' else ''
+            path = self.write(name, straddling_text(file_needles, CHUNK_SIZE, chunks=2, suffix=suffix))
+            with self.subTest(file=name):
+                self.assertCountsMatch(path, file_needles, CHUNK_SIZE)
+            for needle, count in whole_file_counts(path, all_needles).items():
+                expected[needle] += count
+
+        results = scan_folder(self.tmp.name, all_needles, workers=2, use_threads=True, use_cache=False)
+        self.assertEqual(results['files'], len(placed))
+        self.assertEqual({needle: results['needles'][needle]['hits'] for needle in all_needles}, expected)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Regression test: Gmail downloads against the fake service with errors injected
+
+Every listed message must end up saved, or the download must report what it
+missed - a weekly run must never analyze part of the window without knowing.
+
+Usage:
+    python -m unittest test_gmail_downloader
+"""
+
+import io
+import os
+import mailbox
+import tempfile
+import unittest
+import contextlib
+
+from fake_gmail_service import FakeGmailService, generate_corpus
+from gmail_downloader import GmailDownloader, download_problem
+from message_store import MessageStore
+from streaming_pipeline import stream_download, stream_download_to_store, DownloadError
+
+CORPUS = generate_corpus(300, days_back=7, seed=1)
+
+
+class DownloadWithErrorsTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def service(self, **error_rates):
+        return FakeGmailService(CORPUS, page_size=50, seed=7, **error_rates)
+
+    def downloader(self, service, **options):
+        # No backoff delay - the fake service fails on a dice roll, not on load
+        options.setdefault('retry_delay', 0)
+        downloader = GmailDownloader(workers=4, **options)
+        downloader.service = service
+        return downloader
+
+    def quiet(self):
+        return contextlib.redirect_stdout(io.StringIO())
+
+    def test_retries_save_every_message(self):
+        for threads in (False, True):
+            for shard_hours in (None, 24):
+                with self.subTest(threads=threads, shard_hours=shard_hours):
+                    service = self.service(quota_error_rate=0.05, server_error_rate=0.1)
+                    output_file = os.path.join(self.tmp.name, f"emails_{threads}_{shard_hours}.mbox")
+                    stats = {}
+                    with self.quiet():
+                        self.downloader(service, shard_hours=shard_hours).download_to_mbox(
+                            output_file, days_back=7, show_progress=False, threads=threads, stats=stats)
+
+                    if not threads:
+                        self.assertGreater(service.stats['server_errors'] + service.stats['quota_errors'], 0)
+                    self.assertIsNone(download_problem(stats))
+                    self.assertEqual(len(mailbox.mbox(output_file)), len(CORPUS))
+
+    def test_streaming_to_store_yields_every_message(self):
+        service = self.service(quota_error_rate=0.05, server_error_rate=0.1)
+        store = MessageStore(os.path.join(self.tmp.name, 'store'))
+
+        with self.quiet():
+            messages = list(stream_download_to_store(self.downloader(service), store, days_back=7,
+                                                     show_progress=False))
+
+        self.assertGreater(service.stats['server_errors'], 0)
+        self.assertEqual(len(messages), len(CORPUS))
+        self.assertEqual(len(store), len(CORPUS))
+
+    def test_missed_messages_are_reported(self):
+        # Without retries some list or get calls fail for good
+        service = self.service(server_error_rate=0.1)
+        output_file = os.path.join(self.tmp.name, 'emails.mbox')
+
+        with self.quiet(), self.assertRaises(DownloadError):
+            for _ in stream_download(self.downloader(service, max_retries=0), output_file, days_back=7,
+                                     show_progress=False):
+                pass
+
+        stats = {}
+        with self.quiet():
+            self.downloader(self.service(server_error_rate=0.1), max_retries=0).download_to_mbox(
+                output_file, days_back=7, show_progress=False, stats=stats)
+        self.assertIsNotNone(download_problem(stats))
+
+    def test_unreachable_service_is_reported(self):
+        service = self.service(server_error_rate=1.0)
+        store = MessageStore(os.path.join(self.tmp.name, 'store'))
+
+        with self.quiet(), self.assertRaises(DownloadError):
+            list(stream_download_to_store(self.downloader(service, max_retries=2), store, days_back=7,
+                                          show_progress=False))
+        self.assertEqual(len(store), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -9,17 +9,56 @@ import json
 from datetime import datetime, timedelta
 from email_analyzer_mbox import EmailAnalyzer
 from enhanced_issue_tracker import IssueTracker
+from results_history import ResultsHistory, DEFAULT_HISTORY_FILE, build_record, period_key, sparkline
+from analysis_cache import AnalysisCache
 
 class WeeklyReportGenerator:
-    def __init__(self):
+    def __init__(self, use_cache=True):
+        """
+        Args:
+            use_cache: Reuse results cached for the same mbox and configs (see analysis_cache.py)
+        """
         self.week_start = None
         self.week_end = None
         self.general_results = None
         self.issue_results = {}
         self.previous_week_data = None
+        # Results history: every run's aggregates, keyed by period
+        self.history = None
+        self.period_type = 'week'
+        self.period = None
+        self.baseline_data = None
+        # Emails parsed during a streaming run, reused by track_critical_issues()
+        self.emails = None
+        self.metadata = None
+        self.emails_source = None
+        self.cache = AnalysisCache() if use_cache else None
+        
+    def load_previous_week_data(self, filepath='previous_week_data.json', period_type='week',
+                                history_file=DEFAULT_HISTORY_FILE, baseline_periods=4):
+        """
+        Load the previous period's data for comparison
+        
+        Earlier periods come from the results history. The single-snapshot
+        file is only used when the history has no earlier period yet.
+        
+        Args:
+            filepath: Legacy snapshot file (previous_week_data.json)
+            period_type: 'week' or 'month'
+            history_file: Results history file
+            baseline_periods: Periods averaged into the rolling baseline
+        """
+        self.period_type = period_type
+        self.period = period_key(period_type)
+        self.history = ResultsHistory(history_file)
+        
+        previous = self.history.previous(period_type, self.period)
+        if previous:
+            self.previous_week_data = previous[0]
+            self.baseline_data = self.history.baseline(period_type, self.period, baseline_periods)
+            print(f"✓ Loaded previous {period_type} data for comparison ({previous[0]['period']})")
+            return
         
-    def load_previous_week_data(self, filepath='previous_week_data.json'):
-        """Load last week's data for comparison"""
         if os.path.exists(filepath):
             try:
                 with open(filepath, 'r') as f:
@@ -29,7 +68,7 @@ class WeeklyReportGenerator:
                 print(f"⚠ Could not load previous week data: {e}")
     
     def save_current_week_data(self, filepath='previous_week_data.json'):
-        """Save this week's data for next week's comparison"""
+        """Save this week's data for next week's comparison (snapshot file and results history)"""
         try:
             data = {
                 'date': datetime.now().strftime('%Y-%m-%d'),
@@ -49,6 +88,16 @@ class WeeklyReportGenerator:
             print(f"✓ Saved current week data for future comparison")
         except Exception as e:
             print(f"⚠ Could not save week data: {e}")
+        
+        try:
+            if self.history is None:
+                self.history = ResultsHistory()
+            period = self.period or period_key(self.period_type)
+            self.history.append(build_record(self.period_type, period, self.general_results,
+                                             self.issue_results, source=self.emails_source))
+            print(f"✓ Recorded {self.period_type} {period} in results history")
+        except Exception as e:
+            print(f"⚠ Could not update results history: {e}")
     
     def get_trend_indicator(self, current, previous):
         """Get trend arrow and percentage change"""
@@ -64,12 +113,40 @@ class WeeklyReportGenerator:
         else:
             return "→", change
     
+    def get_period_value(self, metric, name=None, period=None, baseline=False):
+        """
+        A metric from an earlier period, for use with get_trend_indicator()
+        
+        Args:
+            metric: 'total_emails', 'category_mentions', 'category_emails' or 'issue_matches'
+            name: Category name or issue ID for the per-category/issue metrics
+            period: Period label to compare against, e.g. '2026-W40' (default: previous period)
+            baseline: Use the rolling baseline average instead of a single period
+        
+        Returns:
+            The earlier value, or None if it was not recorded
+        """
+        if baseline:
+            record = self.baseline_data
+        elif period:
+            record = self.history.get(self.period_type, period) if self.history else None
+        else:
+            record = self.previous_week_data
+        return ResultsHistory.value(record, metric, name)
+    
     def analyze_general_trends(self, mbox_file, keywords_file='keywords.json'):
         """Run general email analysis"""
         print("\n" + "="*70)
         print("RUNNING GENERAL TREND ANALYSIS")
         print("="*70)
         
+        cache_key = self.cache.make_key('general', mbox_file, [keywords_file]) if self.cache else None
+        cached = self.cache.get(cache_key) if cache_key else None
+        if cached:
+            print(f"✓ Using cached analysis of {mbox_file} ({cached['total_emails']} emails)")
+            self.general_results = cached
+            return True
+        
         analyzer = EmailAnalyzer(keywords_file)
         emails = analyzer.read_mbox_file(mbox_file, show_progress=True)
         
@@ -78,6 +155,94 @@ class WeeklyReportGenerator:
             return False
         
         self.general_results = analyzer.analyze_emails(emails, show_progress=True)
+        if cache_key:
+            self.cache.put(cache_key, self.general_results, source=mbox_file, kind='general')
+        return True
+    
+    def analyze_general_trends_stream(self, messages, keywords_file='keywords.json', source=None, show_progress=True):
+        """
+        Run general email analysis on messages as they arrive
+        
+        Args:
+            messages: Iterable of email.message.Message objects (e.g. from stream_download
+                      or MessageStore.iter_messages)
+            keywords_file: Path to keywords JSON
+            source: Mbox path or store selection the messages come from; passing the same
+                    value to track_critical_issues() reuses the parsed emails instead of
+                    re-reading them
+            show_progress: Show progress while analyzing
+        """
+        print("\n" + "="*70)
+        print("RUNNING GENERAL TREND ANALYSIS")
+        print("="*70)
+        
+        analyzer = EmailAnalyzer(keywords_file)
+        analyzer.start_analysis()
+        tracker = IssueTracker()
+        
+        emails = []
+        metadata = []
+        
+        for message in messages:
+            try:
+                email_text = analyzer._extract_email_content(message)
+            except Exception:
+                continue
+            
+            if not email_text:
+                continue
+            
+            analyzer.add_email(email_text)
+            emails.append(email_text)
+            metadata.append(tracker._extract_metadata(message, len(metadata)))
+            
+            if show_progress and len(emails) % 100 == 0:
+                print(f"  Analyzed {len(emails)} emails...")
+        
+        if not emails:
+            print("❌ No emails found")
+            return False
+        
+        print(f"✓ Analyzed {len(emails)} emails")
+        
+        self.general_results = analyzer.results
+        self.emails = emails
+        self.metadata = metadata
+        self.emails_source = source
+        return True
+    
+    def analyze_from_rollups(self, store, start_day, end_day, keywords_file='keywords.json',
+                             issue_configs=None, source=None):
+        """
+        Build general and issue results for a date range from daily rollups
+        
+        Days already rolled up are merged from disk; only missing or stale days
+        (and today) are analyzed from the message store. Replaces both
+        analyze_general_trends() and track_critical_issues().
+        
+        Args:
+            store: MessageStore holding the emails
+            start_day: First date to include
+            end_day: Last date to include
+            keywords_file: Path to keywords JSON
+            issue_configs: Issue config files to track
+            source: Label for the selection (e.g. 'store:last_30_days')
+        """
+        from rollups import RollupManager
+        
+        print("\n" + "="*70)
+        print("ASSEMBLING RESULTS FROM DAILY ROLLUPS")
+        print("="*70)
+        
+        manager = RollupManager(store, keywords_file, issue_configs)
+        self.general_results, self.issue_results = manager.results(start_day, end_day)
+        self.emails_source = source
+        
+        if not self.general_results['total_emails']:
+            print("❌ No emails found")
+            return False
+        
+        print(f"✓ {self.general_results['total_emails']} emails, {len(self.issue_results)} issue(s) tracked")
         return True
     
     def track_critical_issues(self, mbox_file, issue_configs):
@@ -91,8 +256,20 @@ class WeeklyReportGenerator:
                 print(f"⚠ Skipping {config_file} - not found")
                 continue
             
+            cache_key = self.cache.make_key('issue', mbox_file, [config_file]) if self.cache else None
+            cached = self.cache.get(cache_key) if cache_key else None
+            if cached:
+                print(f"✓ Using cached results for {config_file}")
+                self.issue_results[cached['issue_id']] = cached['result']
+                continue
+            
             tracker = IssueTracker(config_file)
-            emails, metadata = tracker.read_mbox_file(mbox_file, show_progress=False)
+            
+            # Reuse emails already parsed by a streaming run of the same mbox
+            if self.emails is not None and self.emails_source == mbox_file:
+                emails, metadata = self.emails, self.metadata
+            else:
+                emails, metadata = tracker.read_mbox_file(mbox_file, show_progress=False)
             
             if emails:
                 results = tracker.analyze_for_issue(emails, metadata, show_progress=False)
@@ -108,9 +285,16 @@ class WeeklyReportGenerator:
                     'avg_severity': results.get('avg_severity', 0),
                     'high_severity_count': results.get('high_severity_count', 0),
                     'critical_severity_count': results.get('critical_severity_count', 0),
+                    'original_matches': results.get('original_matches', results['matched_emails_count']),
+                    'severity_distribution': results.get('severity_distribution', {}),
+                    'affected_products': results.get('affected_products', {}),
                     'alert_threshold': tracker.issue_config.get('tracking_metrics', {}).get('alert_threshold', 5),
                     'escalation_threshold': tracker.issue_config.get('tracking_metrics', {}).get('escalation_threshold', 10)
                 }
+                
+                if cache_key:
+                    self.cache.put(cache_key, {'issue_id': issue_id, 'result': self.issue_results[issue_id]},
+                                   source=mbox_file, kind='issue')
     
     def generate_team_report(self, output_file=None):
         """Generate formatted team report"""
@@ -144,6 +328,11 @@ class WeeklyReportGenerator:
         else:
             lines.append(f"\nTotal Support Emails: {total}")
         
+        if self.baseline_data and self.baseline_data['periods'] >= 2:
+            average = self.get_period_value('total_emails', baseline=True)
+            trend, change = self.get_trend_indicator(total, average)
+            lines.append(f"{self.baseline_data['periods']}-{self.period_type} average: {average:.0f} {trend} ({change:+.1f}%)")
+        
         # Top issues
         lines.append(f"\n{'─'*70}")
         lines.append("🔥 TOP ISSUES THIS WEEK")
@@ -215,7 +404,7 @@ class WeeklyReportGenerator:
                     else:
                         lines.append(f"   • 🟢 STATUS: Normal levels")
                 
-                # TODO: Add week-over-week comparison when we track historical issue data
+                lines.extend(self._issue_history_lines(issue_id, data))
         
         # Key insights section
         lines.append(f"\n{'─'*70}")
@@ -265,6 +454,61 @@ class WeeklyReportGenerator:
         
         return report_text
     
+    def _threshold_level(self, count, data):
+        """0 = normal, 1 = alert threshold reached, 2 = escalation required"""
+        if count >= data.get('escalation_threshold', 10):
+            return 2
+        if count >= data.get('alert_threshold', 5):
+            return 1
+        return 0
+    
+    def _issue_history_lines(self, issue_id, data, periods=8):
+        """
+        Trend, sparkline and threshold crossing lines for one tracked issue
+        
+        Reads earlier periods' aggregates from the results history, so no old
+        mbox is re-analyzed.
+        """
+        lines = []
+        
+        products = data.get('affected_products', {})
+        if products:
+            top = sorted(products.items(), key=lambda x: x[1], reverse=True)[:3]
+            lines.append(f"   • Products: {', '.join(f'{name} ({count})' for name, count in top)}")
+        if data.get('original_matches', 0) > data['matched_count']:
+            lines.append(f"   • Matching emails: {data['original_matches']} in {data['matched_count']} conversations")
+        distribution = data.get('severity_distribution', {})
+        if any(distribution.values()):
+            lines.append("   • Severity mix: " + ", ".join(f"{count} {band}" for band, count in distribution.items() if count))
+        
+        if not self.history or not self.period:
+            return lines
+        
+        earlier = self.history.previous(self.period_type, self.period, periods - 1)
+        previous = ResultsHistory.value(earlier[0], 'issue_matches', issue_id) if earlier else None
+        if previous is None:
+            lines.append(f"   • Trend: first {self.period_type} tracked")
+            return lines
+        
+        current = data['matched_count']
+        trend, change = self.get_trend_indicator(current, previous)
+        change_text = f" ({change:+.0f}%)" if trend != "NEW" else ""
+        lines.append(f"   • vs last {self.period_type}: {previous} → {current} {trend}{change_text}")
+        
+        values = [ResultsHistory.value(record, 'issue_matches', issue_id) for record in reversed(earlier)]
+        values.append(current)
+        lines.append(f"   • Last {len(values)} {self.period_type}s: {sparkline(values)}  "
+                     f"(peak {max(v for v in values if v is not None)})")
+        
+        was, now = self._threshold_level(previous, data), self._threshold_level(current, data)
+        names = {1: 'alert', 2: 'escalation'}
+        if now > was:
+            lines.append(f"   • ⬆ Crossed the {names[now]} threshold this {self.period_type}")
+        elif now < was:
+            lines.append(f"   • ⬇ Back below the {names[was]} threshold")
+        
+        return lines
+    
     def _generate_insights(self):
         """Generate automated insights from data"""
         insights = []
@@ -283,6 +527,7 @@ class WeeklyReportGenerator:
             insights.append(f"{cat_name} is the dominant issue this week, affecting {percentage:.1f}% of support emails")
         
         # Check for trends
+        spiked = set()
         if self.previous_week_data:
             prev_total = self.previous_week_data.get('total_emails', 0)
             if total > prev_total * 1.2:
@@ -301,11 +546,28 @@ class WeeklyReportGenerator:
                     if previous > 0 and current > previous * 1.5:
                         increase = ((current - previous) / previous * 100)
                         insights.append(f"{cat_name} spiked {increase:.1f}% - investigate for new issues or trends")
+                        spiked.add(cat_name)
+        
+        # Compare against the rolling baseline (catches slow build-ups a single week hides)
+        if self.baseline_data and self.baseline_data['periods'] >= 2:
+            span = f"{self.baseline_data['periods']}-{self.period_type}"
+            average = self.get_period_value('total_emails', baseline=True)
+            if average and total > average * 1.2:
+                insights.append(f"Support volume is {(total - average) / average * 100:.1f}% above the {span} average")
+            
+            for cat_name, cat_data in categories.items():
+                average = self.get_period_value('category_mentions', cat_name, baseline=True)
+                if cat_name not in spiked and average and cat_data['total_mentions'] > average * 1.5:
+                    increase = (cat_data['total_mentions'] - average) / average * 100
+                    insights.append(f"{cat_name} is running {increase:.1f}% above its {span} average")
         
         # Critical issue insights
         for issue_id, data in self.issue_results.items():
             if data['severity'] == 'CRITICAL' and data['matched_count'] > 0:
                 insights.append(f"CRITICAL: {data['name']} affecting {data['matched_count']} customers - escalate to engineering")
+            previous = self.get_period_value('issue_matches', issue_id)
+            if previous is not None and self._threshold_level(data['matched_count'], data) > self._threshold_level(previous, data):
+                insights.append(f"{data['name']} crossed its alert level ({previous} → {data['matched_count']} reports)")
         
         return insights if insights else ["No significant trends detected this week"]
     
@@ -355,10 +617,20 @@ def main():
     print("="*70)
     print("\nThis will create a formatted team report from your email analysis\n")
     
-    # Get mbox file
-    mbox_file = input("Enter path to mbox file: ").strip().strip('"').strip("'")
+    # Get mbox file (or select a date range from the local message store)
+    mbox_file = input("Enter path to mbox file (or press Enter to use the message store): ").strip().strip('"').strip("'")
     
-    if not os.path.exists(mbox_file):
+    store = None
+    if not mbox_file:
+        from message_store import MessageStore
+        store = MessageStore()
+        if not len(store):
+            print("❌ Message store is empty - download emails first")
+            return
+        days_input = input("How many days back? (default: 7): ").strip()
+        days_back = int(days_input) if days_input.isdigit() else 7
+        mbox_file = f"store:last_{days_back}_days"
+    elif not os.path.exists(mbox_file):
         print(f"❌ File not found: {mbox_file}")
         return
     
@@ -374,7 +646,12 @@ def main():
         print(f"⚠ keywords.json not found, using defaults")
         keywords_file = None
     
-    success = reporter.analyze_general_trends(mbox_file, keywords_file)
+    if store is not None:
+        _, start = store.select_days_back(days_back)
+        success = reporter.analyze_general_trends_stream(store.iter_messages(start), keywords_file,
+                                                         source=mbox_file)
+    else:
+        success = reporter.analyze_general_trends(mbox_file, keywords_file)
     
     if not success:
         return